@@ -0,0 +1,280 @@
+"""
+Vectorized retention, churn, visit-frequency and revenue analytics
+
+Each report loads only the columns it needs, from the columnar snapshots
+or the live tables. Users become integer indexes and dates become integer
+days / months, so every group-by is a bincount or a sort instead of a
+correlated SQL query.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from .snapshots import load_live, load_table
+
+# Memberships that were paid for (pending / cancelled ones never ran)
+PAID_MEMBERSHIP_STATUSES = ["active", "expired"]
+# Retention months are kept as bits of an int64 per member
+MAX_MONTHS = 60
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def load(db, source: str, table: str, columns: list) -> dict:
+    """
+    Load columns from the snapshots (source="snapshot") or the live table
+    """
+    if source == "snapshot":
+        return load_table(table, columns)
+    return load_live(db, table, columns)
+
+
+def id_keys(ids: np.ndarray) -> np.ndarray:
+    """
+    64-bit hash of each id, so member ids can be grouped with integer sorts
+
+    Sorting 64-bit integers is several times faster than sorting 36-byte
+    strings. Two distinct ids sharing a key (probability ~1e-8 for a million
+    members) would only merge their counts.
+    """
+    raw = np.ascontiguousarray(ids, dtype="S36").view(np.uint8).reshape(-1, 36)
+    words = np.zeros((len(ids), 5), dtype=np.uint64)
+    words.view(np.uint8).reshape(-1, 40)[:, :36] = raw
+    keys = np.zeros(len(ids), dtype=np.uint64)
+    for i in range(words.shape[1]):
+        keys = (keys ^ words[:, i]) * _HASH_MULTIPLIER
+        keys ^= keys >> np.uint64(29)
+    return keys
+
+
+def factorize_few(values: np.ndarray, limit: int = 64):
+    """
+    Same result as np.unique(values, return_inverse=True), for columns with
+    few distinct values (plans, branches)
+
+    One equality pass per distinct value is much cheaper than sorting the
+    whole column of 36-byte ids; past `limit` values it falls back to np.unique.
+    """
+    codes = np.zeros(len(values), dtype=np.int64)
+    uniques = []
+    unassigned = np.ones(len(values), dtype=bool)
+    while unassigned.any():
+        if len(uniques) == limit:
+            return np.unique(values, return_inverse=True)
+        value = values[np.argmax(unassigned)]
+        match = values == value
+        codes[match] = len(uniques)
+        uniques.append(value)
+        unassigned &= ~match
+
+    uniques = np.array(uniques, dtype=values.dtype)
+    order = np.argsort(uniques)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return uniques[order], rank[codes]
+
+
+def month_index(values: np.ndarray) -> np.ndarray:
+    """
+    Months since 1970-01 as integers
+    """
+    return values.astype("M8[M]").astype(np.int64)
+
+
+def month_label(month: int) -> str:
+    return str(np.datetime64(int(month), "M"))
+
+
+def _paid(memberships: dict) -> np.ndarray:
+    return np.isin(memberships["status"], PAID_MEMBERSHIP_STATUSES)
+
+
+def retention_cohorts(memberships: dict, months: int = 12, today: date = None) -> dict:
+    """
+    Monthly retention by cohort (the month of each member's first membership)
+
+    Cell [c, k] is the share of cohort c with a membership covering the k-th
+    month after joining; months that have not happened yet are None.
+
+    Args:
+        memberships: user_id, status, start_date, end_date arrays
+        months: Months after joining to track (at most MAX_MONTHS)
+        today: Reference day (default: today)
+
+    Returns:
+        Dictionary with cohorts (YYYY-MM), sizes and retention (cohort x month)
+    """
+    paid = _paid(memberships)
+    users, user_index = np.unique(id_keys(memberships["user_id"][paid]), return_inverse=True)
+    starts = month_index(memberships["start_date"][paid])
+    ends = month_index(memberships["end_date"][paid])
+    current = month_index(np.datetime64(today or date.today(), "D"))
+
+    first = np.full(len(users), np.iinfo(np.int64).max)
+    np.minimum.at(first, user_index, starts)
+
+    # Months covered, as a bit per month offset from the member's first
+    # month, OR-ed together over each member's memberships
+    lo = np.clip(starts - first[user_index], 0, months)
+    hi = np.clip(ends - first[user_index] + 1, 0, months)
+    bits = (np.int64(1) << hi) - (np.int64(1) << lo)
+    covered = np.zeros(len(users), dtype=np.int64)
+    np.bitwise_or.at(covered, user_index, bits)
+
+    cohorts, cohort_index = np.unique(first, return_inverse=True)
+    sizes = np.bincount(cohort_index, minlength=len(cohorts))
+    retained = np.stack(
+        [np.bincount(cohort_index, weights=(covered >> k) & 1, minlength=len(cohorts))
+         for k in range(months)], axis=1
+    ) if len(cohorts) else np.zeros((0, months))
+    rates = retained / np.maximum(sizes, 1)[:, None]
+    observed = cohorts[:, None] + np.arange(months)[None, :] <= current
+
+    return {
+        "cohorts": [month_label(m) for m in cohorts],
+        "sizes": sizes.tolist(),
+        "retention": [
+            [round(float(rate), 4) if seen else None for rate, seen in zip(row, seen_row)]
+            for row, seen_row in zip(rates, observed)
+        ],
+    }
+
+
+def churn_by_plan(memberships: dict, months: int = 12, grace_days: int = 30,
+                  today: date = None) -> dict:
+    """
+    Monthly churn per plan: the share of memberships ending in a month whose
+    member did not start another one within `grace_days` of the end
+
+    Args:
+        memberships: user_id, membership_plan_id, status, start_date, end_date arrays
+        months: Number of most recent complete months to report
+        grace_days: Days after the end date a renewal still counts
+        today: Reference day (default: today)
+
+    Returns:
+        Dictionary with plan_ids, months (YYYY-MM), ended and churn_rate
+        (plan x month, None where nothing ended)
+    """
+    today = np.datetime64(today or date.today(), "D")
+    paid = _paid(memberships)
+    starts = memberships["start_date"][paid].astype("M8[D]").astype(np.int64)
+    ends = memberships["end_date"][paid].astype("M8[D]").astype(np.int64)
+    _, user_index = np.unique(id_keys(memberships["user_id"][paid]), return_inverse=True)
+    plan_ids, plan_index = factorize_few(memberships["membership_plan_id"][paid])
+
+    # Next membership of the same member: sort by one packed (member, start) key
+    first_day = starts.min() if len(starts) else 0
+    order = np.argsort(user_index * (starts.max() - first_day + 1 if len(starts) else 1)
+                       + (starts - first_day))
+    next_start = np.full(len(order), np.iinfo(np.int64).max)
+    same_user = user_index[order][1:] == user_index[order][:-1]
+    next_start[order[:-1][same_user]] = starts[order][1:][same_user]
+    renewed = next_start <= ends + grace_days
+
+    # Only memberships whose grace period is over can be judged
+    decided = ends + grace_days < today.astype(np.int64)
+    last_month = month_index(today) - 1
+    end_month = month_index(ends.astype("M8[D]"))
+    offset = end_month - (last_month - months + 1)
+    in_range = decided & (offset >= 0) & (offset < months)
+
+    cells = plan_index[in_range] * months + offset[in_range]
+    size = len(plan_ids) * months
+    ended = np.bincount(cells, minlength=size).reshape(len(plan_ids), months)
+    churned = np.bincount(cells, weights=~renewed[in_range], minlength=size).reshape(len(plan_ids), months)
+
+    return {
+        "plan_ids": [plan.decode() for plan in plan_ids],
+        "months": [month_label(m) for m in range(last_month - months + 1, last_month + 1)],
+        "ended": ended.tolist(),
+        "churn_rate": [
+            [round(float(c / e), 4) if e else None for c, e in zip(c_row, e_row)]
+            for c_row, e_row in zip(churned, ended)
+        ],
+    }
+
+
+def visit_frequency(checkins: dict, memberships: dict, start_date: date, end_date: date,
+                    max_visits: int = 20) -> dict:
+    """
+    Distribution of check-ins per member between two days (inclusive)
+
+    Every member with a paid membership overlapping the range is counted,
+    including those who never checked in.
+
+    Returns:
+        Dictionary with histogram (index = visits, last bucket = max_visits
+        or more), members, mean, median, p90 and visits_per_week
+    """
+    start = np.datetime64(start_date, "D")
+    end = np.datetime64(end_date, "D")
+    paid = _paid(memberships)
+    overlapping = paid & (memberships["start_date"] <= end) & (memberships["end_date"] >= start)
+    member_ids = memberships["user_id"][overlapping]
+
+    checkin_days = checkins["checkin_time"].astype("M8[D]")
+    in_range = (checkin_days >= start) & (checkin_days <= end)
+
+    # One factorization over members and visitors gives both the same codes
+    users, user_index = np.unique(
+        id_keys(np.concatenate([member_ids, checkins["user_id"][in_range]])), return_inverse=True
+    )
+    is_member = np.zeros(len(users), dtype=bool)
+    is_member[user_index[:len(member_ids)]] = True
+    visits = np.bincount(user_index[len(member_ids):], minlength=len(users))[is_member]
+
+    weeks = ((end - start).astype(np.int64) + 1) / 7
+    histogram = np.bincount(np.minimum(visits, max_visits), minlength=max_visits + 1)
+    return {
+        "members": int(len(visits)),
+        "histogram": histogram.tolist(),
+        "mean": round(float(visits.mean()), 2) if len(visits) else 0.0,
+        "median": float(np.median(visits)) if len(visits) else 0.0,
+        "p90": float(np.percentile(visits, 90)) if len(visits) else 0.0,
+        "visits_per_week": round(float(visits.mean() / weeks), 2) if len(visits) else 0.0,
+    }
+
+
+def revenue_per_member(payments: dict, months: int = 12, today: date = None) -> dict:
+    """
+    Successful payment revenue per paying member, per month and lifetime
+
+    Returns:
+        Dictionary with months (YYYY-MM), revenue, paying_members and
+        revenue_per_member per month, plus lifetime mean / median / p90
+        revenue of every member who ever paid
+    """
+    success = payments["status"] == "success"
+    users, user_index = np.unique(id_keys(payments["user_id"][success]), return_inverse=True)
+    amounts = payments["amount"][success]
+    paid_month = month_index(payments["payment_time"][success])
+
+    last_month = month_index(np.datetime64(today or date.today(), "D"))
+    offset = paid_month - (last_month - months + 1)
+    in_range = (offset >= 0) & (offset < months)
+    revenue = np.bincount(offset[in_range], weights=amounts[in_range], minlength=months)
+
+    # Distinct (month, user) pairs give the paying members of each month
+    pairs = np.unique(offset[in_range] * len(users) + user_index[in_range])
+    paying = np.bincount(pairs // max(len(users), 1), minlength=months)
+
+    lifetime = np.bincount(user_index, weights=amounts, minlength=len(users))
+    return {
+        "months": [month_label(m) for m in range(last_month - months + 1, last_month + 1)],
+        "revenue": [round(float(r), 2) for r in revenue],
+        "paying_members": paying.tolist(),
+        "revenue_per_member": [
+            round(float(r / p), 2) if p else 0.0 for r, p in zip(revenue, paying)
+        ],
+        "lifetime_mean": round(float(lifetime.mean()), 2) if len(users) else 0.0,
+        "lifetime_median": round(float(np.median(lifetime)), 2) if len(users) else 0.0,
+        "lifetime_p90": round(float(np.percentile(lifetime, 90)), 2) if len(users) else 0.0,
+    }
+
+
+def default_range(start_date: date = None, end_date: date = None, days: int = 30):
+    """
+    (start, end) defaulting to the last `days` days
+    """
+    end_date = end_date or date.today()
+    return start_date or end_date - timedelta(days=days - 1), end_date
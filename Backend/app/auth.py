@@ -1,9 +1,41 @@
 """
-Authentication utilities for password hashing and verification
+Authentication utilities for password hashing, access tokens and the
+token-checking FastAPI dependencies
+
+Access tokens are stateless: "<user_id>.<role>.<expires>.<token_id>.<hmac>"
+signed with TOKEN_SECRET, so checking one is an HMAC and a set lookup with
+no database or bcrypt work. Logged-out tokens are kept in revoked_tokens
+and mirrored into an in-memory set that is re-synced every
+REVOCATION_SYNC_SECONDS.
 """
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
 import bcrypt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import text
+
+load_dotenv()
+
+# Without a configured secret tokens only verify in the process that issued them
+TOKEN_SECRET = os.getenv("TOKEN_SECRET") or secrets.token_hex(32)
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", "43200"))
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+# bcrypt cost factor for new hashes; pick it with calibrate_bcrypt.py
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+_token_key = TOKEN_SECRET.encode('utf-8')
+
+logger = logging.getLogger(__name__)
 
 
 def hash_password(password: str) -> str:
@@ -16,11 +48,82 @@ def hash_password(password: str) -> str:
     Returns:
         Hashed password string
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
+def hash_rounds(hashed_password: str) -> int:
+    """
+    Cost factor of a bcrypt hash ("$2b$<rounds>$...")
+    """
+    return int(hashed_password.split('$')[2])
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    True when a stored hash was made with a cost other than BCRYPT_ROUNDS
+    """
+    return hash_rounds(hashed_password) != BCRYPT_ROUNDS
+
+
+def rehash_password(session_factory, user_id: str, password: str, old_hash: str):
+    """
+    Replace a user's hash with one at BCRYPT_ROUNDS (background task after login)
+    
+    The update only applies if the stored hash is still `old_hash`, so a
+    password change in the meantime is never overwritten.
+    """
+    new_hash = hash_password(password)
+    db = session_factory()
+    try:
+        db.execute(text("""
+            UPDATE users SET password_hash = :new_hash
+            WHERE id = :user_id AND password_hash = :old_hash
+        """), {'new_hash': new_hash, 'user_id': user_id, 'old_hash': old_hash})
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Password rehash failed for user %s", user_id)
+    finally:
+        db.close()
+
+
+def time_bcrypt_verify(rounds: int, iterations: int = 3) -> float:
+    """
+    Average seconds for one bcrypt verify at `rounds` on this host
+    """
+    password = b"calibration-password"
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+    started = time.perf_counter()
+    for _ in range(iterations):
+        bcrypt.checkpw(password, hashed)
+    return (time.perf_counter() - started) / iterations
+
+
+def calibrate_bcrypt_rounds(target_seconds: float, min_rounds: int = 10,
+                            max_rounds: int = 16) -> tuple:
+    """
+    Highest cost factor whose verify time stays within `target_seconds`
+    
+    Args:
+        target_seconds: Acceptable verify (= login) time on this host
+        min_rounds: Lowest cost ever returned, even on slow hosts
+        max_rounds: Highest cost tried
+    
+    Returns:
+        (rounds, {rounds: measured seconds})
+    """
+    timings = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        timings[rounds] = time_bcrypt_verify(rounds)
+        if timings[rounds] > target_seconds:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a password against a hashed password
@@ -38,13 +141,153 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
-def generate_session_token() -> str:
+class TokenClaims(NamedTuple):
+    user_id: str
+    role: str
+    expires: int
+    token_id: str
+
+
+def _sign(message: str) -> str:
+    digest = hmac.new(_token_key, message.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def generate_session_token(user_id: str, role: str) -> str:
+    """
+    Issue a signed access token
+    
+    Args:
+        user_id: User the token authenticates
+        role: User role ('user' or 'admin')
+    
+    Returns:
+        Access token string
+    """
+    expires = int(time.time()) + TOKEN_TTL_SECONDS
+    message = f"{user_id}.{role}.{expires}.{secrets.token_urlsafe(12)}"
+    return f"{message}.{_sign(message)}"
+
+
+def verify_session_token(token: str) -> Optional[TokenClaims]:
     """
-    Generate a simple session token (timestamp-based)
-    For production, use proper JWT or session management
+    Check signature, expiry and revocation of an access token
+    
+    Args:
+        token: Access token string
     
     Returns:
-        Session token string
+        TokenClaims if the token is valid, None otherwise
+    """
+    message, _, signature = token.rpartition('.')
+    if not hmac.compare_digest(signature.encode('utf-8'), _sign(message).encode('utf-8')):
+        return None
+    parts = message.split('.')
+    if len(parts) != 4:
+        return None
+    claims = TokenClaims(parts[0], parts[1], int(parts[2]), parts[3])
+    if claims.expires < time.time() or claims.token_id in _revoked_token_ids:
+        return None
+    return claims
+
+
+# ==========================================
+# REVOCATION
+# ==========================================
+
+_revoked_token_ids = set()
+
+
+def revoke_token(db, claims: TokenClaims):
+    """
+    Revoke a token in this process now and in other workers at their next sync
+    """
+    db.execute(text("""
+        INSERT IGNORE INTO revoked_tokens (token_id, expires_at)
+        VALUES (:token_id, FROM_UNIXTIME(:expires))
+    """), {'token_id': claims.token_id, 'expires': claims.expires})
+    db.commit()
+    _revoked_token_ids.add(claims.token_id)
+
+
+def sync_revocations(db):
+    """
+    Replace the in-memory revocation set with the unexpired revoked tokens
+    """
+    global _revoked_token_ids
+    db.execute(text("DELETE FROM revoked_tokens WHERE expires_at < NOW()"))
+    db.commit()
+    rows = db.execute(text("SELECT token_id FROM revoked_tokens")).fetchall()
+    _revoked_token_ids = {row[0] for row in rows}
+
+
+def start_revocation_sync(session_factory) -> threading.Event:
+    """
+    Sync the revocation set every REVOCATION_SYNC_SECONDS in a daemon thread
+    
+    Returns:
+        Event that stops the thread when set
+    """
+    stop = threading.Event()
+    
+    def run():
+        while True:
+            db = session_factory()
+            try:
+                sync_revocations(db)
+            except Exception:
+                logger.warning("Revocation sync failed", exc_info=True)
+            finally:
+                db.close()
+            if stop.wait(REVOCATION_SYNC_SECONDS):
+                return
+    
+    threading.Thread(target=run, name="revocation-sync", daemon=True).start()
+    return stop
+
+
+# ==========================================
+# DEPENDENCIES
+# ==========================================
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def get_token_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)
+) -> TokenClaims:
+    """
+    Require a valid bearer token
+    """
+    claims = verify_session_token(credentials.credentials) if credentials else None
+    if not claims:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return claims
+
+
+def authorize_user(user_id: str, claims: TokenClaims = Depends(get_token_claims)) -> TokenClaims:
+    """
+    Require a token for the {user_id} in the path (or an admin token)
+    """
+    if claims.user_id != user_id and claims.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to access another user's data"
+        )
+    return claims
+
+
+def require_admin(claims: TokenClaims = Depends(get_token_claims)) -> TokenClaims:
+    """
+    Require an admin token
     """
-    import secrets
-    return secrets.token_urlsafe(32)
+    if claims.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return claims
@@ -0,0 +1,41 @@
+"""
+Per-worker cache for shared catalog reads (membership plans, coupons)
+
+Every member's home page shows the same plans and coupons, so these are
+read from the database at most once per CATALOG_CACHE_SECONDS per worker.
+Admin changes made in this worker invalidate the cache immediately. Other
+workers pick them up when their copy expires.
+"""
+import os
+import threading
+import time
+
+CATALOG_CACHE_SECONDS = int(os.getenv("CATALOG_CACHE_SECONDS", "60"))
+
+_lock = threading.Lock()
+# name -> (expires at, value)
+_entries = {}
+
+
+def cached(name: str, load, db):
+    """
+    Return the cached value of `name`, calling load(db) when it is missing or expired
+    """
+    entry = _entries.get(name)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    with _lock:
+        entry = _entries.get(name)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        value = load(db)
+        _entries[name] = (time.monotonic() + CATALOG_CACHE_SECONDS, value)
+        return value
+
+
+def invalidate():
+    """
+    Drop every cached catalog entry after an admin change
+    """
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,423 @@
+"""
+Write-behind check-in ingestion (opt-in with CHECKIN_INGEST=buffered)
+
+In buffered mode /user/checkin/{user_id} does no database write on the
+request path:
+
+1. the (user, session) pair is validated against a cache of confirmed
+   bookings for sessions around now (refreshed every CACHE_REFRESH_SECONDS,
+   with a single-row lookup on a cache miss);
+2. the check-in is appended and fsynced to a local write-ahead log segment;
+3. the request is acknowledged with the check-in id.
+
+A flusher thread writes buffered check-ins every CHECKIN_FLUSH_MS or
+CHECKIN_FLUSH_ROWS rows, whichever comes first. Each flush is one
+transaction: lock the still-confirmed bookings, insert all their check-ins
+with one multi-row INSERT, and complete the bookings. Once it commits, the
+WAL segments it covered are deleted. On startup, segments left behind by
+dead processes are replayed. Check-ins whose booking is no longer confirmed
+at flush time (e.g. cancelled, or checked in through another worker) were
+already acknowledged, so they are logged, written to the dead-letter file
+with the reason and counted as rejected.
+
+A batch that fails CHECKIN_MAX_BATCH_FAILURES times in a row is retried one
+check-in per transaction, so one bad row cannot hold back the others: rows
+that still fail are appended to the dead-letter file
+(var/checkins.failed.jsonl) and dropped from the buffer. A database that is
+unreachable (OperationalError) keeps the whole batch buffered instead.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from .database import SessionLocal
+from .ids import new_id
+from .tasks import TASK_DATA_DIR, _append_lines
+
+logger = logging.getLogger(__name__)
+
+CHECKIN_INGEST = os.getenv("CHECKIN_INGEST", "direct").lower()
+CHECKIN_FLUSH_MS = int(os.getenv("CHECKIN_FLUSH_MS", "200"))
+CHECKIN_FLUSH_ROWS = int(os.getenv("CHECKIN_FLUSH_ROWS", "500"))
+# Consecutive failed flushes of a batch before it is retried row by row
+CHECKIN_MAX_BATCH_FAILURES = int(os.getenv("CHECKIN_MAX_BATCH_FAILURES", "3"))
+CACHE_REFRESH_SECONDS = 30
+# Sessions whose confirmed bookings are cached: starting within this many hours of now
+CACHE_WINDOW_HOURS = 3
+
+WAL_DIR = TASK_DATA_DIR / "checkin-wal"
+DEAD_LETTER_FILE = TASK_DATA_DIR / "checkins.failed.jsonl"
+
+
+class NoConfirmedBooking(Exception):
+    pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class CheckinIngestor:
+    """
+    Booking cache, write-ahead log and batched flusher for one worker process
+    """
+
+    def __init__(self, session_factory=SessionLocal, wal_dir: Path = WAL_DIR,
+                 flush_ms: int = CHECKIN_FLUSH_MS, flush_rows: int = CHECKIN_FLUSH_ROWS,
+                 max_batch_failures: int = CHECKIN_MAX_BATCH_FAILURES,
+                 dead_letter_file: Path = DEAD_LETTER_FILE):
+        self.session_factory = session_factory
+        self.wal_dir = wal_dir
+        self.flush_ms = flush_ms
+        self.flush_rows = flush_rows
+        self.max_batch_failures = max_batch_failures
+        self.dead_letter_file = dead_letter_file
+        self._batch_failures = 0
+        self._lock = threading.Condition()
+        # (user_id, session_id) -> branch_id of a confirmed, not yet checked-in booking
+        self._bookings = {}
+        self._checked_in = set()
+        self._cache_loaded_at = 0.0
+        self._buffer = []
+        self._segment = None
+        self._segment_rows = 0
+        self._segment_seq = 0
+        self._pending_segments = []
+        self._thread = None
+        self._running = False
+        self.stats = {
+            "acknowledged": 0, "flushed": 0, "rejected_at_flush": 0, "flushes": 0,
+            "flush_errors": 0, "row_by_row_flushes": 0, "dead_lettered": 0,
+            "last_batch_size": 0, "max_batch_size": 0, "last_flush_ms": 0.0, "replayed": 0,
+        }
+
+    # ---------- booking cache ----------
+
+    def _refresh_cache(self, db):
+        rows = db.execute(text("""
+            SELECT b.user_id, b.session_id, s.branch_id
+            FROM sessions s
+            JOIN bookings b ON b.session_id = s.id
+            WHERE s.start_time BETWEEN NOW() - INTERVAL :hours HOUR
+                                   AND NOW() + INTERVAL :hours HOUR
+              AND b.status = 'confirmed'
+        """), {'hours': CACHE_WINDOW_HOURS}).fetchall()
+        with self._lock:
+            self._bookings = {(row[0], row[1]): row[2] for row in rows}
+            self._cache_loaded_at = time.monotonic()
+
+    def _lookup(self, db, user_id: str, session_id: str):
+        row = db.execute(text("""
+            SELECT s.branch_id
+            FROM bookings b
+            JOIN sessions s ON b.session_id = s.id
+            WHERE b.user_id = :user_id AND b.session_id = :session_id
+              AND b.status = 'confirmed'
+            LIMIT 1
+        """), {'user_id': user_id, 'session_id': session_id}).fetchone()
+        return row[0] if row else None
+
+    # ---------- write-ahead log ----------
+
+    def _open_segment(self):
+        self.wal_dir.mkdir(parents=True, exist_ok=True)
+        self._segment_seq += 1
+        path = self.wal_dir / f"{os.getpid()}-{self._segment_seq:08d}.jsonl"
+        self._segment = (path, open(path, "a", encoding="utf-8"))
+        self._segment_rows = 0
+
+    def _rotate_segment(self):
+        """
+        Close the current segment; it is deleted once its rows are committed
+        """
+        if not self._segment_rows:
+            return
+        path, f = self._segment
+        f.close()
+        self._pending_segments.append(path)
+        self._open_segment()
+
+    def _append(self, record: dict):
+        _, f = self._segment
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        self._segment_rows += 1
+
+    # ---------- request path ----------
+
+    def submit(self, db, user_id: str, session_id: str) -> str:
+        """
+        Validate, log and buffer one check-in
+
+        Returns:
+            The check-in id
+
+        Raises:
+            NoConfirmedBooking: when the user has no confirmed booking
+        """
+        if time.monotonic() - self._cache_loaded_at > CACHE_REFRESH_SECONDS:
+            self._refresh_cache(db)
+
+        key = (user_id, session_id)
+        with self._lock:
+            branch_id = None if key in self._checked_in else self._bookings.get(key)
+        if branch_id is None and key not in self._checked_in:
+            # Booked after the last refresh, or a session outside the window
+            branch_id = self._lookup(db, user_id, session_id)
+        if branch_id is None:
+            raise NoConfirmedBooking()
+
+        record = {
+            "id": new_id(),
+            "user_id": user_id,
+            "session_id": session_id,
+            "branch_id": branch_id,
+            "checkin_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "logged_at": time.time(),
+        }
+        with self._lock:
+            if key in self._checked_in:
+                raise NoConfirmedBooking()
+            self._append(record)
+            self._checked_in.add(key)
+            self._bookings.pop(key, None)
+            self._buffer.append(record)
+            self.stats["acknowledged"] += 1
+            if len(self._buffer) >= self.flush_rows:
+                self._lock.notify()
+        return record["id"]
+
+    # ---------- flushing ----------
+
+    def _write_batch(self, records: list) -> tuple[int, list]:
+        """
+        Insert one batch of check-ins in a single transaction
+
+        Returns:
+            (check-ins written, rejected records with an "error" reason)
+        """
+        db = self.session_factory()
+        try:
+            pairs = sorted({(r["user_id"], r["session_id"]) for r in records})
+            params = {}
+            for i, (user_id, session_id) in enumerate(pairs):
+                params[f'p{i}_user_id'] = user_id
+                params[f'p{i}_session_id'] = session_id
+            placeholders = ", ".join(f"(:p{i}_user_id, :p{i}_session_id)" for i in range(len(pairs)))
+            bookings = db.execute(text(f"""
+                SELECT id, user_id, session_id
+                FROM bookings
+                WHERE (user_id, session_id) IN ({placeholders})
+                  AND status = 'confirmed'
+                FOR UPDATE
+            """), params).fetchall()
+
+            confirmed = {(row[1], row[2]) for row in bookings}
+            rows, rejected, seen = [], [], set()
+            for r in records:
+                key = (r["user_id"], r["session_id"])
+                if key not in confirmed:
+                    rejected.append({**r, "error": "no confirmed booking at flush"})
+                elif key in seen:
+                    rejected.append({**r, "error": "duplicate check-in for the booking"})
+                else:
+                    seen.add(key)
+                    rows.append({k: r[k] for k in ("id", "user_id", "session_id",
+                                                    "branch_id", "checkin_time")})
+            if rows:
+                db.execute(text("""
+                    INSERT INTO checkins (id, user_id, session_id, branch_id, checkin_time)
+                    VALUES (:id, :user_id, :session_id, :branch_id, :checkin_time)
+                """), rows)
+                id_params = {f'b{i}_id': row[0] for i, row in enumerate(bookings)}
+                db.execute(text(f"""
+                    UPDATE bookings
+                    SET status = 'completed'
+                    WHERE id IN ({", ".join(f":{name}" for name in id_params)})
+                """), id_params)
+            db.commit()
+            return len(rows), rejected
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_rows(self, records: list) -> tuple[int, list, list]:
+        """
+        Insert a batch one check-in per transaction
+
+        Returns:
+            (check-ins written, rejected records, failed records), the last
+            two with an "error" reason
+
+        Raises:
+            OperationalError: when the database is unavailable; the caller
+                keeps the batch buffered
+        """
+        written, rejected, failed = 0, [], []
+        for record in records:
+            try:
+                count, refused = self._write_batch([record])
+            except OperationalError:
+                raise
+            except Exception as e:
+                failed.append({**record, "error": str(e)})
+                continue
+            written += count
+            rejected += refused
+        return written, rejected, failed
+
+    def _dead_letter(self, records: list, what: str):
+        """
+        Log acknowledged check-ins that will never be written and keep them on disk
+        """
+        if not records:
+            return
+        logger.error("%d buffered check-ins %s; written to %s: %s", len(records), what,
+                     self.dead_letter_file, sorted({r["error"].splitlines()[0] for r in records}))
+        _append_lines(self.dead_letter_file, records)
+
+    def flush(self) -> bool:
+        """
+        Write everything buffered so far; on failure it stays buffered
+
+        Returns:
+            False when the write failed
+        """
+        with self._lock:
+            if not self._buffer:
+                return True
+            batch, self._buffer = self._buffer, []
+            self._rotate_segment()
+            segments = list(self._pending_segments)
+
+        started = time.perf_counter()
+        try:
+            row_by_row = self._batch_failures >= self.max_batch_failures
+            if row_by_row:
+                written, rejected, failed = self._write_rows(batch)
+            else:
+                (written, rejected), failed = self._write_batch(batch), []
+        except Exception as e:
+            logger.error("Check-in flush of %d rows failed: %s", len(batch), e)
+            with self._lock:
+                self._buffer = batch + self._buffer
+                self._batch_failures += 1
+                self.stats["flush_errors"] += 1
+            return False
+        self._batch_failures = 0
+        self._dead_letter(rejected, "rejected at flush")
+        self._dead_letter(failed, "failed row by row")
+
+        for path in segments:
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._pending_segments = [p for p in self._pending_segments if p not in segments]
+            self._checked_in.difference_update((r["user_id"], r["session_id"]) for r in batch)
+            self.stats["flushes"] += 1
+            self.stats["flushed"] += written
+            self.stats["rejected_at_flush"] += len(rejected)
+            self.stats["dead_lettered"] += len(rejected) + len(failed)
+            self.stats["row_by_row_flushes"] += row_by_row
+            self.stats["last_batch_size"] = len(batch)
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._lock:
+                if failures:
+                    # Back off while the database is unavailable
+                    self._lock.wait(min(2 ** failures, 30))
+                elif self._running and len(self._buffer) < self.flush_rows:
+                    self._lock.wait(self.flush_ms / 1000)
+                running = self._running
+            failures = 0 if self.flush() else failures + 1
+            if not running:
+                return
+
+    # ---------- lifecycle ----------
+
+    def recover(self) -> int:
+        """
+        Replay WAL segments left by processes that are no longer running
+
+        Returns:
+            Number of check-ins recovered into the buffer
+        """
+        if not self.wal_dir.exists():
+            return 0
+        recovered = 0
+        for path in sorted(self.wal_dir.glob("*.jsonl")):
+            pid = int(path.name.split("-", 1)[0])
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            claimed = path.with_name(f"{os.getpid()}-recovered-{path.name}")
+            try:
+                path.rename(claimed)
+            except FileNotFoundError:
+                # Another worker claimed it first
+                continue
+            with open(claimed, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            if not records:
+                claimed.unlink()
+                continue
+            with self._lock:
+                self._buffer.extend(records)
+                self._pending_segments.append(claimed)
+            recovered += len(records)
+        self.stats["replayed"] += recovered
+        return recovered
+
+    def start(self):
+        self._open_segment()
+        self.recover()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="checkin-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Flush what is buffered; anything that fails stays in the WAL for recovery
+        """
+        with self._lock:
+            self._running = False
+            self._lock.notify()
+        if self._thread:
+            self._thread.join()
+        path, f = self._segment
+        f.close()
+        if not path.stat().st_size:
+            path.unlink()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            oldest = self._buffer[0]["logged_at"] if self._buffer else None
+            return {
+                "mode": CHECKIN_INGEST,
+                "buffered": len(self._buffer),
+                "flush_lag_ms": round((time.time() - oldest) * 1000, 1) if oldest else 0.0,
+                "wal_segments_pending": len(self._pending_segments),
+                **self.stats,
+            }
+
+
+checkin_ingestor = CheckinIngestor() if CHECKIN_INGEST == "buffered" else None
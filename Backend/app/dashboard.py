@@ -0,0 +1,64 @@
+"""
+Combined admin dashboard
+
+GET /admin/dashboard returns revenue, active members and popular sessions
+in one payload. Each section runs concurrently on its own pooled
+connection, so the dashboard takes about as long as its slowest query. The
+combined result is kept in the report cache for DASHBOARD_CACHE_SECONDS and
+refreshed by one request at a time (see report_cache.py).
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .report_cache import report_cache
+
+DASHBOARD_CACHE_SECONDS = int(os.getenv("DASHBOARD_CACHE_SECONDS", "15"))
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard")
+
+
+def _run_section(session_factory, section):
+    started = time.perf_counter()
+    db = session_factory()
+    try:
+        return section(db), round((time.perf_counter() - started) * 1000, 2)
+    finally:
+        db.close()
+
+
+def build_dashboard(session_factory, sections: dict) -> dict:
+    """
+    Run every section at once, each with its own session
+
+    Args:
+        session_factory: Creates one session (pooled connection) per section
+        sections: Section name -> function(db) returning its data
+
+    Returns:
+        Dictionary of section results plus timings_ms, total_ms and generated_at
+    """
+    started = time.perf_counter()
+    futures = {
+        name: _executor.submit(_run_section, session_factory, section)
+        for name, section in sections.items()
+    }
+    payload, timings = {}, {}
+    for name, future in futures.items():
+        payload[name], timings[name] = future.result()
+    payload["timings_ms"] = timings
+    payload["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    payload["generated_at"] = datetime.now()
+    return payload
+
+
+def get_dashboard(session_factory, sections: dict) -> dict:
+    """
+    Cached build_dashboard(); "cached" tells whether the payload was reused
+    """
+    payload, cached = report_cache.fetch(
+        "dashboard", lambda db: build_dashboard(session_factory, sections),
+        ttl=DASHBOARD_CACHE_SECONDS
+    )
+    return {**payload, "cached": cached}
@@ -0,0 +1,88 @@
+"""
+Sparse fieldsets for list endpoints
+
+Session list routes accept ?fields=id,name,start_time,available_spots and
+return only those keys. The SELECT list is built from the requested fields,
+so unrequested columns (such as the description TEXT) are never read, and
+rows are serialized as plain dictionaries instead of full response models.
+Without fields= the routes return every field, as before.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# SessionResponse field -> SQL expression (sessions s, branches b, activity_types at)
+SESSION_FIELDS = {
+    "id": "s.id",
+    "studio_id": "s.studio_id",
+    "name": "s.name",
+    "branch_id": "s.branch_id",
+    "branch_name": "b.name",
+    "description": "s.description",
+    "start_time": "s.start_time",
+    "end_time": "s.end_time",
+    "activity_type_id": "s.activity_type_id",
+    "activity_type_name": "at.name",
+    "instructor": "s.instructor",
+    "capacity": "s.capacity",
+    "available_spots": "GREATEST(s.capacity - s.booked_count, 0)",
+}
+
+
+def parse_fields(fields: Optional[str], allowed: dict) -> Optional[list]:
+    """
+    Parse a comma separated fields= value
+
+    Returns:
+        Requested field names in request order (None when fields= is absent)
+
+    Raises:
+        HTTPException: 400 for an empty list or unknown field names
+    """
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in allowed]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}; "
+                   f"allowed: {', '.join(allowed)}"
+        )
+    return requested
+
+
+def session_fields(
+    fields: Optional[str] = Query(
+        None, description="Comma separated session fields to return (default: all)"
+    )
+) -> Optional[list]:
+    """
+    Dependency: the requested session fields, or None for all of them
+    """
+    return parse_fields(fields, SESSION_FIELDS)
+
+
+def select_list(fields: Optional[list], columns: dict, required: tuple = ()) -> str:
+    """
+    SELECT list for the requested fields plus any the route needs itself
+    (e.g. cursor columns), each aliased to its field name
+    """
+    names = list(dict.fromkeys((fields or list(columns)) + list(required)))
+    return ", ".join(f"{columns[name]} as {name}" for name in names)
+
+
+def sparse_rows(rows, fields: list) -> list:
+    """
+    Only the requested keys of each row
+    """
+    return [{name: row._mapping[name] for name in fields} for row in rows]
+
+
+def sparse_response(content) -> JSONResponse:
+    """
+    Response that bypasses the route's response_model, which requires every field
+    """
+    return JSONResponse(content=jsonable_encoder(content))
@@ -0,0 +1,210 @@
+"""
+Idempotency-Key support for retried POST requests
+
+Clients send an `Idempotency-Key` header on purchase / booking / check-in
+requests. The first request with a key runs normally and its response is
+stored; a retry with the same key gets the stored response replayed
+without reaching the route (and its procedures). A retry arriving while the
+first request is still running waits for it instead of running in parallel.
+Stored responses expire after IDEMPOTENCY_TTL_SECONDS. Only 2xx responses
+and request validation errors (422, the same body always fails again) are
+stored. Everything else is not stored, so a retry with the same key runs
+again: 400/404/409 from procedure signals depend on state that can change
+(a spot frees up, a membership is bought), and neither are failed auth
+(401, 403), rate limiting (429) or 5xx responses. A key reused with a
+different body is always answered 422 without running the route.
+
+Keys are scoped to the subject of the verified bearer token and the path.
+A request without a valid token is passed straight to the route, which
+rejects it, so a stored response is only replayed to the user who caused it.
+
+The store lives in the worker process; a retry routed to another worker is
+not deduplicated.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+
+from .auth import verify_session_token
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+MAX_KEY_LENGTH = 255
+
+# POST routes that honour the header
+IDEMPOTENT_PATHS = re.compile(r"^/user/(purchase-membership|book-session|checkin)/")
+
+# Non-2xx statuses that the same request would always get again
+STORED_STATUSES = {422}
+
+# Response headers worth replaying
+_REPLAY_HEADERS = {b"content-type"}
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "status", "headers", "body", "expires")
+
+    def __init__(self, fingerprint: bytes):
+        self.fingerprint = fingerprint
+        self.done = asyncio.Event()
+        self.status = None
+        self.headers = None
+        self.body = None
+        self.expires = None
+
+
+class IdempotencyStore:
+    """
+    Key -> stored response, evicted in insertion order (= expiry order)
+    """
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+                 max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            expired = entry.expires is not None and entry.expires <= now
+            if not expired and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[key]
+
+    def claim(self, key, fingerprint: bytes):
+        """
+        Returns:
+            (entry, True) when the caller must run the request,
+            (entry, False) when another request owns / owned the key
+        """
+        self._evict()
+        entry = self._entries.get(key)
+        if entry and (entry.expires is None or entry.expires > time.monotonic()):
+            return entry, False
+        entry = _Entry(fingerprint)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        return entry, True
+
+    def complete(self, key, entry: _Entry, status: int, headers: list, body: bytes):
+        entry.status, entry.headers, entry.body = status, headers, body
+        entry.expires = time.monotonic() + self.ttl_seconds
+        # Expiry order follows completion order
+        if self._entries.get(key) is entry:
+            self._entries.move_to_end(key)
+        entry.done.set()
+
+    def release(self, key, entry: _Entry):
+        """
+        Forget a key whose request failed, waking waiters so one can retry
+        """
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.done.set()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+async def _send_json(send, status: int, detail: str):
+    body = ('{"detail": "%s"}' % detail).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware applying the store to IDEMPOTENT_PATHS
+    """
+
+    def __init__(self, app, store: IdempotencyStore = None):
+        self.app = app
+        self.store = store or IdempotencyStore()
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not IDEMPOTENT_PATHS.match(scope["path"])):
+            return await self.app(scope, receive, send)
+
+        header = dict(scope["headers"]).get(b"idempotency-key")
+        if header is None:
+            return await self.app(scope, receive, send)
+        if not header or len(header) > MAX_KEY_LENGTH:
+            return await _send_json(send, 400, "Invalid Idempotency-Key header")
+
+        authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        claims = verify_session_token(token) if scheme.lower() == "bearer" and token else None
+        if claims is None:
+            # The route answers 401; nothing is stored or replayed
+            return await self.app(scope, receive, send)
+
+        # Buffer the request body: it is fingerprinted and then replayed to the app
+        chunks, more = [], True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+        fingerprint = hashlib.sha256(body).digest()
+        # Scoped per token subject: another user's key on the same path never matches
+        key = (claims.user_id, scope["path"], header)
+
+        while True:
+            entry, owner = self.store.claim(key, fingerprint)
+            if owner:
+                break
+            await entry.done.wait()
+            if entry.fingerprint != fingerprint:
+                return await _send_json(send, 422, "Idempotency-Key reused with a different request body")
+            if entry.body is not None:
+                await send({"type": "http.response.start", "status": entry.status,
+                            "headers": entry.headers + [
+                                (b"content-length", str(len(entry.body)).encode()),
+                                (b"idempotent-replayed", b"true"),
+                            ]})
+                await send({"type": "http.response.body", "body": entry.body})
+                return
+            # The first request failed and released the key: run this one
+
+        body_sent = False
+
+        async def replay_body():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [(name, value) for name, value in message.get("headers", [])
+                                       if name.lower() in _REPLAY_HEADERS]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            self.store.release(key, entry)
+            raise
+
+        status = response["status"]
+        if not (200 <= status < 300 or status in STORED_STATUSES):
+            self.store.release(key, entry)
+        else:
+            self.store.complete(key, entry, response["status"], response["headers"],
+                                b"".join(response["body"]))
@@ -0,0 +1,67 @@
+"""
+Primary key generation and storage format
+
+Ids are time-ordered UUIDs (version 7 layout: 48-bit millisecond timestamp
+followed by random bits), so new rows land at the end of InnoDB clustered
+indexes instead of at random positions.
+
+By default ids are stored as CHAR(36). Setting ID_STORAGE=binary stores them
+as BINARY(16) (see sql/schema_binary_ids.sql); the conversion happens in
+database.py, so routers and API responses keep working with string ids.
+"""
+import os
+import secrets
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "char" (CHAR(36), default) or "binary" (BINARY(16))
+ID_STORAGE = os.getenv("ID_STORAGE", "char").lower()
+USE_BINARY_IDS = ID_STORAGE == "binary"
+
+
+def new_id() -> str:
+    """
+    Generate a time-ordered UUID (v7 layout)
+
+    Returns:
+        Canonical 36 character UUID string
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(secrets.token_bytes(10), "big")
+
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76                           # version 7
+    value |= ((rand >> 64) & 0x0FFF) << 64       # rand_a (12 bits)
+    value |= 0b10 << 62                          # RFC 4122 variant
+    value |= rand & 0x3FFFFFFFFFFFFFFF           # rand_b (62 bits)
+    return str(uuid.UUID(int=value))
+
+
+def is_uuid(value) -> bool:
+    """
+    Check whether a value is a canonical UUID string
+    """
+    if not isinstance(value, str) or len(value) != 36:
+        return False
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+def id_to_bytes(value: str) -> bytes:
+    """
+    Convert a UUID string to its 16 byte storage form
+    """
+    return uuid.UUID(value).bytes
+
+
+def bytes_to_id(value: bytes) -> str:
+    """
+    Convert a 16 byte stored id back to its UUID string
+    """
+    return str(uuid.UUID(bytes=value))
@@ -1,17 +1,56 @@
 """
 Main FastAPI application
 """
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import user, admin
+from .idempotency import IdempotencyMiddleware
+from .auth import start_revocation_sync
+from .database import SessionLocal, engine
+from .warmup import warm_up, check_ready
+from .tasks import task_queue
+from .checkin_ingest import checkin_ingestor
+
+# Cold-start cost of importing the application (reported by /ready)
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm the worker up before it serves traffic; stop background jobs on exit
+    """
+    # Keep the token revocation set in sync with the database
+    app.state.stop_revocation_sync = start_revocation_sync(SessionLocal)
+    app.state.warmup = warm_up(engine, SessionLocal)
+    task_queue.start()
+    if checkin_ingestor:
+        checkin_ingestor.start()
+    yield
+    if checkin_ingestor:
+        checkin_ingestor.stop()
+    task_queue.stop()
+    app.state.stop_revocation_sync.set()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Fitness Management System API",
     description="Complete Fitness Management System with MySQL DBMS",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Idempotency-Key replay for purchase / booking / check-in retries.
+# Added before CORS so CORS stays the outermost layer and also applies to
+# replayed and rejected responses.
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS middleware - Allow React frontend to connect
 app.add_middleware(
     CORSMiddleware,
@@ -50,6 +89,26 @@ def health_check():
     }
 
 
+@app.get("/ready")
+def readiness_check(response: Response):
+    """
+    Readiness check: DB round trip, pool state, warmup and import timings
+    """
+    report = check_ready(engine)
+    warmup = getattr(app.state, "warmup", None)
+    ready = report["database"] == "ok" and warmup is not None
+    if not ready:
+        response.status_code = 503
+    
+    return {
+        "status": "ready" if ready else "not ready",
+        **report,
+        "warmup": warmup,
+        "tasks": task_queue.metrics(),
+        "import_seconds": IMPORT_SECONDS
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,52 @@
+"""
+Occupancy heatmaps built from the check-in rollup tables
+"""
+import numpy as np
+
+HOURS_PER_WEEK = 7 * 24
+
+
+def build_occupancy_matrices(branch_ids: list, activity_type_ids: list,
+                             hourly_rows: list, activity_rows: list) -> dict:
+    """
+    Turn grouped rollup rows into branch x time / branch x activity matrices
+
+    Args:
+        branch_ids: Branch ids, in the row order of the matrices
+        activity_type_ids: Activity type ids, in the column order of by_activity
+        hourly_rows: (branch_id, weekday 0=Monday, hour, checkins) rows
+        activity_rows: (branch_id, activity_type_id, checkins) rows
+
+    Returns:
+        Dictionary of NumPy matrices:
+            hour_of_week: branches x 168 (Monday 00:00 first)
+            by_weekday:   branches x 7
+            by_hour:      branches x 24
+            by_activity:  branches x activity types
+    """
+    branch_index = {branch_id: i for i, branch_id in enumerate(branch_ids)}
+    activity_index = {activity_id: i for i, activity_id in enumerate(activity_type_ids)}
+
+    hour_of_week = np.zeros((len(branch_ids), HOURS_PER_WEEK), dtype=np.int64)
+    # Rows for deleted branches / activity types are ignored
+    hourly = [(branch_index[b], weekday * 24 + hour, count)
+              for b, weekday, hour, count in hourly_rows if b in branch_index]
+    if hourly:
+        rows, cols, counts = np.array(hourly, dtype=np.int64).T
+        np.add.at(hour_of_week, (rows, cols), counts)
+
+    by_activity = np.zeros((len(branch_ids), len(activity_type_ids)), dtype=np.int64)
+    activity = [(branch_index[b], activity_index[a], count)
+                for b, a, count in activity_rows
+                if b in branch_index and a in activity_index]
+    if activity:
+        rows, cols, counts = np.array(activity, dtype=np.int64).T
+        np.add.at(by_activity, (rows, cols), counts)
+
+    by_day_and_hour = hour_of_week.reshape(len(branch_ids), 7, 24)
+    return {
+        "hour_of_week": hour_of_week,
+        "by_weekday": by_day_and_hour.sum(axis=2),
+        "by_hour": by_day_and_hour.sum(axis=1),
+        "by_activity": by_activity,
+    }
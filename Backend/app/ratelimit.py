@@ -0,0 +1,158 @@
+"""
+Token-bucket rate limiting for the password (bcrypt) routes
+
+/user/login and /user/register each cost one bcrypt operation. Before the
+route runs, a request must take a token from its client IP's bucket, its
+email's bucket and the global password-operation budget, which caps bcrypt
+work per second for the whole host (each worker enforces its share). Otherwise it is answered with 429 and
+Retry-After, with no bcrypt work done. Per-key buckets are kept in an LRU
+of at most RATE_LIMIT_MAX_KEYS entries each.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+# (burst, tokens per second)
+IP_LIMIT = (
+    int(os.getenv("RATE_LIMIT_IP_BURST", "20")),
+    float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "1")),
+)
+EMAIL_LIMIT = (
+    int(os.getenv("RATE_LIMIT_EMAIL_BURST", "5")),
+    float(os.getenv("RATE_LIMIT_EMAIL_PER_SECOND", "0.1")),
+)
+# Roughly half the cores' worth of bcrypt hashes at the default cost, so
+# bookings keep CPU during a credential-stuffing burst. This is the budget
+# for the whole host: each of the WEB_CONCURRENCY worker processes (exported
+# by gunicorn.conf.py, 1 without it) gets an equal share in its own bucket.
+PASSWORD_OPS_PER_SECOND = float(
+    os.getenv("PASSWORD_OPS_PER_SECOND", str(max(1, (os.cpu_count() or 1) // 2) * 4))
+)
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+PASSWORD_OPS_PER_WORKER = PASSWORD_OPS_PER_SECOND / WEB_WORKERS
+
+
+class TokenBucketSet:
+    """
+    Token buckets keyed by client IP / email, least recently used evicted first
+    """
+
+    def __init__(self, burst: int, per_second: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.burst = burst
+        self.per_second = per_second
+        self.max_keys = max_keys
+        # key -> [tokens, last refill time]
+        self._buckets = OrderedDict()
+        self.evicted = 0
+
+    def _refill(self, key, now: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.per_second)
+            bucket[1] = now
+        return bucket
+
+    def wait_time(self, key, now: float) -> float:
+        """
+        Seconds until `key` has a token (0 when one is available)
+        """
+        tokens = self._refill(key, now)[0]
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.per_second
+
+    def take(self, key):
+        self._buckets[key][0] -= 1
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class PasswordRateLimiter:
+    """
+    Per-IP, per-email and global limits checked and charged together
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_ip = TokenBucketSet(*IP_LIMIT)
+        self.by_email = TokenBucketSet(*EMAIL_LIMIT)
+        # Single bucket: one second of burst on top of the steady rate
+        self.global_budget = TokenBucketSet(
+            max(1, math.ceil(PASSWORD_OPS_PER_WORKER)), PASSWORD_OPS_PER_WORKER, max_keys=1
+        )
+        self.allowed = 0
+        self.rejected = {"ip": 0, "email": 0, "global": 0}
+
+    def acquire(self, ip: str, email) -> float:
+        """
+        Take one token from every applicable bucket, or none of them
+
+        Returns:
+            0 when allowed, otherwise seconds the client should wait
+        """
+        checks = [("ip", self.by_ip, ip), ("global", self.global_budget, None)]
+        if email:
+            checks.insert(1, ("email", self.by_email, email.lower()))
+
+        with self._lock:
+            now = time.monotonic()
+            for name, buckets, key in checks:
+                wait = buckets.wait_time(key, now)
+                if wait:
+                    self.rejected[name] += 1
+                    return wait
+            for _, buckets, key in checks:
+                buckets.take(key)
+            self.allowed += 1
+            return 0.0
+
+    def metrics(self) -> dict:
+        with self._lock:
+            global_bucket = self.global_budget._refill(None, time.monotonic())
+            return {
+                "allowed": self.allowed,
+                "rejected": dict(self.rejected),
+                "ip_buckets": len(self.by_ip),
+                "ip_buckets_evicted": self.by_ip.evicted,
+                "email_buckets": len(self.by_email),
+                "email_buckets_evicted": self.by_email.evicted,
+                "max_keys": RATE_LIMIT_MAX_KEYS,
+                "password_ops_per_second": PASSWORD_OPS_PER_SECOND,
+                "password_ops_per_worker": round(PASSWORD_OPS_PER_WORKER, 3),
+                "password_budget_tokens": round(global_bucket[0], 2),
+            }
+
+
+password_rate_limiter = PasswordRateLimiter()
+
+
+async def limit_password_attempts(request: Request):
+    """
+    Dependency for routes that run bcrypt: 429 before any hashing happens
+    """
+    try:
+        body = await request.json()
+        email = body.get("email") if isinstance(body, dict) else None
+    except ValueError:
+        # Malformed bodies are rejected by validation; still charge the IP
+        email = None
+
+    ip = request.client.host if request.client else "unknown"
+    wait = password_rate_limiter.acquire(ip, email if isinstance(email, str) else None)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
@@ -0,0 +1,283 @@
+"""
+Shared report result cache with single-flight recomputation
+
+Admin reports are cached for REPORT_CACHE_SECONDS under a key built from
+the report name and its parameters:
+
+- A fresh entry is returned as is. Once REPORT_CACHE_REFRESH_AHEAD of its
+  lifetime is left, one background refresh recomputes it before it expires.
+- An expired entry is recomputed by the first request that takes the key's
+  lock. Requests arriving meanwhile get the stale value (for at most
+  REPORT_CACHE_STALE_SECONDS past expiry) instead of running the same
+  queries again.
+- Without a usable entry, requests wait for the lock holder and reuse its
+  result.
+
+Backends (REPORT_CACHE_BACKEND):
+
+- memory (default): per worker.
+- file: entries and locks are files under var/report-cache, shared by every
+  worker on the host, so one worker recomputes a report for all of them.
+  Any store offering get / set / try-lock / unlock (such as Redis) can
+  implement the same four methods.
+"""
+import fcntl
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .database import SessionLocal
+from .tasks import TASK_DATA_DIR
+
+REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory").lower()
+REPORT_CACHE_SECONDS = int(os.getenv("REPORT_CACHE_SECONDS", "60"))
+REPORT_CACHE_STALE_SECONDS = int(os.getenv("REPORT_CACHE_STALE_SECONDS", "300"))
+# Share of an entry's lifetime left when the background refresh starts
+REPORT_CACHE_REFRESH_AHEAD = float(os.getenv("REPORT_CACHE_REFRESH_AHEAD", "0.2"))
+REPORT_CACHE_MAX_KEYS = int(os.getenv("REPORT_CACHE_MAX_KEYS", "1000"))
+REPORT_CACHE_DIR = TASK_DATA_DIR / "report-cache"
+# Number of lock files the file backend spreads keys over
+REPORT_CACHE_LOCK_SHARDS = 256
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """
+    Per-worker entries (LRU-bounded) and per-key thread locks
+    """
+
+    def __init__(self, max_keys: int = REPORT_CACHE_MAX_KEYS):
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: str):
+        with self._guard:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict):
+        with self._guard:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                evicted, _ = self._entries.popitem(last=False)
+                lock = self._locks.get(evicted)
+                if lock is not None and not lock.locked():
+                    del self._locks[evicted]
+
+    def lock(self, key: str, blocking: bool):
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        return lock if lock.acquire(blocking) else None
+
+    def unlock(self, handle):
+        handle.release()
+
+
+class FileBackend:
+    """
+    Entries and locks shared through files, for every worker on the host
+
+    Entries are pickled and replaced atomically; the single-flight lock is
+    an flock on one of REPORT_CACHE_LOCK_SHARDS lock files, released if the
+    holder dies. Lock files are never deleted, since a file unlinked while
+    someone waits on it would let two holders in, so they are bounded by
+    sharding instead of being created per key.
+    """
+
+    def __init__(self, directory=REPORT_CACHE_DIR):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._writes = 0
+
+    def _path(self, key: str, suffix: str):
+        return self.directory / (hashlib.sha1(key.encode()).hexdigest() + suffix)
+
+    def _lock_path(self, key: str):
+        shard = int(hashlib.sha1(key.encode()).hexdigest(), 16) % REPORT_CACHE_LOCK_SHARDS
+        return self.directory / f"shard-{shard}.lock"
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key, ".pkl"), "rb") as f:
+                entry = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        # Guard against hash collisions
+        return entry if entry.get("key") == key else None
+
+    def set(self, key: str, entry: dict):
+        path = self._path(key, ".pkl")
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({**entry, "key": key}, f)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        """
+        Delete entries that are past their stale limit, and per-key lock
+        files left by earlier versions
+        """
+        now = time.time()
+        for path in self.directory.glob("*.lock"):
+            if not path.name.startswith("shard-"):
+                path.unlink(missing_ok=True)
+        for path in self.directory.glob("*.pkl"):
+            try:
+                with open(path, "rb") as f:
+                    entry = pickle.load(f)
+                if entry["stale_until"] < now:
+                    path.unlink()
+            except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+                continue
+
+    def lock(self, key: str, blocking: bool):
+        handle = open(self._lock_path(key), "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+        return handle
+
+    def unlock(self, handle):
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+
+class ReportCache:
+    """
+    Stale-while-revalidate cache over a backend, with single-flight refreshes
+    """
+
+    def __init__(self, backend, session_factory=None):
+        self.backend = backend
+        self.session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="report-cache")
+        self._counters = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "waits": 0,
+            "refreshes": 0, "refresh_errors": 0,
+        }
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def _store(self, key: str, value, ttl: int):
+        now = time.time()
+        self.backend.set(key, {
+            "value": value,
+            "computed_at": now,
+            "refresh_at": now + ttl * (1 - REPORT_CACHE_REFRESH_AHEAD),
+            "expires_at": now + ttl,
+            "stale_until": now + ttl + REPORT_CACHE_STALE_SECONDS,
+        })
+
+    def _refresh(self, key: str, compute, ttl: int, handle):
+        """
+        Background refresh on a new session; releases the key's lock
+        """
+        db = self.session_factory() if self.session_factory else None
+        try:
+            self._store(key, compute(db), ttl)
+            self._count("refreshes")
+        except Exception:
+            self._count("refresh_errors")
+            logger.warning("Background refresh of report %s failed", key, exc_info=True)
+        finally:
+            if db is not None:
+                db.close()
+            self.backend.unlock(handle)
+
+    def fetch(self, key: str, compute, db=None, ttl: int = REPORT_CACHE_SECONDS):
+        """
+        Cached compute(db)
+
+        Args:
+            key: Report name and parameters
+            compute: function(db) computing the report
+            db: Session used when this request computes the report itself
+            ttl: Seconds an entry is served before it is recomputed
+
+        Returns:
+            (value, cached) where cached is False when this call computed it
+        """
+        entry = self.backend.get(key)
+        now = time.time()
+        if entry is not None and now < entry["expires_at"]:
+            if now >= entry["refresh_at"]:
+                handle = self.backend.lock(key, blocking=False)
+                if handle is not None:
+                    self._executor.submit(self._refresh, key, compute, ttl, handle)
+            self._count("hits")
+            return entry["value"], True
+
+        usable = entry is not None and now < entry["stale_until"]
+        handle = self.backend.lock(key, blocking=not usable)
+        if handle is None:
+            # Someone else is recomputing it
+            self._count("stale_hits")
+            return entry["value"], True
+        try:
+            # The lock holder we waited for may have stored a fresh entry
+            entry = self.backend.get(key)
+            if entry is not None and time.time() < entry["expires_at"]:
+                self._count("waits")
+                return entry["value"], True
+            self._count("misses")
+            value = compute(db)
+            self._store(key, value, ttl)
+            return value, False
+        finally:
+            self.backend.unlock(handle)
+
+    def metrics(self) -> dict:
+        with self._counter_lock:
+            return {"backend": type(self.backend).__name__, **self._counters}
+
+
+def _backend():
+    if REPORT_CACHE_BACKEND == "file":
+        return FileBackend()
+    return MemoryBackend()
+
+
+report_cache = ReportCache(_backend(), SessionLocal)
+
+
+def cache_key(name: str, params: dict) -> str:
+    return f"{name}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def cached_report(name: str, ttl: int = REPORT_CACHE_SECONDS):
+    """
+    Decorator caching a report route by its parameters (everything but db)
+
+    The route keeps its signature, so FastAPI resolves its query parameters
+    and dependencies as before. Background refreshes call it with a new
+    session.
+    """
+    def decorator(route):
+        @functools.wraps(route)
+        def wrapper(**kwargs):
+            db = kwargs.pop("db", None)
+            compute = lambda session: route(**kwargs, db=session)
+            return report_cache.fetch(cache_key(name, kwargs), compute, db, ttl)[0]
+        return wrapper
+    return decorator
@@ -1,22 +1,41 @@
 """
 Admin routes - Manage branches, studios, sessions, plans, coupons, reports
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+import time
+from bisect import bisect_left
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List
-import uuid
+from typing import List, Optional
+from datetime import date, timedelta
 
-from ..database import get_db
+from ..database import get_db, SessionLocal
+from ..ids import new_id
 from ..schemas import (
+    MAX_SESSION_HOURS,
     BranchCreate, BranchResponse,
     StudioCreate, StudioResponse,
     ActivityTypeCreate, ActivityTypeResponse,
-    SessionCreate, SessionResponse,
+    SessionCreate, SessionResponse, SessionBatchResult,
     MembershipPlanCreate, MembershipPlanResponse,
     CouponCreate, CouponResponse,
     MessageResponse,
-    RevenueReport, UserActivityReport, SessionPopularityReport
+    RevenueReport, UserActivityReport, SessionPopularityReport, DashboardResponse,
+    OccupancyReport, RetentionCohortReport, PlanChurnReport, VisitFrequencyReport,
+    RevenuePerMemberReport
+)
+from ..occupancy import build_occupancy_matrices
+from .. import analytics, catalog
+from ..dashboard import get_dashboard
+from ..report_cache import cached_report, cache_key, report_cache
+from .. import timetable
+from ..schedule import ScheduleIndex, schedule_index
+from ..ratelimit import password_rate_limiter
+from ..checkin_ingest import checkin_ingestor
+from ..fieldsets import SESSION_FIELDS, session_fields, select_list, sparse_rows, sparse_response
+from ..snapshots import (
+    SnapshotUnavailable, revenue_by_branch, active_member_count, snapshot_status
 )
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -32,7 +51,7 @@ def create_branch(branch: BranchCreate, db: Session = Depends(get_db)):
     Create a new branch
     """
     try:
-        branch_id = str(uuid.uuid4())
+        branch_id = new_id()
         query = text("""
             INSERT INTO branches (id, name, address, city, state, zip_code, phone)
             VALUES (:id, :name, :address, :city, :state, :zip, :phone)
@@ -167,7 +186,7 @@ def create_studio(studio: StudioCreate, db: Session = Depends(get_db)):
     Create a new studio
     """
     try:
-        studio_id = str(uuid.uuid4())
+        studio_id = new_id()
         query = text("""
             INSERT INTO studios (id, name, floor, capacity, branch_id)
             VALUES (:id, :name, :floor, :capacity, :branch_id)
@@ -253,7 +272,7 @@ def create_activity_type(activity: ActivityTypeCreate, db: Session = Depends(get
     Create a new activity type
     """
     try:
-        activity_id = str(uuid.uuid4())
+        activity_id = new_id()
         query = text("""
             INSERT INTO activity_types (id, name, description, is_active)
             VALUES (:id, :name, :description, 1)
@@ -318,63 +337,213 @@ def get_all_activity_types(db: Session = Depends(get_db)):
 # SESSION MANAGEMENT
 # ==========================================
 
+# Raised by the create_session procedure when a locked re-check finds a clash
+OVERLAP_ERROR = "Session overlaps an existing session"
+
+
+def _insert_session(db, session: SessionCreate) -> str:
+    """
+    Insert one session through the create_session procedure
+
+    Returns:
+        The new session id
+    """
+    db.execute(text("""
+        CALL create_session(
+            :studio_id, :name, :branch_id, :description,
+            :start_time, :end_time, :activity_type_id,
+            :instructor, :capacity, @session_id
+        )
+    """), session.model_dump())
+    return db.execute(text("SELECT @session_id")).fetchone()[0]
+
+
+def _locked_batch_conflicts(db, sessions: List[SessionCreate]) -> list:
+    """
+    Re-check a validated batch against the database under create_session's locks
+
+    Locks the batch's studio rows, then reads (FOR UPDATE) the sessions of its
+    studios and instructors starting within the batch's time span, widened by
+    MAX_SESSION_HOURS. Those rows are checked in memory like the worker index.
+
+    Returns:
+        Conflicts per proposed session, as ScheduleIndex.validate_batch
+    """
+    studio_params = {f'studio_{i}': s for i, s in enumerate(sorted({s.studio_id for s in sessions}))}
+    instructor_params = {
+        f'instructor_{i}': s
+        for i, s in enumerate(sorted({s.instructor for s in sessions if s.instructor}))
+    }
+    window = {
+        'window_from': min(s.start_time for s in sessions) - timedelta(hours=MAX_SESSION_HOURS),
+        'window_to': max(s.end_time for s in sessions),
+    }
+    db.execute(text(f"""
+        SELECT id FROM studios
+        WHERE id IN ({", ".join(f":{name}" for name in studio_params)})
+        ORDER BY id
+        FOR UPDATE
+    """), studio_params)
+    rows = db.execute(text(f"""
+        SELECT id, studio_id, instructor, start_time, end_time
+        FROM sessions
+        WHERE studio_id IN ({", ".join(f":{name}" for name in studio_params)})
+          AND start_time > :window_from AND start_time < :window_to
+        FOR UPDATE
+    """), {**studio_params, **window}).fetchall()
+    if instructor_params:
+        rows += db.execute(text(f"""
+            SELECT id, studio_id, instructor, start_time, end_time
+            FROM sessions
+            WHERE instructor IN ({", ".join(f":{name}" for name in instructor_params)})
+              AND start_time > :window_from AND start_time < :window_to
+            FOR UPDATE
+        """), {**instructor_params, **window}).fetchall()
+    
+    guard = ScheduleIndex()
+    guard.load({row[0]: row for row in rows}.values())
+    return guard.validate_batch(sessions)
+
+
+def _insert_sessions(db, sessions: List[SessionCreate]) -> List[str]:
+    """
+    Insert a validated batch with one multi-row INSERT
+
+    Returns:
+        The new session ids, in batch order
+    """
+    rows = [{'id': new_id(), **session.model_dump()} for session in sessions]
+    db.execute(text("""
+        INSERT INTO sessions (id, studio_id, name, branch_id, description, start_time,
+                              end_time, activity_type_id, instructor, capacity)
+        VALUES (:id, :studio_id, :name, :branch_id, :description, :start_time,
+                :end_time, :activity_type_id, :instructor, :capacity)
+    """), rows)
+    return [row['id'] for row in rows]
+
+
+def _overlap_conflict() -> HTTPException:
+    """
+    409 for an overlap the database caught but this worker's index missed
+    """
+    schedule_index.expire()
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": OVERLAP_ERROR, "conflicts": []}
+    )
+
+
 @router.post("/sessions")
-def create_session(session: SessionCreate, db: Session = Depends(get_db)):
+def create_session(
+    session: SessionCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
     Create a new session
+    
+    Rejected with 409 when the studio or instructor is already booked
+    for an overlapping time.
     """
     try:
-        query = text("""
-            CALL create_session(
-                :studio_id, :name, :branch_id, :description,
-                :start_time, :end_time, :activity_type_id,
-                :instructor, :capacity, @session_id
+        schedule_index.ensure_loaded(db)
+        conflicts = schedule_index.conflicts(
+            session.studio_id, session.instructor, session.start_time, session.end_time
+        )
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": OVERLAP_ERROR, "conflicts": conflicts}
             )
-        """)
-        
-        db.execute(query, {
-            'studio_id': session.studio_id,
-            'name': session.name,
-            'branch_id': session.branch_id,
-            'description': session.description,
-            'start_time': session.start_time,
-            'end_time': session.end_time,
-            'activity_type_id': session.activity_type_id,
-            'instructor': session.instructor,
-            'capacity': session.capacity
-        })
-        
-        result = db.execute(text("SELECT @session_id")).fetchone()
-        session_id = result[0]
         
+        # The procedure re-checks under row locks; a race lost here is a 409 below
+        session_id = _insert_session(db, session)
         db.commit()
+        schedule_index.add(
+            session_id, session.studio_id, session.instructor, session.start_time, session.end_time
+        )
+        timetable.session_created(background_tasks, session.branch_id, session.start_time)
         
         return {
             "message": "Session created successfully",
             "session_id": session_id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
+        if OVERLAP_ERROR in str(e):
+            raise _overlap_conflict()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create session: {str(e)}"
         )
 
 
+@router.post("/sessions/batch", response_model=SessionBatchResult)
+def create_sessions_batch(
+    sessions: List[SessionCreate],
+    background_tasks: BackgroundTasks,
+    validate_only: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Validate and import a whole schedule (e.g. a season) in one pass
+    
+    Every session is checked against existing sessions and the rest of the
+    batch. Nothing is inserted when any session conflicts or when
+    validate_only is set; otherwise the batch is re-checked against the
+    database under row locks and inserted with one multi-row INSERT.
+    """
+    try:
+        schedule_index.ensure_loaded(db)
+        conflicts = schedule_index.validate_batch(sessions)
+        
+        if validate_only or any(conflicts) or not sessions:
+            return SessionBatchResult(created=0, session_ids=[], conflicts=conflicts)
+        
+        # Sessions other workers created since this worker's index was loaded
+        conflicts = _locked_batch_conflicts(db, sessions)
+        if any(conflicts):
+            db.rollback()
+            schedule_index.expire()
+            return SessionBatchResult(created=0, session_ids=[], conflicts=conflicts)
+        
+        session_ids = _insert_sessions(db, sessions)
+        db.commit()
+        
+        for session_id, session in zip(session_ids, sessions):
+            schedule_index.add(
+                session_id, session.studio_id, session.instructor,
+                session.start_time, session.end_time
+            )
+        for branch_id, week in {(s.branch_id, timetable.week_start(s.start_time.date())) for s in sessions}:
+            background_tasks.add_task(timetable.rebuild, branch_id, week)
+        
+        return SessionBatchResult(
+            created=len(session_ids), session_ids=session_ids, conflicts=conflicts
+        )
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import sessions: {str(e)}"
+        )
+
+
 @router.get("/sessions", response_model=List[SessionResponse])
-def get_all_sessions(db: Session = Depends(get_db)):
+def get_all_sessions(
+    fields: Optional[List[str]] = Depends(session_fields),
+    db: Session = Depends(get_db)
+):
     """
-    Get all sessions (including past ones)
+    Get all sessions, including past ones (only the given fields with ?fields=)
     """
     try:
-        query = text("""
-            SELECT 
-                s.id, s.studio_id, s.name, s.branch_id, s.description,
-                s.start_time, s.end_time, s.activity_type_id, s.instructor, s.capacity,
-                b.name as branch_name,
-                at.name as activity_type_name,
-                get_available_spots(s.id) as available_spots
+        query = text(f"""
+            SELECT {select_list(fields, SESSION_FIELDS)}
             FROM sessions s
             JOIN branches b ON s.branch_id = b.id
             JOIN activity_types at ON s.activity_type_id = at.id
@@ -383,24 +552,9 @@ def get_all_sessions(db: Session = Depends(get_db)):
         
         results = db.execute(query).fetchall()
         
-        return [
-            SessionResponse(
-                id=row[0],
-                studio_id=row[1],
-                name=row[2],
-                branch_id=row[3],
-                description=row[4],
-                start_time=row[5],
-                end_time=row[6],
-                activity_type_id=row[7],
-                instructor=row[8],
-                capacity=row[9],
-                branch_name=row[10],
-                activity_type_name=row[11],
-                available_spots=row[12]
-            )
-            for row in results
-        ]
+        if fields:
+            return sparse_response(sparse_rows(results, fields))
+        return [SessionResponse(**row._mapping) for row in results]
         
     except Exception as e:
         raise HTTPException(
@@ -410,7 +564,11 @@ def get_all_sessions(db: Session = Depends(get_db)):
 
 
 @router.delete("/sessions/{session_id}", response_model=MessageResponse)
-def delete_session(session_id: str, db: Session = Depends(get_db)):
+def delete_session(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
     Delete a session
     """
@@ -418,6 +576,8 @@ def delete_session(session_id: str, db: Session = Depends(get_db)):
         query = text("DELETE FROM sessions WHERE id = :id")
         db.execute(query, {'id': session_id})
         db.commit()
+        schedule_index.remove(session_id)
+        timetable.session_deleted(background_tasks, session_id)
         
         return MessageResponse(message="Session deleted successfully")
         
@@ -439,7 +599,7 @@ def create_membership_plan(plan: MembershipPlanCreate, db: Session = Depends(get
     Create a new membership plan
     """
     try:
-        plan_id = str(uuid.uuid4())
+        plan_id = new_id()
         query = text("""
             INSERT INTO membership_plans (id, name, description, price, duration_months, is_active)
             VALUES (:id, :name, :description, :price, :duration, 1)
@@ -453,6 +613,7 @@ def create_membership_plan(plan: MembershipPlanCreate, db: Session = Depends(get
             'duration': plan.duration_months
         })
         db.commit()
+        catalog.invalidate()
         
         result = db.execute(
             text("SELECT * FROM membership_plans WHERE id = :id"),
@@ -487,7 +648,7 @@ def create_coupon(coupon: CouponCreate, db: Session = Depends(get_db)):
     Create a new coupon
     """
     try:
-        coupon_id = str(uuid.uuid4())
+        coupon_id = new_id()
         query = text("""
             INSERT INTO coupons (id, code, description, discount_type, discount_value, valid_from, valid_to, is_active)
             VALUES (:id, :code, :description, :type, :value, :from, :to, 1)
@@ -503,6 +664,7 @@ def create_coupon(coupon: CouponCreate, db: Session = Depends(get_db)):
             'to': coupon.valid_to
         })
         db.commit()
+        catalog.invalidate()
         
         result = db.execute(
             text("SELECT * FROM coupons WHERE id = :id"),
@@ -567,12 +729,53 @@ def get_all_coupons(db: Session = Depends(get_db)):
 # REPORTS & ANALYTICS
 # ==========================================
 
+# source=snapshot computes a report from the columnar snapshots (app/snapshots.py)
+# instead of the live tables
+REPORT_SOURCE = Query("live", pattern="^(live|snapshot)$")
+
+
+def _snapshot_unavailable(e: SnapshotUnavailable):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e)
+    )
+
+
+def _branch_revenue_from_snapshot(db, start_date, end_date) -> list:
+    """
+    Revenue report rows (name, city, sessions, bookings, revenue) from the snapshots
+    """
+    totals = revenue_by_branch(start_date, end_date)
+    branches = db.execute(text("SELECT id, name, city FROM branches")).fetchall()
+    rows = [(row[1], row[2], *totals.get(row[0], (0, 0, 0.0))) for row in branches]
+    return sorted(rows, key=lambda row: row[4], reverse=True)
+
+
 @router.get("/reports/revenue", response_model=List[RevenueReport])
-def get_revenue_report(db: Session = Depends(get_db)):
+@cached_report("revenue")
+def get_revenue_report(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    source: str = REPORT_SOURCE,
+    db: Session = Depends(get_db)
+):
     """
-    Get branch-wise revenue report
+    Get branch-wise revenue report, optionally for payments in a date range
+    (the range prunes the monthly payments partitions)
     """
     try:
+        if source == "snapshot":
+            return [
+                RevenueReport(
+                    branch_name=row[0],
+                    city=row[1],
+                    total_sessions=row[2],
+                    total_bookings=row[3],
+                    total_revenue=row[4]
+                )
+                for row in _branch_revenue_from_snapshot(db, start_date, end_date)
+            ]
+
         query = text("""
             SELECT 
                 b.name AS branch_name,
@@ -584,11 +787,16 @@ def get_revenue_report(db: Session = Depends(get_db)):
             LEFT JOIN sessions s ON b.id = s.branch_id
             LEFT JOIN bookings bk ON s.id = bk.session_id
             LEFT JOIN payments p ON bk.id = p.booking_id AND p.status = 'success'
+                AND (:start_date IS NULL OR p.payment_time >= :start_date)
+                AND (:end_date IS NULL OR p.payment_time < DATE_ADD(:end_date, INTERVAL 1 DAY))
             GROUP BY b.id, b.name, b.city
             ORDER BY total_revenue DESC
         """)
         
-        results = db.execute(query).fetchall()
+        results = db.execute(query, {
+            'start_date': start_date,
+            'end_date': end_date
+        }).fetchall()
         
         return [
             RevenueReport(
@@ -601,6 +809,8 @@ def get_revenue_report(db: Session = Depends(get_db)):
             for row in results
         ]
         
+    except SnapshotUnavailable as e:
+        raise _snapshot_unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -608,44 +818,141 @@ def get_revenue_report(db: Session = Depends(get_db)):
         )
 
 
+# Longest date range the user activity ranking accepts
+USER_ACTIVITY_MAX_RANGE_DAYS = int(os.getenv("USER_ACTIVITY_MAX_RANGE_DAYS", "92"))
+
+
+def _activity_range(start_date: Optional[date], end_date: Optional[date]):
+    """
+    Complete a partial date range and enforce USER_ACTIVITY_MAX_RANGE_DAYS
+    """
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=USER_ACTIVITY_MAX_RANGE_DAYS - 1)
+    if start_date > end_date or (end_date - start_date).days >= USER_ACTIVITY_MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range must be 1 to {USER_ACTIVITY_MAX_RANGE_DAYS} days"
+        )
+    return start_date, end_date
+
+
+def _activity_ranking(db, start_date: date, end_date: date) -> tuple:
+    """
+    Every user's activity within a date range, computed once per range
+
+    Returns:
+        (keys, rows): rows sorted ascending by (total_checkins, user_id) as
+        (user_id, total_checkins, branches_visited, first_checkin,
+        last_checkin, cancelled_bookings), and their (total, user_id) keys
+    """
+    # Range scan on the (day, user_id, branch_id) primary key
+    results = db.execute(text("""
+        SELECT 
+            user_id,
+            SUM(checkins) AS total_checkins,
+            COUNT(DISTINCT CASE WHEN checkins > 0 THEN branch_id END) AS branches_visited,
+            MIN(first_checkin) AS first_checkin,
+            MAX(last_checkin) AS last_checkin,
+            SUM(cancellations) AS cancelled_bookings
+        FROM user_daily_activity
+        WHERE day BETWEEN :start_date AND :end_date
+        GROUP BY user_id
+        HAVING total_checkins > 0
+    """), {'start_date': start_date, 'end_date': end_date}).fetchall()
+    rows = sorted(
+        ((row[0], int(row[1]), int(row[2]), row[3], row[4], int(row[5])) for row in results),
+        key=lambda row: (row[1], row[0])
+    )
+    return [(row[1], row[0]) for row in rows], rows
+
+
 @router.get("/reports/user-activity", response_model=List[UserActivityReport])
-def get_user_activity_report(db: Session = Depends(get_db)):
+def get_user_activity_report(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=500),
+    after_checkins: Optional[int] = None,
+    after_user_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """
-    Get user activity report with check-ins
+    Get user activity report ranked by check-ins, from the incrementally
+    maintained activity aggregates.
+
+    Pages with a keyset: pass the last row's total_checkins and user_id as
+    after_checkins / after_user_id to get the next page. With a date range
+    (at most USER_ACTIVITY_MAX_RANGE_DAYS) the ranking covers only activity
+    within that range; it is computed once per range and kept in the report
+    cache, so further pages are a bisect into it.
     """
     try:
-        query = text("""
-            SELECT 
-                u.name,
-                u.email,
-                COUNT(c.id) AS total_checkins,
-                COUNT(DISTINCT c.branch_id) AS branches_visited,
-                MIN(c.checkin_time) AS first_checkin,
-                MAX(c.checkin_time) AS last_checkin,
-                (SELECT COUNT(*) FROM bookings WHERE user_id = u.id AND status = 'cancelled') AS cancelled_bookings
-            FROM users u
-            LEFT JOIN checkins c ON u.id = c.user_id
-            GROUP BY u.id, u.name, u.email
-            HAVING COUNT(c.id) > 0
-            ORDER BY total_checkins DESC
-            LIMIT 50
-        """)
-        
-        results = db.execute(query).fetchall()
+        params = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'limit': limit,
+            'after_checkins': after_checkins,
+            'after_user_id': after_user_id or ''
+        }
+
+        if start_date is None and end_date is None:
+            query = text("""
+                SELECT 
+                    u.id,
+                    u.name,
+                    u.email,
+                    s.total_checkins,
+                    s.branches_visited,
+                    s.first_checkin,
+                    s.last_checkin,
+                    s.cancelled_bookings
+                FROM user_activity_stats s
+                JOIN users u ON u.id = s.user_id
+                WHERE s.total_checkins > 0
+                  AND (:after_checkins IS NULL
+                       OR s.total_checkins < :after_checkins
+                       OR (s.total_checkins = :after_checkins AND s.user_id < :after_user_id))
+                ORDER BY s.total_checkins DESC, s.user_id DESC
+                LIMIT :limit
+            """)
+            results = db.execute(query, params).fetchall()
+        else:
+            start_date, end_date = _activity_range(start_date, end_date)
+            keys, ranking = report_cache.fetch(
+                cache_key("user-activity", {"start_date": start_date, "end_date": end_date}),
+                lambda session: _activity_ranking(session, start_date, end_date), db
+            )[0]
+            # Ranking is ascending: the page is the `limit` rows before the cursor
+            stop = (bisect_left(keys, (after_checkins, after_user_id or ''))
+                    if after_checkins is not None else len(keys))
+            page = ranking[max(stop - limit, 0):stop][::-1]
+            users = {}
+            if page:
+                user_params = {f'u{i}_id': row[0] for i, row in enumerate(page)}
+                users = {row[0]: row for row in db.execute(text(f"""
+                    SELECT id, name, email FROM users
+                    WHERE id IN ({", ".join(f":{name}" for name in user_params)})
+                """), user_params).fetchall()}
+            results = [
+                (row[0], users[row[0]][1], users[row[0]][2], *row[1:])
+                for row in page if row[0] in users
+            ]
         
         return [
             UserActivityReport(
-                name=row[0],
-                email=row[1],
-                total_checkins=row[2],
-                branches_visited=row[3],
-                first_checkin=row[4],
-                last_checkin=row[5],
-                cancelled_bookings=row[6]
+                user_id=row[0],
+                name=row[1],
+                email=row[2],
+                total_checkins=int(row[3]),
+                branches_visited=int(row[4]),
+                first_checkin=row[5],
+                last_checkin=row[6],
+                cancelled_bookings=int(row[7])
             )
             for row in results
         ]
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -654,9 +961,11 @@ def get_user_activity_report(db: Session = Depends(get_db)):
 
 
 @router.get("/reports/popular-sessions", response_model=List[SessionPopularityReport])
+@cached_report("popular-sessions")
 def get_popular_sessions_report(db: Session = Depends(get_db)):
     """
-    Get most popular sessions report
+    Get most popular sessions report (confirmed + completed bookings, taken
+    from the booked_count counter)
     """
     try:
         query = text("""
@@ -665,17 +974,14 @@ def get_popular_sessions_report(db: Session = Depends(get_db)):
                 s.instructor,
                 at.name AS activity_type,
                 b.name AS branch_name,
-                COUNT(bk.id) AS total_bookings,
+                s.booked_count AS total_bookings,
                 s.capacity AS max_capacity,
-                ROUND((COUNT(bk.id) / s.capacity) * 100, 2) AS booking_percentage
+                ROUND((s.booked_count / s.capacity) * 100, 2) AS booking_percentage
             FROM sessions s
-            INNER JOIN bookings bk ON s.id = bk.session_id
             INNER JOIN activity_types at ON s.activity_type_id = at.id
             INNER JOIN branches b ON s.branch_id = b.id
-            WHERE bk.status IN ('confirmed', 'completed')
-            GROUP BY s.id, s.name, s.instructor, at.name, b.name, s.capacity
-            HAVING COUNT(bk.id) > 0
-            ORDER BY total_bookings DESC
+            WHERE s.booked_count > 0
+            ORDER BY s.booked_count DESC
             LIMIT 20
         """)
         
@@ -702,11 +1008,15 @@ def get_popular_sessions_report(db: Session = Depends(get_db)):
 
 
 @router.get("/reports/active-members")
-def get_active_members_count(db: Session = Depends(get_db)):
+@cached_report("active-members")
+def get_active_members_count(source: str = REPORT_SOURCE, db: Session = Depends(get_db)):
     """
     Get count of active members
     """
     try:
+        if source == "snapshot":
+            return {"active_members": active_member_count()}
+
         query = text("""
             SELECT COUNT(DISTINCT user_id) as active_members
             FROM memberships
@@ -719,6 +1029,8 @@ def get_active_members_count(db: Session = Depends(get_db)):
             "active_members": result[0]
         }
         
+    except SnapshotUnavailable as e:
+        raise _snapshot_unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -727,11 +1039,29 @@ def get_active_members_count(db: Session = Depends(get_db)):
 
 
 @router.get("/reports/top-performing-branch")
-def get_top_performing_branch(db: Session = Depends(get_db)):
+@cached_report("top-performing-branch")
+def get_top_performing_branch(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    source: str = REPORT_SOURCE,
+    db: Session = Depends(get_db)
+):
     """
-    Get top performing branch by revenue
+    Get top performing branch by revenue, optionally within a date range
     """
     try:
+        if source == "snapshot":
+            rows = _branch_revenue_from_snapshot(db, start_date, end_date)
+            if not rows:
+                return {"message": "No data available"}
+            top = rows[0]
+            return {
+                "branch_name": top[0],
+                "city": top[1],
+                "total_bookings": top[3],
+                "total_revenue": top[4]
+            }
+
         query = text("""
             SELECT 
                 b.name AS branch_name,
@@ -742,12 +1072,17 @@ def get_top_performing_branch(db: Session = Depends(get_db)):
             LEFT JOIN sessions s ON b.id = s.branch_id
             LEFT JOIN bookings bk ON s.id = bk.session_id
             LEFT JOIN payments p ON bk.id = p.booking_id AND p.status = 'success'
+                AND (:start_date IS NULL OR p.payment_time >= :start_date)
+                AND (:end_date IS NULL OR p.payment_time < DATE_ADD(:end_date, INTERVAL 1 DAY))
             GROUP BY b.id, b.name, b.city
             ORDER BY total_revenue DESC
             LIMIT 1
         """)
         
-        result = db.execute(query).fetchone()
+        result = db.execute(query, {
+            'start_date': start_date,
+            'end_date': end_date
+        }).fetchone()
         
         if result:
             return {
@@ -759,8 +1094,270 @@ def get_top_performing_branch(db: Session = Depends(get_db)):
         else:
             return {"message": "No data available"}
         
+    except SnapshotUnavailable as e:
+        raise _snapshot_unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get top performing branch: {str(e)}"
         )
+
+
+# Dashboard section -> report query, each run on its own connection
+DASHBOARD_SECTIONS = {
+    "revenue": lambda db: get_revenue_report(start_date=None, end_date=None, source="live", db=db),
+    "active_members": lambda db: get_active_members_count(source="live", db=db)["active_members"],
+    "popular_sessions": lambda db: get_popular_sessions_report(db=db),
+}
+
+
+@router.get("/dashboard", response_model=DashboardResponse)
+def get_admin_dashboard():
+    """
+    Revenue, active members and popular sessions in one response, queried
+    concurrently and cached briefly
+    """
+    try:
+        return get_dashboard(SessionLocal, DASHBOARD_SECTIONS)
+        
+    except HTTPException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Failed to load dashboard: {e.detail}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load dashboard: {str(e)}"
+        )
+
+
+@router.get("/reports/occupancy", response_model=OccupancyReport)
+@cached_report("occupancy")
+def get_occupancy_report(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get branch occupancy heatmaps (hour of week, weekday, hour, activity type)
+    from the check-in rollups. Defaults to the last 12 weeks.
+    """
+    try:
+        end_date = end_date or date.today()
+        start_date = start_date or end_date - timedelta(weeks=12)
+        params = {'start_date': start_date, 'end_date': end_date}
+
+        branches = db.execute(
+            text("SELECT id, name FROM branches ORDER BY name ASC")
+        ).fetchall()
+        activity_types = db.execute(
+            text("SELECT id, name FROM activity_types ORDER BY name ASC")
+        ).fetchall()
+
+        hourly_rows = db.execute(text("""
+            SELECT branch_id, WEEKDAY(hour_start) AS weekday, HOUR(hour_start) AS hour,
+                   CAST(SUM(checkins) AS SIGNED) AS checkins
+            FROM checkin_hourly_rollup
+            WHERE hour_start >= :start_date
+              AND hour_start < DATE_ADD(:end_date, INTERVAL 1 DAY)
+            GROUP BY branch_id, weekday, hour
+        """), params).fetchall()
+
+        activity_rows = db.execute(text("""
+            SELECT branch_id, activity_type_id, CAST(SUM(checkins) AS SIGNED) AS checkins
+            FROM checkin_daily_activity_rollup
+            WHERE day BETWEEN :start_date AND :end_date
+            GROUP BY branch_id, activity_type_id
+        """), params).fetchall()
+
+        matrices = build_occupancy_matrices(
+            [row[0] for row in branches],
+            [row[0] for row in activity_types],
+            hourly_rows,
+            activity_rows
+        )
+
+        return OccupancyReport(
+            start_date=start_date,
+            end_date=end_date,
+            branch_ids=[row[0] for row in branches],
+            branch_names=[row[1] for row in branches],
+            activity_type_names=[row[1] for row in activity_types],
+            **{name: matrix.tolist() for name, matrix in matrices.items()}
+        )
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate occupancy report: {str(e)}"
+        )
+
+
+# ==========================================
+# ANALYTICS
+# ==========================================
+
+# Analytics read the columnar snapshots unless source=live
+ANALYTICS_SOURCE = Query("snapshot", pattern="^(live|snapshot)$")
+MEMBERSHIP_COLUMNS = ["user_id", "membership_plan_id", "status", "start_date", "end_date"]
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+@router.get("/analytics/retention", response_model=RetentionCohortReport)
+@cached_report("retention")
+def get_retention_cohorts(
+    months: int = Query(12, ge=1, le=analytics.MAX_MONTHS),
+    source: str = ANALYTICS_SOURCE,
+    db: Session = Depends(get_db)
+):
+    """
+    Membership retention by joining-month cohort
+    """
+    try:
+        started = time.perf_counter()
+        memberships = analytics.load(db, source, "memberships", MEMBERSHIP_COLUMNS)
+        report = analytics.retention_cohorts(memberships, months)
+        return RetentionCohortReport(source=source, computed_ms=_elapsed_ms(started), **report)
+        
+    except SnapshotUnavailable as e:
+        raise _snapshot_unavailable(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute retention cohorts: {str(e)}"
+        )
+
+
+@router.get("/analytics/churn", response_model=PlanChurnReport)
+@cached_report("churn")
+def get_churn_by_plan(
+    months: int = Query(12, ge=1, le=60),
+    grace_days: int = Query(30, ge=0, le=365),
+    source: str = ANALYTICS_SOURCE,
+    db: Session = Depends(get_db)
+):
+    """
+    Monthly churn rate per membership plan (no renewal within grace_days)
+    """
+    try:
+        started = time.perf_counter()
+        memberships = analytics.load(db, source, "memberships", MEMBERSHIP_COLUMNS)
+        report = analytics.churn_by_plan(memberships, months, grace_days)
+        plan_names = dict(db.execute(text("SELECT id, name FROM membership_plans")).fetchall())
+        return PlanChurnReport(
+            source=source,
+            plan_names=[plan_names.get(plan_id) for plan_id in report["plan_ids"]],
+            computed_ms=_elapsed_ms(started),
+            **report
+        )
+        
+    except SnapshotUnavailable as e:
+        raise _snapshot_unavailable(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute churn: {str(e)}"
+        )
+
+
+@router.get("/analytics/visit-frequency", response_model=VisitFrequencyReport)
+@cached_report("visit-frequency")
+def get_visit_frequency(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    max_visits: int = Query(20, ge=1, le=100),
+    source: str = ANALYTICS_SOURCE,
+    db: Session = Depends(get_db)
+):
+    """
+    Distribution of check-ins per member over a date range (default: last 30 days)
+    """
+    try:
+        started = time.perf_counter()
+        start_date, end_date = analytics.default_range(start_date, end_date)
+        memberships = analytics.load(db, source, "memberships", MEMBERSHIP_COLUMNS)
+        checkins = analytics.load(db, source, "checkins", ["user_id", "checkin_time"])
+        report = analytics.visit_frequency(checkins, memberships, start_date, end_date, max_visits)
+        return VisitFrequencyReport(
+            source=source,
+            start_date=start_date,
+            end_date=end_date,
+            computed_ms=_elapsed_ms(started),
+            **report
+        )
+        
+    except SnapshotUnavailable as e:
+        raise _snapshot_unavailable(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute visit frequency: {str(e)}"
+        )
+
+
+@router.get("/analytics/revenue-per-member", response_model=RevenuePerMemberReport)
+@cached_report("revenue-per-member")
+def get_revenue_per_member(
+    months: int = Query(12, ge=1, le=60),
+    source: str = ANALYTICS_SOURCE,
+    db: Session = Depends(get_db)
+):
+    """
+    Monthly revenue per paying member and lifetime revenue per member
+    """
+    try:
+        started = time.perf_counter()
+        payments = analytics.load(db, source, "payments",
+                                  ["user_id", "amount", "status", "payment_time"])
+        report = analytics.revenue_per_member(payments, months)
+        return RevenuePerMemberReport(source=source, computed_ms=_elapsed_ms(started), **report)
+        
+    except SnapshotUnavailable as e:
+        raise _snapshot_unavailable(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute revenue per member: {str(e)}"
+        )
+
+
+# ==========================================
+# METRICS
+# ==========================================
+
+@router.get("/metrics/rate-limits")
+def get_rate_limit_metrics():
+    """
+    Login / register rate limiter counters and bucket usage (this worker)
+    """
+    return password_rate_limiter.metrics()
+
+
+@router.get("/metrics/checkin-ingest")
+def get_checkin_ingest_metrics():
+    """
+    Buffered check-in ingestion: flush lag, batch sizes and WAL state (this worker)
+    """
+    if not checkin_ingestor:
+        return {"mode": "direct"}
+    return checkin_ingestor.metrics()
+
+
+@router.get("/metrics/snapshots")
+def get_snapshot_status():
+    """
+    Columnar snapshot watermarks, partitions and row counts per table
+    """
+    return snapshot_status()
+
+
+@router.get("/metrics/report-cache")
+def get_report_cache_metrics():
+    """
+    Report cache hits, stale hits, misses and background refreshes (this worker)
+    """
+    return report_cache.metrics()
@@ -1,33 +1,50 @@
 """
 User routes - Registration, Login, Profile, Memberships, Bookings, Check-ins
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List
-import uuid
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, date
 
-from ..database import get_db
+from ..database import get_db, SessionLocal
+from ..ids import new_id
+from ..search import to_boolean_query
+from .. import catalog, timetable
+from ..fieldsets import SESSION_FIELDS, session_fields, select_list, sparse_rows, sparse_response
+from ..ratelimit import limit_password_attempts
+from ..tasks import enqueue
+from ..checkin_ingest import checkin_ingestor, NoConfirmedBooking
 from ..schemas import (
     UserRegister, UserLogin, UserResponse, UserWithStats,
     MembershipPurchase, MembershipResponse, MessageResponse,
-    SessionResponse, BookingCreate, BookingResponse,
-    CheckinCreate, CheckinResponse, PaymentResponse,
-    MembershipPlanResponse
+    SessionResponse, SessionSearchPage, BookingCreate, BookingResponse,
+    CheckinCreate, CheckinResponse, CheckinBatch, CheckinBatchResult, PaymentResponse,
+    MembershipPlanResponse, TimetableResponse, UserHome
+)
+from ..auth import (
+    hash_password, verify_password, needs_rehash, rehash_password,
+    generate_session_token, revoke_token,
+    TokenClaims, TOKEN_TTL_SECONDS, get_token_claims, authorize_user, require_admin
 )
-from ..auth import hash_password, verify_password
 
 router = APIRouter(prefix="/user", tags=["User"])
 
+logger = logging.getLogger(__name__)
+
 
-@router.post("/register", response_model=UserResponse)
+@router.post(
+    "/register",
+    response_model=UserResponse,
+    dependencies=[Depends(limit_password_attempts)]
+)
 def register_user(user: UserRegister, db: Session = Depends(get_db)):
     """
     Register a new user
     """
     try:
-        user_id = str(uuid.uuid4())
+        user_id = new_id()
         hashed_pwd = hash_password(user.password)
         
         # Call stored procedure to add user
@@ -52,7 +69,7 @@ def register_user(user: UserRegister, db: Session = Depends(get_db)):
                 VALUES (:id, :phone, :user_id, 'mobile', 0)
             """)
             db.execute(phone_query, {
-                'id': str(uuid.uuid4()),
+                'id': new_id(),
                 'phone': user.phone_number,
                 'user_id': user_id
             })
@@ -88,8 +105,12 @@ def register_user(user: UserRegister, db: Session = Depends(get_db)):
         )
 
 
-@router.post("/login")
-def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
+@router.post("/login", dependencies=[Depends(limit_password_attempts)])
+def login_user(
+    credentials: UserLogin,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
     Login user and return user info
     """
@@ -111,8 +132,17 @@ def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
                 detail="Invalid email or password"
             )
         
+        # Migrate hashes made at an old cost factor after the response is sent
+        if needs_rehash(result[3]):
+            background_tasks.add_task(
+                rehash_password, SessionLocal, result[0], credentials.password, result[3]
+            )
+        
         return {
             "message": "Login successful",
+            "access_token": generate_session_token(result[0], result[4]),
+            "token_type": "bearer",
+            "expires_in": TOKEN_TTL_SECONDS,
             "user": {
                 "id": result[0],
                 "name": result[1],
@@ -130,7 +160,27 @@ def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
         )
 
 
-@router.get("/profile/{user_id}", response_model=UserWithStats)
+@router.post("/logout", response_model=MessageResponse)
+def logout_user(
+    claims: TokenClaims = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+):
+    """
+    Revoke the caller's access token
+    """
+    try:
+        revoke_token(db, claims)
+        return MessageResponse(message="Logged out successfully")
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Logout failed: {str(e)}"
+        )
+
+
+@router.get("/profile/{user_id}", response_model=UserWithStats, dependencies=[Depends(authorize_user)])
 def get_user_profile(user_id: str, db: Session = Depends(get_db)):
     """
     Get user profile with statistics
@@ -247,7 +297,7 @@ def get_membership_plans(db: Session = Depends(get_db)):
         )
 
 
-@router.post("/purchase-membership/{user_id}")
+@router.post("/purchase-membership/{user_id}", dependencies=[Depends(authorize_user)])
 def purchase_membership(
     user_id: str,
     purchase: MembershipPurchase,
@@ -290,6 +340,7 @@ def purchase_membership(
         
         discount_amount = 0
         coupon_message = ""
+        coupon_error_msg = None
         final_amount = amount
         
         # Apply coupon if provided
@@ -331,7 +382,9 @@ def purchase_membership(
                 else:
                     coupon_message = f" Note: Coupon could not be applied"
                 
-                print(f"Coupon error: {coupon_error}")
+                coupon_error_msg = error_msg
+                logger.warning("Coupon %s not applied for user %s: %s",
+                               purchase.coupon_code, user_id, error_msg)
                 # Don't rollback the entire transaction, just continue without coupon
         
         # Mark payment as success
@@ -342,6 +395,12 @@ def purchase_membership(
         
         db.commit()
         
+        # Side effects run after the response, off the request path
+        enqueue("send_receipt", payment_id=payment_id)
+        enqueue("record_event", event="membership_purchased", user_id=user_id,
+                plan_id=purchase.plan_id, payment_id=payment_id, amount=final_amount,
+                coupon_code=purchase.coupon_code, coupon_error=coupon_error_msg)
+        
         return {
             "message": f"Membership purchased successfully!{coupon_message}",
             "membership_id": membership_id,
@@ -360,7 +419,11 @@ def purchase_membership(
         )
 
 
-@router.get("/my-memberships/{user_id}", response_model=List[MembershipResponse])
+@router.get(
+    "/my-memberships/{user_id}",
+    response_model=List[MembershipResponse],
+    dependencies=[Depends(authorize_user)]
+)
 def get_user_memberships(user_id: str, db: Session = Depends(get_db)):
     """
     Get all memberships for a user
@@ -398,46 +461,118 @@ def get_user_memberships(user_id: str, db: Session = Depends(get_db)):
         )
 
 
-@router.get("/sessions", response_model=List[SessionResponse])
-def get_available_sessions(db: Session = Depends(get_db)):
+@router.get("/home/{user_id}", response_model=UserHome, dependencies=[Depends(authorize_user)])
+def get_user_home(user_id: str, db: Session = Depends(get_db)):
     """
-    Get all available sessions
+    Get everything the member pages show in one request: profile with
+    statistics, current and past memberships, active plans and valid coupons
     """
     try:
+        # Profile, statistics and memberships in one round trip
         query = text("""
             SELECT 
-                s.id, s.studio_id, s.name, s.branch_id, s.description,
-                s.start_time, s.end_time, s.activity_type_id, s.instructor, s.capacity,
-                b.name as branch_name,
-                at.name as activity_type_name,
-                get_available_spots(s.id) as available_spots
+                u.id, u.name, u.email, u.role, u.date_of_birth, u.gender, u.created_at,
+                stats.total_checkins, stats.active_membership,
+                m.id, m.user_id, m.start_date, m.end_date, m.status,
+                mp.name as plan_name, mp.price as plan_price
+            FROM users u
+            CROSS JOIN (
+                SELECT get_user_checkin_count(:user_id) as total_checkins,
+                       is_active_member(:user_id) as active_membership
+            ) stats
+            LEFT JOIN memberships m ON m.user_id = u.id
+            LEFT JOIN membership_plans mp ON m.membership_plan_id = mp.id
+            WHERE u.id = :user_id
+            ORDER BY m.created_at DESC
+        """)
+        
+        results = db.execute(query, {'user_id': user_id}).fetchall()
+        
+        if not results:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        first = results[0]
+        profile = UserWithStats(
+            id=first[0],
+            name=first[1],
+            email=first[2],
+            role=first[3],
+            date_of_birth=first[4],
+            gender=first[5],
+            created_at=first[6],
+            total_checkins=first[7],
+            active_membership=bool(first[8])
+        )
+        
+        today = date.today()
+        current, past = [], []
+        for row in results:
+            if row[9] is None:
+                continue
+            membership = MembershipResponse(
+                id=row[9],
+                user_id=row[10],
+                start_date=row[11],
+                end_date=row[12],
+                status=row[13],
+                plan_name=row[14],
+                plan_price=float(row[15])
+            )
+            if row[12] >= today and row[13] in ('active', 'pending'):
+                current.append(membership)
+            else:
+                past.append(membership)
+        
+        # Plans and coupons are the same for every member
+        now = datetime.now().isoformat(timespec="seconds")
+        coupons = [
+            coupon for coupon in catalog.cached("coupons", get_active_coupons, db)
+            if coupon["valid_from"] <= now <= coupon["valid_to"]
+        ]
+        
+        return UserHome(
+            profile=profile,
+            current_memberships=current,
+            past_memberships=past,
+            plans=catalog.cached("plans", get_membership_plans, db),
+            coupons=coupons
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch home: {str(e)}"
+        )
+
+
+@router.get("/sessions", response_model=List[SessionResponse])
+def get_available_sessions(
+    fields: Optional[List[str]] = Depends(session_fields),
+    db: Session = Depends(get_db)
+):
+    """
+    Get all available sessions (only the given fields with ?fields=)
+    """
+    try:
+        query = text(f"""
+            SELECT {select_list(fields, SESSION_FIELDS)}
             FROM sessions s
             JOIN branches b ON s.branch_id = b.id
             JOIN activity_types at ON s.activity_type_id = at.id
-            WHERE s.capacity > 0 AND s.start_time > NOW()
+            WHERE s.booked_count < s.capacity AND s.start_time > NOW()
             ORDER BY s.start_time ASC
         """)
         
         results = db.execute(query).fetchall()
         
-        return [
-            SessionResponse(
-                id=row[0],
-                studio_id=row[1],
-                name=row[2],
-                branch_id=row[3],
-                description=row[4],
-                start_time=row[5],
-                end_time=row[6],
-                activity_type_id=row[7],
-                instructor=row[8],
-                capacity=row[9],
-                branch_name=row[10],
-                activity_type_name=row[11],
-                available_spots=row[12]
-            )
-            for row in results
-        ]
+        if fields:
+            return sparse_response(sparse_rows(results, fields))
+        return [SessionResponse(**row._mapping) for row in results]
         
     except Exception as e:
         raise HTTPException(
@@ -446,7 +581,168 @@ def get_available_sessions(db: Session = Depends(get_db)):
         )
 
 
-@router.post("/book-session/{user_id}")
+@router.get("/sessions/search", response_model=SessionSearchPage)
+def search_sessions(
+    branch_id: Optional[str] = None,
+    activity_type_id: Optional[str] = None,
+    instructor: Optional[str] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    has_spots: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+    after_start_time: Optional[datetime] = None,
+    after_id: Optional[str] = None,
+    fields: Optional[List[str]] = Depends(session_fields),
+    db: Session = Depends(get_db)
+):
+    """
+    Search upcoming sessions by branch, activity type, instructor and time
+    window, one page at a time.
+
+    Results are ordered by (start_time, id); pass next_after_start_time /
+    next_after_id from the previous page to continue. The branch, activity
+    type and instructor filters each have a (column, start_time) index.
+    With ?fields= each session has only the given keys.
+    """
+    try:
+        # The cursor columns are read even when not requested
+        query = text(f"""
+            SELECT {select_list(fields, SESSION_FIELDS, required=("id", "start_time"))}
+            FROM sessions s
+            JOIN branches b ON s.branch_id = b.id
+            JOIN activity_types at ON s.activity_type_id = at.id
+            WHERE s.start_time >= COALESCE(:start_from, NOW())
+              AND (:start_to IS NULL OR s.start_time < :start_to)
+              AND (:branch_id IS NULL OR s.branch_id = :branch_id)
+              AND (:activity_type_id IS NULL OR s.activity_type_id = :activity_type_id)
+              AND (:instructor IS NULL OR s.instructor = :instructor)
+              AND (:has_spots = 0 OR s.booked_count < s.capacity)
+              AND (:after_start_time IS NULL
+                   OR s.start_time > :after_start_time
+                   OR (s.start_time = :after_start_time AND s.id > :after_id))
+            ORDER BY s.start_time ASC, s.id ASC
+            LIMIT :limit
+        """)
+        
+        results = db.execute(query, {
+            'branch_id': branch_id,
+            'activity_type_id': activity_type_id,
+            'instructor': instructor,
+            'start_from': start_from,
+            'start_to': start_to,
+            'has_spots': int(has_spots),
+            'after_start_time': after_start_time,
+            'after_id': after_id or '',
+            'limit': limit
+        }).fetchall()
+        
+        last = results[-1] if len(results) == limit else None
+        page = {
+            "next_after_start_time": last.start_time if last else None,
+            "next_after_id": last.id if last else None
+        }
+        
+        if fields:
+            return sparse_response({"sessions": sparse_rows(results, fields), **page})
+        return SessionSearchPage(
+            sessions=[SessionResponse(**row._mapping) for row in results],
+            **page
+        )
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search sessions: {str(e)}"
+        )
+
+
+@router.get("/sessions/search/text", response_model=List[SessionResponse])
+def search_sessions_text(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[List[str]] = Depends(session_fields),
+    db: Session = Depends(get_db)
+):
+    """
+    Ranked full-text search over upcoming sessions and their activity types
+
+    Matches session name, description and instructor plus activity type
+    name and description; every word is a prefix ("yog" finds "Yoga").
+    Candidates come from the two FULLTEXT indexes, so only matching
+    sessions are scored and sorted for the top `limit`. With ?fields= each
+    session has only the given keys.
+    """
+    terms = to_boolean_query(q)
+    if not terms:
+        return []
+    
+    try:
+        query = text(f"""
+            SELECT 
+                {select_list(fields, SESSION_FIELDS)},
+                MATCH(s.name, s.description, s.instructor) AGAINST (:terms IN BOOLEAN MODE)
+                  + MATCH(at.name, at.description) AGAINST (:terms IN BOOLEAN MODE) as score
+            FROM (
+                SELECT id FROM sessions
+                WHERE MATCH(name, description, instructor) AGAINST (:terms IN BOOLEAN MODE)
+                UNION
+                SELECT s2.id
+                FROM activity_types a2
+                JOIN sessions s2 ON s2.activity_type_id = a2.id AND s2.start_time > NOW()
+                WHERE MATCH(a2.name, a2.description) AGAINST (:terms IN BOOLEAN MODE)
+            ) hits
+            JOIN sessions s ON s.id = hits.id
+            JOIN branches b ON s.branch_id = b.id
+            JOIN activity_types at ON s.activity_type_id = at.id
+            WHERE s.start_time > NOW()
+            ORDER BY score DESC, s.start_time ASC
+            LIMIT :limit
+        """)
+        
+        results = db.execute(query, {'terms': terms, 'limit': limit}).fetchall()
+        
+        if fields:
+            return sparse_response(sparse_rows(results, fields))
+        return [SessionResponse(**row._mapping) for row in results]
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search sessions: {str(e)}"
+        )
+
+
+@router.get("/timetable/{branch_id}", response_model=TimetableResponse)
+def get_branch_timetable(
+    branch_id: str,
+    week: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Weekly timetable of a branch (any date in the week, default this week)
+    
+    Served from a precomputed, pre-serialized snapshot; see app/timetable.py.
+    """
+    try:
+        body = timetable.get_timetable(db, branch_id, week or date.today())
+        if not body:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Branch not found"
+            )
+        
+        return Response(content=body, media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch timetable: {str(e)}"
+        )
+
+
+@router.post("/book-session/{user_id}", dependencies=[Depends(authorize_user)])
 def book_session(
     user_id: str,
     booking: BookingCreate,
@@ -466,11 +762,17 @@ def book_session(
             'session_id': booking.session_id
         })
         
-        # Get output variable
-        result = db.execute(text("SELECT @booking_id")).fetchone()
+        # Get output variable, plus the new count while the trigger's row lock is held
+        result = db.execute(
+            text("SELECT @booking_id, (SELECT booked_count FROM sessions WHERE id = :session_id)"),
+            {'session_id': booking.session_id}
+        ).fetchone()
         booking_id = result[0]
         
         db.commit()
+        timetable.update_booked_count(booking.session_id, result[1])
+        enqueue("record_event", event="session_booked", user_id=user_id,
+                session_id=booking.session_id, booking_id=booking_id)
         
         return {
             "message": "Session booked successfully!",
@@ -496,7 +798,7 @@ def book_session(
         )
 
 
-@router.get("/my-bookings/{user_id}")
+@router.get("/my-bookings/{user_id}", dependencies=[Depends(authorize_user)])
 def get_user_bookings(user_id: str, db: Session = Depends(get_db)):
     """
     Get all bookings for a user
@@ -544,17 +846,49 @@ def get_user_bookings(user_id: str, db: Session = Depends(get_db)):
 
 
 @router.put("/cancel-booking/{booking_id}", response_model=MessageResponse)
-def cancel_booking(booking_id: str, db: Session = Depends(get_db)):
+def cancel_booking(
+    booking_id: str,
+    claims: TokenClaims = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+):
     """
     Cancel a booking
     """
     try:
+        booking = db.execute(
+            text("SELECT user_id, session_id FROM bookings WHERE id = :booking_id"),
+            {'booking_id': booking_id}
+        ).fetchone()
+        
+        if not booking:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Booking not found"
+            )
+        if booking[0] != claims.user_id and claims.role != 'admin':
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not allowed to cancel another user's booking"
+            )
+        
         query = text("CALL cancel_booking(:booking_id)")
         db.execute(query, {'booking_id': booking_id})
+        
+        booked_count = db.execute(
+            text("SELECT booked_count FROM sessions WHERE id = :session_id"),
+            {'session_id': booking[1]}
+        ).fetchone()
+        
         db.commit()
+        if booked_count:
+            timetable.update_booked_count(booking[1], booked_count[0])
+        enqueue("record_event", event="booking_cancelled", user_id=booking[0],
+                session_id=booking[1], booking_id=booking_id)
         
         return MessageResponse(message="Booking cancelled successfully")
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -563,7 +897,97 @@ def cancel_booking(booking_id: str, db: Session = Depends(get_db)):
         )
 
 
-@router.post("/checkin/{user_id}")
+@router.post("/checkin/batch", response_model=CheckinBatchResult, dependencies=[Depends(require_admin)])
+def checkin_batch(batch: CheckinBatch, db: Session = Depends(get_db)):
+    """
+    Check in many members at once (kiosk check-in wave)
+    
+    All pairs are validated against confirmed bookings with one locking
+    query, then the check-ins are inserted and the bookings completed in
+    the same transaction. Pairs without a confirmed booking are reported
+    per item and do not fail the batch.
+    """
+    try:
+        pairs = []
+        results = []
+        seen = set()
+        for item in batch.checkins:
+            key = (item.user_id, item.session_id)
+            results.append({
+                "user_id": item.user_id,
+                "session_id": item.session_id,
+                "status": "duplicate" if key in seen else "no_booking",
+                "checkin_id": None
+            })
+            if key not in seen:
+                seen.add(key)
+                pairs.append(key)
+        
+        # Row-constructor IN over idx_bookings_user_session_status
+        params = {}
+        for i, (user_id, session_id) in enumerate(pairs):
+            params[f'p{i}_user_id'] = user_id
+            params[f'p{i}_session_id'] = session_id
+        placeholders = ", ".join(f"(:p{i}_user_id, :p{i}_session_id)" for i in range(len(pairs)))
+        bookings = db.execute(text(f"""
+            SELECT b.id, b.user_id, b.session_id, s.branch_id
+            FROM bookings b
+            JOIN sessions s ON b.session_id = s.id
+            WHERE (b.user_id, b.session_id) IN ({placeholders})
+              AND b.status = 'confirmed'
+            FOR UPDATE
+        """), params).fetchall()
+        
+        # One check-in per pair even if several confirmed bookings exist
+        booked = {}
+        for booking_id, user_id, session_id, branch_id in bookings:
+            booked.setdefault((user_id, session_id), []).append((booking_id, branch_id))
+        
+        checkins = []
+        for result in results:
+            key = (result["user_id"], result["session_id"])
+            if result["status"] == "duplicate" or key not in booked:
+                continue
+            result["status"] = "checked_in"
+            result["checkin_id"] = new_id()
+            checkins.append({
+                'id': result["checkin_id"],
+                'user_id': key[0],
+                'session_id': key[1],
+                'branch_id': booked[key][0][1]
+            })
+        
+        if checkins:
+            db.execute(text("""
+                INSERT INTO checkins (id, user_id, session_id, branch_id)
+                VALUES (:id, :user_id, :session_id, :branch_id)
+            """), checkins)
+            
+            booking_ids = [booking_id for key in booked for booking_id, _ in booked[key]]
+            id_params = {f'b{i}_id': booking_id for i, booking_id in enumerate(booking_ids)}
+            db.execute(text(f"""
+                UPDATE bookings
+                SET status = 'completed'
+                WHERE id IN ({", ".join(f":{name}" for name in id_params)})
+            """), id_params)
+        
+        db.commit()
+        
+        for checkin in checkins:
+            enqueue("record_event", event="checked_in", user_id=checkin['user_id'],
+                    session_id=checkin['session_id'], checkin_id=checkin['id'])
+        
+        return CheckinBatchResult(checked_in=len(checkins), results=results)
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch check-in failed: {str(e)}"
+        )
+
+
+@router.post("/checkin/{user_id}", dependencies=[Depends(authorize_user)])
 def checkin_user(
     user_id: str,
     checkin: CheckinCreate,
@@ -573,19 +997,25 @@ def checkin_user(
     Check-in user for a session
     """
     try:
-        query = text("""
-            CALL checkin_user(:user_id, :session_id, @checkin_id)
-        """)
-        
-        db.execute(query, {
-            'user_id': user_id,
-            'session_id': checkin.session_id
-        })
-        
-        result = db.execute(text("SELECT @checkin_id")).fetchone()
-        checkin_id = result[0]
-        
-        db.commit()
+        if checkin_ingestor:
+            # Buffered mode: logged locally now, written to the database by the flusher
+            checkin_id = checkin_ingestor.submit(db, user_id, checkin.session_id)
+        else:
+            query = text("""
+                CALL checkin_user(:user_id, :session_id, @checkin_id)
+            """)
+            
+            db.execute(query, {
+                'user_id': user_id,
+                'session_id': checkin.session_id
+            })
+            
+            result = db.execute(text("SELECT @checkin_id")).fetchone()
+            checkin_id = result[0]
+            
+            db.commit()
+        enqueue("record_event", event="checked_in", user_id=user_id,
+                session_id=checkin.session_id, checkin_id=checkin_id)
         
         return {
             "message": "Check-in successful! Enjoy your session!",
@@ -595,7 +1025,7 @@ def checkin_user(
     except Exception as e:
         db.rollback()
         error_msg = str(e)
-        if "No confirmed booking" in error_msg:
+        if isinstance(e, NoConfirmedBooking) or "No confirmed booking" in error_msg:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No confirmed booking found for this session"
@@ -606,10 +1036,15 @@ def checkin_user(
         )
 
 
-@router.get("/my-payments/{user_id}")
-def get_user_payments(user_id: str, db: Session = Depends(get_db)):
+@router.get("/my-payments/{user_id}", dependencies=[Depends(authorize_user)])
+def get_user_payments(
+    user_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
     """
-    Get payment history for a user
+    Get payment history for a user, optionally within a date range
     """
     try:
         query = text("""
@@ -626,10 +1061,16 @@ def get_user_payments(user_id: str, db: Session = Depends(get_db)):
             LEFT JOIN membership_plans mp ON m.membership_plan_id = mp.id
             LEFT JOIN coupon_redemptions cr ON p.id = cr.payment_id
             WHERE p.user_id = :user_id
+              AND (:start_date IS NULL OR p.payment_time >= :start_date)
+              AND (:end_date IS NULL OR p.payment_time < DATE_ADD(:end_date, INTERVAL 1 DAY))
             ORDER BY p.payment_time DESC
         """)
         
-        results = db.execute(query, {'user_id': user_id}).fetchall()
+        results = db.execute(query, {
+            'user_id': user_id,
+            'start_date': start_date,
+            'end_date': end_date
+        }).fetchall()
         
         return [
             {
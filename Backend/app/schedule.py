@@ -0,0 +1,180 @@
+"""
+Studio and instructor schedule conflict detection
+
+Upcoming sessions are kept in one interval index per studio and per
+instructor. An index is a start-sorted list plus the longest session
+length, so every session that can overlap [start, end) starts inside
+(start - longest, end): a bisect and a short scan, O(log n) per check.
+The indexes are loaded from sessions(start_time, end_time) on first use,
+updated by the admin create/delete routes and reloaded every
+RELOAD_SECONDS to pick up writes made by other API workers.
+
+The index only rejects conflicts early and reports them; it is never
+held locked across database calls. The database has the final say: the
+create_session procedure (and the batch import's re-check) repeats the
+check under row locks over a bounded start_time range, so racing creates
+in any worker cannot both succeed.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+RELOAD_SECONDS = 60
+
+
+class IntervalIndex:
+    """
+    Start-sorted (start, end, session_id) intervals of one studio or instructor
+    """
+
+    def __init__(self):
+        self._items = []
+        self._longest = timedelta(0)
+
+    def add(self, start: datetime, end: datetime, session_id: str):
+        insort(self._items, (start, end, session_id))
+        self._longest = max(self._longest, end - start)
+
+    def remove(self, start: datetime, session_id: str):
+        i = bisect_left(self._items, (start,))
+        while i < len(self._items) and self._items[i][0] == start:
+            if self._items[i][2] == session_id:
+                del self._items[i]
+                return
+            i += 1
+
+    def overlapping(self, start: datetime, end: datetime) -> list:
+        """
+        Ids of the sessions overlapping [start, end), touching ends allowed
+        """
+        hits = []
+        i = bisect_left(self._items, (start - self._longest,))
+        while i < len(self._items) and self._items[i][0] < end:
+            if self._items[i][1] > start:
+                hits.append(self._items[i][2])
+            i += 1
+        return hits
+
+
+class ScheduleIndex:
+    """
+    Interval indexes for every studio and instructor with upcoming sessions
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._studios = {}
+        self._instructors = {}
+        # session_id -> (studio_id, instructor, start, end)
+        self._sessions = {}
+        self._loaded_at = None
+
+    def _insert(self, session_id, studio_id, instructor, start, end):
+        self._sessions[session_id] = (studio_id, instructor, start, end)
+        self._studios.setdefault(studio_id, IntervalIndex()).add(start, end, session_id)
+        if instructor:
+            self._instructors.setdefault(instructor, IntervalIndex()).add(start, end, session_id)
+
+    def load(self, rows):
+        """
+        Replace the contents with (id, studio_id, instructor, start, end) rows
+        """
+        with self._lock:
+            self._studios, self._instructors, self._sessions = {}, {}, {}
+            for row in rows:
+                self._insert(*row)
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db):
+        """
+        (Re)load from the database when never loaded or older than RELOAD_SECONDS
+        """
+        if self._loaded_at and time.monotonic() - self._loaded_at < RELOAD_SECONDS:
+            return
+        rows = db.execute(text("""
+            SELECT id, studio_id, instructor, start_time, end_time
+            FROM sessions
+            WHERE start_time > NOW() - INTERVAL 1 DAY AND end_time > NOW()
+        """)).fetchall()
+        self.load(rows)
+
+    def expire(self):
+        """
+        Force a reload on the next ensure_loaded() (e.g. after the database
+        rejected a session this index missed)
+        """
+        self._loaded_at = None
+
+    def add(self, session_id: str, studio_id: str, instructor, start: datetime, end: datetime):
+        with self._lock:
+            self._insert(session_id, studio_id, instructor, start, end)
+
+    def remove(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if not entry:
+                return
+            studio_id, instructor, start, _ = entry
+            self._studios[studio_id].remove(start, session_id)
+            if instructor:
+                self._instructors[instructor].remove(start, session_id)
+
+    def conflicts(self, studio_id: str, instructor, start: datetime, end: datetime) -> list:
+        """
+        Existing sessions clashing with a proposed one
+
+        Returns:
+            List of {"session_id", "resource"} where resource is "studio"
+            or "instructor"
+        """
+        found = []
+        with self._lock:
+            studio = self._studios.get(studio_id)
+            if studio:
+                found += [{"session_id": s, "resource": "studio"}
+                          for s in studio.overlapping(start, end)]
+            teacher = self._instructors.get(instructor) if instructor else None
+            if teacher:
+                found += [{"session_id": s, "resource": "instructor"}
+                          for s in teacher.overlapping(start, end)]
+        return found
+
+    def validate_batch(self, sessions: list) -> list:
+        """
+        Check a whole schedule (e.g. a season import) in one pass
+
+        Every proposed session is checked against the index and against the
+        other proposed sessions: each studio / instructor group is sorted
+        once and swept keeping the running latest end.
+
+        Args:
+            sessions: Objects with studio_id, instructor, start_time, end_time
+
+        Returns:
+            One list per proposed session of {"session_id" | "index", "resource"}
+        """
+        report = [self.conflicts(s.studio_id, s.instructor, s.start_time, s.end_time)
+                  for s in sessions]
+
+        for resource, key in (("studio", "studio_id"), ("instructor", "instructor")):
+            groups = {}
+            for i, s in enumerate(sessions):
+                if getattr(s, key):
+                    groups.setdefault(getattr(s, key), []).append(i)
+            for indexes in groups.values():
+                indexes.sort(key=lambda i: sessions[i].start_time)
+                # (end, index) of the proposed session reaching furthest so far
+                latest = None
+                for i in indexes:
+                    if latest and latest[0] > sessions[i].start_time:
+                        report[i].append({"index": latest[1], "resource": resource})
+                        report[latest[1]].append({"index": i, "resource": resource})
+                    if not latest or sessions[i].end_time > latest[0]:
+                        latest = (sessions[i].end_time, i)
+        return report
+
+
+schedule_index = ScheduleIndex()
@@ -2,10 +2,13 @@
 Pydantic schemas for request/response validation
 """
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
-from datetime import datetime, date
+from typing import Optional, List, Dict
+from datetime import datetime, date, timedelta
 from enum import Enum
 
+# Longest allowed session; the create_session overlap re-check relies on it
+MAX_SESSION_HOURS = 24
+
 
 # Enums
 class UserRole(str, Enum):
@@ -120,6 +123,14 @@ class MembershipResponse(BaseModel):
         from_attributes = True
 
 
+class UserHome(BaseModel):
+    profile: UserWithStats
+    current_memberships: List[MembershipResponse]
+    past_memberships: List[MembershipResponse]
+    plans: List[MembershipPlanResponse]
+    coupons: List[dict]
+
+
 # Session Schemas
 class SessionCreate(BaseModel):
     studio_id: str
@@ -136,9 +147,24 @@ class SessionCreate(BaseModel):
     def end_after_start(cls, v, values):
         if 'start_time' in values and v <= values['start_time']:
             raise ValueError('end_time must be after start_time')
+        if 'start_time' in values and v - values['start_time'] > timedelta(hours=MAX_SESSION_HOURS):
+            raise ValueError(f'sessions last at most {MAX_SESSION_HOURS} hours')
         return v
 
 
+class SessionConflict(BaseModel):
+    resource: str                       # "studio" or "instructor"
+    session_id: Optional[str] = None    # clashing existing session
+    index: Optional[int] = None         # clashing session in the same batch
+
+
+class SessionBatchResult(BaseModel):
+    created: int
+    session_ids: List[str]
+    # One list per submitted session, in request order
+    conflicts: List[List[SessionConflict]]
+
+
 class SessionResponse(BaseModel):
     id: str
     studio_id: str
@@ -158,6 +184,41 @@ class SessionResponse(BaseModel):
         from_attributes = True
 
 
+class SessionSearchPage(BaseModel):
+    sessions: List[SessionResponse]
+    # Keyset cursor for the next page (None when this is the last page)
+    next_after_start_time: Optional[datetime] = None
+    next_after_id: Optional[str] = None
+
+
+# Timetable Schemas
+class TimetableSession(BaseModel):
+    id: str
+    name: str
+    start_time: datetime
+    end_time: datetime
+    activity_type_id: str
+    activity_type_name: Optional[str]
+    studio_id: str
+    studio_name: Optional[str]
+    instructor: Optional[str]
+    capacity: int
+    available_spots: int
+
+
+class TimetableDay(BaseModel):
+    date: date
+    sessions: List[TimetableSession]
+
+
+class TimetableResponse(BaseModel):
+    branch_id: str
+    branch_name: str
+    week_start: date
+    built_at: datetime
+    days: List[TimetableDay]
+
+
 # Booking Schemas
 class BookingCreate(BaseModel):
     session_id: str
@@ -297,6 +358,27 @@ class CheckinCreate(BaseModel):
     session_id: str
 
 
+class CheckinBatchItem(BaseModel):
+    user_id: str
+    session_id: str
+
+
+class CheckinBatch(BaseModel):
+    checkins: List[CheckinBatchItem] = Field(..., min_length=1, max_length=500)
+
+
+class CheckinBatchItemResult(BaseModel):
+    user_id: str
+    session_id: str
+    status: str                         # checked_in, no_booking or duplicate
+    checkin_id: Optional[str] = None
+
+
+class CheckinBatchResult(BaseModel):
+    checked_in: int
+    results: List[CheckinBatchItemResult]
+
+
 class CheckinResponse(BaseModel):
     id: str
     user_id: str
@@ -318,6 +400,7 @@ class RevenueReport(BaseModel):
 
 
 class UserActivityReport(BaseModel):
+    user_id: str
     name: str
     email: str
     total_checkins: int
@@ -337,6 +420,71 @@ class SessionPopularityReport(BaseModel):
     booking_percentage: float
 
 
+class DashboardResponse(BaseModel):
+    revenue: List[RevenueReport]
+    active_members: int
+    popular_sessions: List[SessionPopularityReport]
+    timings_ms: Dict[str, float]                # per section, including connection checkout
+    total_ms: float
+    generated_at: datetime
+    cached: bool
+
+
+class OccupancyReport(BaseModel):
+    start_date: date
+    end_date: date
+    branch_ids: List[str]
+    branch_names: List[str]
+    activity_type_names: List[str]
+    hour_of_week: List[List[int]]   # branch x 168, Monday 00:00 first
+    by_weekday: List[List[int]]     # branch x 7, Monday first
+    by_hour: List[List[int]]        # branch x 24
+    by_activity: List[List[int]]    # branch x activity type
+
+
+class RetentionCohortReport(BaseModel):
+    source: str
+    cohorts: List[str]                          # YYYY-MM of first membership
+    sizes: List[int]
+    retention: List[List[Optional[float]]]      # cohort x months since joining
+    computed_ms: float
+
+
+class PlanChurnReport(BaseModel):
+    source: str
+    plan_ids: List[str]
+    plan_names: List[Optional[str]]
+    months: List[str]                           # YYYY-MM the memberships ended
+    ended: List[List[int]]                      # plan x month
+    churn_rate: List[List[Optional[float]]]     # plan x month
+    computed_ms: float
+
+
+class VisitFrequencyReport(BaseModel):
+    source: str
+    start_date: date
+    end_date: date
+    members: int
+    histogram: List[int]                        # members by visit count, last bucket = max or more
+    mean: float
+    median: float
+    p90: float
+    visits_per_week: float
+    computed_ms: float
+
+
+class RevenuePerMemberReport(BaseModel):
+    source: str
+    months: List[str]
+    revenue: List[float]
+    paying_members: List[int]
+    revenue_per_member: List[float]
+    lifetime_mean: float
+    lifetime_median: float
+    lifetime_p90: float
+    computed_ms: float
+
+
 # Generic Response
 class MessageResponse(BaseModel):
     message: str
@@ -0,0 +1,27 @@
+"""
+Full-text session search helpers
+"""
+import re
+
+# Words beyond this are ignored so a pasted paragraph can't fan out the search
+MAX_TERMS = 8
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def to_boolean_query(text_query: str) -> str:
+    """
+    Turn free text into a MySQL BOOLEAN MODE query with prefix matching
+
+    Every word becomes an optional `word*` prefix term, so "yog mor" finds
+    "Morning Yoga" and rows matching more words rank higher. Boolean
+    operators typed by the user are dropped rather than interpreted.
+
+    Args:
+        text_query: Raw search box input
+
+    Returns:
+        Boolean mode query, or an empty string when no words remain
+    """
+    words = _WORD.findall(text_query.lower())[:MAX_TERMS]
+    return " ".join(f"{word}*" for word in words)
@@ -0,0 +1,324 @@
+"""
+Columnar analytics snapshots of the transactional tables
+
+export_snapshots() copies bookings, payments, checkins, memberships and
+sessions into memory-mappable NumPy column files, so reports can be
+computed without scanning the live tables:
+
+    var/snapshots/<table>/<created_at day>/<run>/<column>.npy
+    var/snapshots/manifest.json   (watermark and current run of each day)
+
+Exports are incremental and driven by a created_at watermark. Each run
+rewrites whole day partitions from the day of the previous watermark (at
+least SNAPSHOT_REFRESH_DAYS back, so recent status changes such as
+cancellations are picked up) up to NOW() minus SNAPSHOT_LAG_SECONDS. Older
+days are never touched again. They also survive the archive job moving their
+rows out of the live tables. Readers only follow the manifest, which is
+replaced atomically after a run's files are written, so a half-finished
+export is never visible.
+"""
+import fcntl
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+
+from .tasks import TASK_DATA_DIR
+
+SNAPSHOT_DIR = TASK_DATA_DIR / "snapshots"
+MANIFEST_FILE = SNAPSHOT_DIR / "manifest.json"
+SNAPSHOT_REFRESH_DAYS = int(os.getenv("SNAPSHOT_REFRESH_DAYS", "7"))
+# Rows younger than this may still belong to open transactions
+SNAPSHOT_LAG_SECONDS = 60
+FETCH_ROWS = 10000
+
+# table -> exported (column, dtype) pairs; created_at is always added
+TABLES = {
+    "bookings": [
+        ("id", "S36"), ("user_id", "S36"), ("session_id", "S36"),
+        ("status", "U10"), ("booking_time", "M8[s]"),
+    ],
+    "payments": [
+        ("id", "S36"), ("user_id", "S36"), ("membership_id", "S36"), ("booking_id", "S36"),
+        ("amount", "f8"), ("payment_method", "U10"), ("status", "U10"),
+        ("payment_time", "M8[s]"),
+    ],
+    "checkins": [
+        ("id", "S36"), ("user_id", "S36"), ("session_id", "S36"), ("branch_id", "S36"),
+        ("checkin_time", "M8[s]"),
+    ],
+    "memberships": [
+        ("id", "S36"), ("user_id", "S36"), ("membership_plan_id", "S36"),
+        ("status", "U10"), ("start_date", "M8[D]"), ("end_date", "M8[D]"),
+    ],
+    "sessions": [
+        ("id", "S36"), ("studio_id", "S36"), ("branch_id", "S36"), ("activity_type_id", "S36"),
+        ("start_time", "M8[s]"), ("end_time", "M8[s]"),
+        ("capacity", "i4"), ("booked_count", "i4"),
+    ],
+}
+
+
+class SnapshotUnavailable(Exception):
+    pass
+
+
+def _columns(table: str) -> list:
+    return TABLES[table] + [("created_at", "M8[s]")]
+
+
+def _to_array(values: list, dtype: str) -> np.ndarray:
+    """
+    Build a column array; NULL becomes '' (text), 0 (int), NaN / NaT otherwise
+    """
+    kind = np.dtype(dtype).kind
+    if kind in "SU":
+        values = ["" if v is None else str(v) for v in values]
+    elif kind == "i":
+        values = [0 if v is None else v for v in values]
+    return np.array(values, dtype=dtype)
+
+
+def read_manifest() -> dict:
+    if not MANIFEST_FILE.exists():
+        return {"tables": {}}
+    return json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+
+
+def _write_manifest(manifest: dict):
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, MANIFEST_FILE)
+
+
+def _write_day(table: str, day: str, run: str, rows: list) -> int:
+    run_dir = SNAPSHOT_DIR / table / day / run
+    run_dir.mkdir(parents=True, exist_ok=True)
+    for i, (column, dtype) in enumerate(_columns(table)):
+        np.save(run_dir / f"{column}.npy", _to_array([row[i] for row in rows], dtype))
+    return len(rows)
+
+
+def _remove_unlisted_runs(table: str, days: dict):
+    """
+    Delete run directories the manifest no longer points to
+    """
+    table_dir = SNAPSHOT_DIR / table
+    if not table_dir.exists():
+        return
+    for day_dir in table_dir.iterdir():
+        current = days.get(day_dir.name, {}).get("run")
+        for run_dir in day_dir.iterdir():
+            if run_dir.name != current:
+                shutil.rmtree(run_dir)
+        if current is None:
+            day_dir.rmdir()
+
+
+def export_table(db, table: str, manifest: dict, until: datetime, run: str) -> dict:
+    """
+    Re-export the day partitions of `table` from its watermark day up to `until`
+
+    Returns:
+        Dictionary with the days rewritten and rows exported
+    """
+    entry = manifest["tables"].setdefault(table, {"watermark": None, "days": {}})
+    refresh_from = date.today() - timedelta(days=SNAPSHOT_REFRESH_DAYS)
+    if entry["watermark"]:
+        from_day = min(datetime.fromisoformat(entry["watermark"]).date(), refresh_from)
+    else:
+        from_day = date(1970, 1, 2)
+
+    columns = ", ".join(column for column, _ in _columns(table))
+    result = db.execute(text(f"""
+        SELECT {columns}
+        FROM {table}
+        WHERE created_at >= :since AND created_at < :until
+        ORDER BY created_at
+    """), {'since': from_day, 'until': until},
+        execution_options={"stream_results": True})
+
+    # Rows arrive ordered by created_at, so each day is complete when the next starts
+    days, current_day, buffered = {}, None, []
+    while True:
+        chunk = result.fetchmany(FETCH_ROWS)
+        for row in chunk:
+            day = row[-1].date().isoformat()
+            if day != current_day and buffered:
+                days[current_day] = {"run": run, "rows": _write_day(table, current_day, run, buffered)}
+                buffered = []
+            current_day = day
+            buffered.append(row)
+        if not chunk:
+            break
+    if buffered:
+        days[current_day] = {"run": run, "rows": _write_day(table, current_day, run, buffered)}
+    exported = sum(day["rows"] for day in days.values())
+
+    # Days in the re-exported range that have no rows any more are dropped
+    entry["days"] = {
+        day: info for day, info in entry["days"].items() if day < from_day.isoformat()
+    }
+    entry["days"].update(days)
+    entry["watermark"] = until.isoformat()
+    entry["exported_at"] = datetime.now().isoformat(timespec="seconds")
+    return {"from_day": from_day.isoformat(), "days": len(days), "rows": exported}
+
+
+def export_snapshots(db, tables: list = None) -> dict:
+    """
+    Export every table (or `tables`) once; concurrent exports are skipped
+
+    Returns:
+        Dictionary of per-table results, or {"skipped": ...} when another
+        export holds the lock
+    """
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(SNAPSHOT_DIR / ".export.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return {"skipped": "another export is running"}
+
+        manifest = read_manifest()
+        until = db.execute(
+            text("SELECT NOW() - INTERVAL :lag SECOND"), {'lag': SNAPSHOT_LAG_SECONDS}
+        ).scalar()
+        run = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        results = {}
+        for table in tables or TABLES:
+            # Leftovers of an interrupted run are not in the manifest
+            _remove_unlisted_runs(table, manifest["tables"].get(table, {}).get("days", {}))
+            results[table] = export_table(db, table, manifest, until, run)
+        db.rollback()
+
+        _write_manifest(manifest)
+        for table in tables or TABLES:
+            _remove_unlisted_runs(table, manifest["tables"][table]["days"])
+        return results
+
+
+def load_table(table: str, columns: list = None, start: date = None, end: date = None) -> dict:
+    """
+    Load snapshot columns of `table`, memory-mapped per day partition
+
+    Args:
+        table: One of TABLES
+        columns: Column names to load (default: all)
+        start, end: Optional inclusive created_at day range (prunes partitions)
+
+    Returns:
+        Dictionary of column name -> NumPy array
+
+    Raises:
+        SnapshotUnavailable: when the table has never been exported
+    """
+    entry = read_manifest()["tables"].get(table)
+    if not entry:
+        raise SnapshotUnavailable(f"No snapshot of {table}; run export_snapshots.py")
+    dtypes = dict(_columns(table))
+    columns = columns or list(dtypes)
+
+    parts = [
+        SNAPSHOT_DIR / table / day / info["run"]
+        for day, info in sorted(entry["days"].items())
+        if (start is None or day >= start.isoformat()) and (end is None or day <= end.isoformat())
+    ]
+    return {
+        column: np.concatenate([np.load(part / f"{column}.npy", mmap_mode="r") for part in parts])
+        if parts else np.empty(0, dtype=dtypes[column])
+        for column in columns
+    }
+
+
+def load_live(db, table: str, columns: list = None) -> dict:
+    """
+    Same result as load_table(), read from the live table instead
+    """
+    dtypes = dict(_columns(table))
+    columns = columns or list(dtypes)
+    rows = db.execute(text(f"SELECT {', '.join(columns)} FROM {table}")).fetchall()
+    return {
+        column: _to_array([row[i] for row in rows], dtypes[column])
+        for i, column in enumerate(columns)
+    }
+
+
+def snapshot_status() -> dict:
+    """
+    Watermark, export time, day partitions and rows per exported table
+    """
+    return {
+        table: {
+            "watermark": entry["watermark"],
+            "exported_at": entry.get("exported_at"),
+            "days": len(entry["days"]),
+            "rows": sum(info["rows"] for info in entry["days"].values()),
+        }
+        for table, entry in read_manifest()["tables"].items()
+    }
+
+
+# ==========================================
+# REPORTS
+# ==========================================
+
+def lookup(keys: np.ndarray, table_keys: np.ndarray, table_values: np.ndarray, missing):
+    """
+    Vectorized join: the table value for each key, `missing` where absent
+    """
+    result = np.full(len(keys), missing, dtype=table_values.dtype)
+    if not len(table_keys) or not len(keys):
+        return result
+    order = np.argsort(table_keys, kind="stable")
+    sorted_keys = table_keys[order]
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    found = sorted_keys[positions] == keys
+    result[found] = table_values[order[positions[found]]]
+    return result
+
+
+def revenue_by_branch(start_date: date = None, end_date: date = None) -> dict:
+    """
+    Snapshot version of the branch revenue report
+
+    Returns:
+        Dictionary of branch_id (str) -> (total_sessions, total_bookings, total_revenue)
+    """
+    sessions = load_table("sessions", ["id", "branch_id"])
+    bookings = load_table("bookings", ["id", "session_id"])
+    payments = load_table("payments", ["booking_id", "amount", "status", "payment_time"])
+
+    branches, session_branch = np.unique(sessions["branch_id"], return_inverse=True)
+    total_sessions = np.bincount(session_branch, minlength=len(branches))
+
+    booking_branch = lookup(bookings["session_id"], sessions["id"], session_branch, -1)
+    total_bookings = np.bincount(booking_branch[booking_branch >= 0], minlength=len(branches))
+
+    paid = payments["status"] == "success"
+    if start_date:
+        paid &= payments["payment_time"] >= np.datetime64(start_date)
+    if end_date:
+        paid &= payments["payment_time"] < np.datetime64(end_date + timedelta(days=1))
+    payment_branch = lookup(payments["booking_id"][paid], bookings["id"], booking_branch, -1)
+    linked = payment_branch >= 0
+    total_revenue = np.bincount(payment_branch[linked], weights=payments["amount"][paid][linked],
+                                minlength=len(branches))
+
+    return {
+        branch.decode(): (int(total_sessions[i]), int(total_bookings[i]), float(total_revenue[i]))
+        for i, branch in enumerate(branches)
+    }
+
+
+def active_member_count(today: date = None) -> int:
+    """
+    Snapshot version of the active members count
+    """
+    memberships = load_table("memberships", ["user_id", "status", "end_date"])
+    today = np.datetime64(today or date.today(), "D")
+    active = (memberships["status"] == "active") & (memberships["end_date"] >= today)
+    return int(len(np.unique(memberships["user_id"][active])))
@@ -0,0 +1,46 @@
+"""
+Hot SQL statements that run inside stored procedures and functions
+
+EXPLAIN cannot look inside CALL, so the hot statements of sql/schema.sql
+are mirrored here. test_query_plans.py checks their plans, and the startup
+warmup runs the read-only ones once.
+"""
+
+# (procedure / function name, "procedure" or "function", sql)
+PROCEDURE_STATEMENTS = [
+    ("book_session", "procedure", """
+        SELECT capacity - booked_count FROM sessions WHERE id = :session_id
+    """),
+    ("checkin_user", "procedure", """
+        SELECT COUNT(*) FROM bookings
+        WHERE user_id = :user_id AND session_id = :session_id AND status = 'confirmed'
+    """),
+    ("checkin_user", "procedure", """
+        UPDATE bookings SET status = 'completed'
+        WHERE user_id = :user_id AND session_id = :session_id
+    """),
+    ("is_active_member", "function", """
+        SELECT COUNT(*) FROM memberships
+        WHERE user_id = :user_id AND status = 'active' AND end_date >= CURDATE()
+    """),
+    ("get_user_checkin_count", "function", """
+        SELECT COUNT(*) FROM checkins WHERE user_id = :user_id
+    """),
+    ("apply_coupon", "procedure", """
+        SELECT id FROM coupons WHERE code = :code AND is_active = 1
+    """),
+    ("create_session", "procedure", """
+        SELECT COUNT(*) FROM sessions
+        WHERE studio_id = :studio_id
+          AND start_time > :start_time - INTERVAL 24 HOUR AND start_time < :end_time
+          AND end_time > :start_time
+        FOR UPDATE
+    """),
+    ("create_session", "procedure", """
+        SELECT COUNT(*) FROM sessions
+        WHERE instructor = :instructor
+          AND start_time > :start_time - INTERVAL 24 HOUR AND start_time < :end_time
+          AND end_time > :start_time
+        FOR UPDATE
+    """),
+]
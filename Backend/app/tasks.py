@@ -0,0 +1,236 @@
+"""
+Post-commit background task pipeline
+
+Routes call enqueue() after their transaction commits, so side effects
+(receipts, analytics events) never add to request latency. Tasks run on
+TASK_WORKERS daemon threads fed by a bounded queue. A failed task is
+retried with exponential backoff up to TASK_MAX_ATTEMPTS times, then written
+to the dead-letter file.
+
+Tasks are never dropped: if the queue is full, or tasks are still pending at
+shutdown (queued or waiting for a retry), they are appended to a local spool
+file (JSON lines), which is replayed into the queue when a worker starts.
+"""
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "2"))
+TASK_QUEUE_SIZE = int(os.getenv("TASK_QUEUE_SIZE", "1000"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "5"))
+TASK_DATA_DIR = Path(os.getenv("TASK_DATA_DIR", Path(__file__).parent.parent / "var"))
+
+SPOOL_FILE = TASK_DATA_DIR / "tasks.spool.jsonl"
+DEAD_LETTER_FILE = TASK_DATA_DIR / "tasks.failed.jsonl"
+EVENTS_FILE = TASK_DATA_DIR / "events.jsonl"
+RECEIPTS_DIR = TASK_DATA_DIR / "receipts"
+
+# name -> handler(**payload)
+_handlers = {}
+
+
+def task(name: str):
+    """
+    Register a function as the handler for task `name`
+    """
+    def register(fn):
+        _handlers[name] = fn
+        return fn
+    return register
+
+
+def _append_lines(path: Path, records: list):
+    """
+    Append JSON lines under an exclusive lock (shared by every worker process)
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def _take_spool() -> list:
+    """
+    Read and empty the spool file in one locked step
+    """
+    if not SPOOL_FILE.exists():
+        return []
+    with open(SPOOL_FILE, "r+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        records = [json.loads(line) for line in f if line.strip()]
+        f.seek(0)
+        f.truncate()
+    return records
+
+
+class TaskQueue:
+    """
+    Bounded in-process queue with worker threads, retries and a file spool
+    """
+
+    def __init__(self, workers: int = TASK_WORKERS, maxsize: int = TASK_QUEUE_SIZE,
+                 max_attempts: int = TASK_MAX_ATTEMPTS):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue(maxsize)
+        self._threads = []
+        self._running = False
+        # Timer -> retry record waiting for its backoff delay
+        self._retries = {}
+        self._retries_lock = threading.Lock()
+        self.stats = {"processed": 0, "retried": 0, "failed": 0, "spooled": 0, "replayed": 0}
+
+    def enqueue(self, name: str, **payload):
+        """
+        Queue a task; spools it to disk instead of blocking when the queue is full
+        """
+        self._put({"name": name, "payload": payload, "attempt": 1})
+
+    def _put(self, record: dict):
+        if self._running:
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                pass
+        _append_lines(SPOOL_FILE, [record])
+        self.stats["spooled"] += 1
+
+    def start(self):
+        """
+        Start the worker threads and replay anything spooled earlier
+        """
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"task-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for record in _take_spool():
+            self.stats["replayed"] += 1
+            self._put(record)
+
+    def stop(self, timeout: float = 5):
+        """
+        Stop the workers; tasks still queued are spooled for the next start
+        """
+        self._running = False
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        pending = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                pending.append(record)
+        with self._retries_lock:
+            retries, self._retries = self._retries, {}
+        for timer, record in retries.items():
+            timer.cancel()
+            pending.append(record)
+        if pending:
+            _append_lines(SPOOL_FILE, pending)
+            self.stats["spooled"] += len(pending)
+
+    def _work(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            self._run(record)
+
+    def _run(self, record: dict):
+        try:
+            _handlers[record["name"]](**record["payload"])
+            self.stats["processed"] += 1
+        except Exception as e:
+            if record["attempt"] >= self.max_attempts:
+                self.stats["failed"] += 1
+                logger.error("Task %s failed permanently: %s", record["name"], e)
+                _append_lines(DEAD_LETTER_FILE, [{**record, "error": str(e)}])
+                return
+            self.stats["retried"] += 1
+            delay = 2 ** record["attempt"]
+            retry = {**record, "attempt": record["attempt"] + 1}
+            timer = threading.Timer(delay, lambda: self._retry(timer))
+            timer.daemon = True
+            with self._retries_lock:
+                self._retries[timer] = retry
+            timer.start()
+
+    def _retry(self, timer: threading.Timer):
+        with self._retries_lock:
+            record = self._retries.pop(timer, None)
+        # None once stop() has spooled it
+        if record is not None:
+            self._put(record)
+
+    def metrics(self) -> dict:
+        return {"queued": self._queue.qsize(), "retry_pending": len(self._retries),
+                "workers": len(self._threads), **self.stats}
+
+
+task_queue = TaskQueue()
+enqueue = task_queue.enqueue
+
+
+# ==========================================
+# TASK HANDLERS
+# ==========================================
+
+@task("record_event")
+def record_event(event: str, **fields):
+    """
+    Append an analytics event to the local event log
+    """
+    _append_lines(EVENTS_FILE, [{"event": event, "at": datetime.now().isoformat(), **fields}])
+
+
+@task("send_receipt")
+def send_receipt(payment_id: str):
+    """
+    Render the receipt for a successful payment
+    """
+    db = SessionLocal()
+    try:
+        payment = db.execute(text("""
+            SELECT p.id, p.amount, p.payment_method, p.payment_time,
+                   u.name, u.email, mp.name as plan_name
+            FROM payments p
+            JOIN users u ON p.user_id = u.id
+            LEFT JOIN memberships m ON p.membership_id = m.id
+            LEFT JOIN membership_plans mp ON m.membership_plan_id = mp.id
+            WHERE p.id = :payment_id
+        """), {'payment_id': payment_id}).fetchone()
+    finally:
+        db.close()
+    if not payment:
+        raise LookupError(f"payment {payment_id} not found")
+
+    RECEIPTS_DIR.mkdir(parents=True, exist_ok=True)
+    (RECEIPTS_DIR / f"{payment[0]}.txt").write_text(
+        f"Fitness Management System - Receipt\n"
+        f"Payment:  {payment[0]}\n"
+        f"Date:     {payment[3]}\n"
+        f"Member:   {payment[4]} <{payment[5]}>\n"
+        f"Plan:     {payment[6] or '-'}\n"
+        f"Method:   {payment[2]}\n"
+        f"Amount:   ₹{float(payment[1]):.2f}\n",
+        encoding="utf-8"
+    )
@@ -0,0 +1,214 @@
+"""
+Precomputed weekly timetable snapshots per branch
+
+A snapshot is the full session grid of one branch for one Monday-Sunday
+week. Reads are served from memory; admin session changes rebuild the
+affected branch-week in the background and bookings/cancellations patch
+the spot count of the one session they touched. Snapshots also expire
+after SNAPSHOT_TTL_SECONDS, which bounds staleness from changes made by
+other API workers. Booking itself is always validated by the database.
+Each worker keeps at most SNAPSHOT_MAX_KEYS snapshots, dropping expired
+ones first and then the least recently read.
+
+Each snapshot keeps its response pre-serialized as JSON, so a read is a
+dictionary lookup returning the same bytes. A spot-count patch marks the
+JSON stale and the next read renders it once again.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from .database import SessionLocal
+from .schemas import TimetableResponse
+
+SNAPSHOT_TTL_SECONDS = 300
+SNAPSHOT_MAX_KEYS = int(os.getenv("TIMETABLE_MAX_SNAPSHOTS", "500"))
+
+# (branch_id, week_start) -> snapshot, least recently read first
+_snapshots = OrderedDict()
+# session_id -> (branch_id, week_start) of the snapshot holding it
+_session_keys = {}
+_lock = threading.Lock()
+
+
+def week_start(day: date) -> date:
+    """
+    Monday of the week containing `day`
+    """
+    return day - timedelta(days=day.weekday())
+
+
+def build_snapshot(db, branch_id: str, week: date) -> dict:
+    """
+    Load one branch-week grid from the database
+
+    Returns:
+        Snapshot dictionary, or None when the branch does not exist
+    """
+    branch = db.execute(
+        text("SELECT name FROM branches WHERE id = :branch_id"),
+        {'branch_id': branch_id}
+    ).fetchone()
+    if not branch:
+        return None
+
+    # Range scan on idx_sessions_branch_start
+    rows = db.execute(text("""
+        SELECT
+            s.id, s.name, s.start_time, s.end_time,
+            s.activity_type_id, at.name as activity_type_name,
+            s.studio_id, st.name as studio_name,
+            s.instructor, s.capacity, s.booked_count
+        FROM sessions s
+        JOIN activity_types at ON s.activity_type_id = at.id
+        JOIN studios st ON s.studio_id = st.id
+        WHERE s.branch_id = :branch_id
+          AND s.start_time >= :week_start AND s.start_time < :week_end
+        ORDER BY s.start_time, s.id
+    """), {
+        'branch_id': branch_id,
+        'week_start': week,
+        'week_end': week + timedelta(days=7)
+    }).fetchall()
+
+    days = [{"date": week + timedelta(days=i), "sessions": []} for i in range(7)]
+    sessions = {}
+    for row in rows:
+        entry = {
+            "id": row[0],
+            "name": row[1],
+            "start_time": row[2],
+            "end_time": row[3],
+            "activity_type_id": row[4],
+            "activity_type_name": row[5],
+            "studio_id": row[6],
+            "studio_name": row[7],
+            "instructor": row[8],
+            "capacity": row[9],
+            "available_spots": max(row[9] - row[10], 0),
+        }
+        days[(row[2].date() - week).days]["sessions"].append(entry)
+        sessions[row[0]] = entry
+
+    return {
+        "branch_id": branch_id,
+        "branch_name": branch[0],
+        "week_start": week,
+        "built_at": datetime.now(),
+        "days": days,
+        "sessions": sessions,
+        "expires": time.monotonic() + SNAPSHOT_TTL_SECONDS,
+        "json": None,
+    }
+
+
+def _render(snapshot: dict) -> bytes:
+    """
+    Serialized response of a snapshot, rendered on first need (caller holds _lock)
+    """
+    if snapshot["json"] is None:
+        snapshot["json"] = TimetableResponse(**snapshot).model_dump_json().encode()
+    return snapshot["json"]
+
+
+def _drop(key):
+    """
+    Remove one snapshot and its session index entries (caller holds _lock)
+    """
+    old = _snapshots.pop(key, None)
+    if old:
+        for session_id in old["sessions"]:
+            if _session_keys.get(session_id) == key:
+                del _session_keys[session_id]
+
+
+def _store(key, snapshot):
+    with _lock:
+        _drop(key)
+        if snapshot:
+            now = time.monotonic()
+            for expired in [k for k, s in _snapshots.items() if s["expires"] <= now]:
+                _drop(expired)
+            while len(_snapshots) >= SNAPSHOT_MAX_KEYS:
+                _drop(next(iter(_snapshots)))
+            _snapshots[key] = snapshot
+            for session_id in snapshot["sessions"]:
+                _session_keys[session_id] = key
+
+
+def get_timetable(db, branch_id: str, day: date) -> bytes:
+    """
+    Timetable of the week containing `day`, built on first use or expiry
+
+    Returns:
+        TimetableResponse JSON (shared, immutable bytes), or None when the
+        branch does not exist
+    """
+    key = (branch_id, week_start(day))
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot and snapshot["expires"] > time.monotonic():
+            _snapshots.move_to_end(key)
+            return _render(snapshot)
+
+    snapshot = build_snapshot(db, *key)
+    if not snapshot:
+        return None
+    with _lock:
+        body = _render(snapshot)
+    _store(key, snapshot)
+    return body
+
+
+def rebuild(branch_id: str, week: date):
+    """
+    Rebuild one cached branch-week on its own connection (background task)
+    """
+    key = (branch_id, week)
+    with _lock:
+        if key not in _snapshots:
+            # Nobody has read it yet; the next read builds it fresh
+            return
+    db = SessionLocal()
+    try:
+        _store(key, build_snapshot(db, branch_id, week))
+    except Exception:
+        # Drop it so the next read rebuilds instead of serving stale data
+        _store(key, None)
+    finally:
+        db.close()
+
+
+def session_created(background_tasks, branch_id: str, start_time: datetime):
+    """
+    Schedule a rebuild of the branch-week a new session landed in
+    """
+    background_tasks.add_task(rebuild, branch_id, week_start(start_time.date()))
+
+
+def session_deleted(background_tasks, session_id: str):
+    """
+    Schedule a rebuild of the branch-week that listed a deleted session
+    """
+    with _lock:
+        key = _session_keys.get(session_id)
+    if key:
+        background_tasks.add_task(rebuild, *key)
+
+
+def update_booked_count(session_id: str, booked_count: int):
+    """
+    Patch the spot count of one session after a booking or cancellation
+    """
+    with _lock:
+        key = _session_keys.get(session_id)
+        if not key:
+            return
+        snapshot = _snapshots[key]
+        entry = snapshot["sessions"][session_id]
+        entry["available_spots"] = max(entry["capacity"] - booked_count, 0)
+        snapshot["json"] = None
@@ -0,0 +1,206 @@
+"""
+Startup warmup and readiness reporting
+
+At startup each worker opens its pool connections up front, runs the hot
+reads once and fills the caches the first requests read, so those
+requests don't pay for MySQL handshakes, first-time statement compilation,
+cold buffer pool pages, cold caches or lazy imports:
+
+- catalog routes (sessions, branches, studios, activity types);
+- request-path probes: login and member home with an email / user id that
+  matches nothing (answered 401 / 404 after their queries ran), and the
+  read-only statements of the booking and check-in procedures
+  (app/statements.py, also checked by test_query_plans.py);
+- caches: catalog plans and coupons (read by /user/home), this week's
+  timetable of every branch, the admin dashboard and the cached reports at
+  their default parameters, and the buffered check-in booking cache.
+
+/ready reports the outcome together with a live DB round trip and the pool
+state.
+"""
+import inspect
+import time
+from datetime import date
+
+from fastapi import BackgroundTasks, HTTPException
+from sqlalchemy import text
+
+from . import catalog, timetable
+from .checkin_ingest import checkin_ingestor
+from .database import DB_POOL_SIZE
+from .schedule import schedule_index
+from .schemas import UserLogin
+from .statements import PROCEDURE_STATEMENTS
+from .routers import user, admin
+
+# Read-only catalog routes run once at startup, with their non-db arguments
+# (passed by keyword, so adding a query parameter cannot shift `db`)
+WARMUP_ROUTES = [
+    (user.get_available_sessions, {"fields": None}),
+    (admin.get_all_studios, {}),
+    (admin.get_all_activity_types, {}),
+]
+
+# Id / email that matches no row
+WARMUP_ID = "00000000-0000-0000-0000-000000000000"
+
+# Hot request-path routes, probed so they run their queries and answer 4xx
+WARMUP_PROBES = [
+    (user.login_user, lambda: {
+        "credentials": UserLogin(email="warmup@example.com", password="warmup"),
+        "background_tasks": BackgroundTasks(),
+    }),
+    (user.get_user_home, lambda: {"user_id": WARMUP_ID}),
+]
+
+# Report routes whose cache is filled at their default parameters
+WARMUP_REPORTS = [
+    admin.get_revenue_report,
+    admin.get_popular_sessions_report,
+    admin.get_active_members_count,
+    admin.get_top_performing_branch,
+    admin.get_occupancy_report,
+]
+
+
+def open_pool(engine, size: int = DB_POOL_SIZE) -> int:
+    """
+    Check out `size` connections at once so the pool holds that many open ones
+
+    Returns:
+        Number of connections opened
+    """
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def _timed(steps: dict, errors: dict, name: str, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # Routes wrap DB errors in HTTPException(detail=...)
+        errors[name] = getattr(e, 'detail', None) or str(e)
+    steps[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _probe(route, kwargs: dict, db):
+    """
+    Run a route with arguments that match nothing; its 4xx answer is expected
+    """
+    try:
+        route(**kwargs, db=db)
+    except HTTPException as e:
+        if e.status_code >= 500:
+            raise
+
+
+def _run_statements(db):
+    """
+    Run the read-only procedure statements once
+    """
+    params = {name: WARMUP_ID for name in ("user_id", "session_id", "code")}
+    for _, _, sql in PROCEDURE_STATEMENTS:
+        if sql.split(None, 1)[0].upper() == "SELECT" and "FOR UPDATE" not in sql:
+            db.execute(text(sql), params).fetchall()
+
+
+def _default_kwargs(route) -> dict:
+    """
+    Non-db parameters of a route at the defaults FastAPI would pass, so the
+    report cache key matches a request without query parameters
+    """
+    kwargs = {}
+    for name, parameter in inspect.signature(route).parameters.items():
+        if name != "db":
+            kwargs[name] = getattr(parameter.default, "default", parameter.default)
+    return kwargs
+
+
+def _prime_caches(steps: dict, errors: dict, db):
+    _timed(steps, errors, "catalog", lambda: (
+        catalog.cached("coupons", user.get_active_coupons, db),
+        catalog.cached("plans", user.get_membership_plans, db),
+    ))
+    _timed(steps, errors, "timetables", lambda: [
+        timetable.get_timetable(db, branch.id, date.today())
+        for branch in admin.get_all_branches(db=db)
+    ])
+    if checkin_ingestor:
+        _timed(steps, errors, "checkin_bookings", lambda: checkin_ingestor._refresh_cache(db))
+    _timed(steps, errors, "get_admin_dashboard", admin.get_admin_dashboard)
+    for route in WARMUP_REPORTS:
+        _timed(steps, errors, route.__name__, lambda: route(**_default_kwargs(route), db=db))
+        db.rollback()
+
+
+def warm_up(engine, session_factory) -> dict:
+    """
+    Open the pool, prime the schedule index, run every warmup route, probe
+    and statement once and fill the caches
+
+    Returns:
+        Dictionary with per-step milliseconds and any errors
+    """
+    started = time.perf_counter()
+    steps, errors = {}, {}
+
+    _timed(steps, errors, "open_pool", lambda: open_pool(engine))
+    db = session_factory()
+    try:
+        _timed(steps, errors, "schedule_index", lambda: schedule_index.ensure_loaded(db))
+        for route, kwargs in WARMUP_ROUTES:
+            _timed(steps, errors, route.__name__, lambda: route(**kwargs, db=db))
+            db.rollback()
+        for route, kwargs in WARMUP_PROBES:
+            _timed(steps, errors, route.__name__, lambda: _probe(route, kwargs(), db))
+            db.rollback()
+        _timed(steps, errors, "procedure_statements", lambda: _run_statements(db))
+        db.rollback()
+        _prime_caches(steps, errors, db)
+    finally:
+        db.close()
+
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "steps_ms": steps,
+        "errors": errors,
+    }
+
+
+def pool_state(engine) -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+def check_ready(engine) -> dict:
+    """
+    Time one DB round trip and report it with the pool state
+
+    Returns:
+        Dictionary with "database" ("ok" or the error), "db_round_trip_ms"
+        and "pool"
+    """
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        database = "ok"
+    except Exception as e:
+        database = str(e)
+    return {
+        "database": database,
+        "db_round_trip_ms": round((time.perf_counter() - started) * 1000, 2),
+        "pool": pool_state(engine),
+    }
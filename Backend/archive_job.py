@@ -0,0 +1,161 @@
+"""
+Partition maintenance and archive job for checkins and payments
+
+Keeps monthly partitions created ahead of time and moves months older than
+the retention window into checkins_archive / payments_archive. Months are
+moved with two EXCHANGE PARTITION swaps through an empty staging table, so
+the live tables never copy or delete rows.
+
+Usage (e.g. nightly from cron):
+    python archive_job.py --keep-months 12 --months-ahead 3
+"""
+import argparse
+from datetime import date
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+
+# Tables RANGE partitioned by month (see sql/schema.sql)
+PARTITIONED_TABLES = ["checkins", "payments"]
+
+
+def add_months(month: date, count: int) -> date:
+    """
+    Shift the first day of a month by `count` months
+    """
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name: str) -> date:
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def partition_definition(month: date) -> str:
+    upper = add_months(month, 1)
+    return (f"PARTITION {partition_name(month)} "
+            f"VALUES LESS THAN (UNIX_TIMESTAMP('{upper:%Y-%m-%d} 00:00:00'))")
+
+
+def get_partitions(db, table: str) -> list:
+    """
+    List the monthly partition names of a table, oldest first (pmax excluded)
+    """
+    rows = db.execute(text("""
+        SELECT PARTITION_NAME
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+          AND PARTITION_NAME IS NOT NULL AND PARTITION_NAME != 'pmax'
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """), {'table': table}).fetchall()
+    return [row[0] for row in rows]
+
+
+def split_pmax(db, table: str, months: list):
+    """
+    Carve new monthly partitions out of pmax (cheap while pmax is empty)
+    """
+    if not months:
+        return
+    definitions = ",\n".join(partition_definition(m) for m in months)
+    db.execute(text(f"""
+        ALTER TABLE {table} REORGANIZE PARTITION pmax INTO (
+            {definitions},
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+    """))
+
+
+def ensure_future_partitions(db, table: str, months_ahead: int) -> list:
+    """
+    Make sure monthly partitions exist up to `months_ahead` months from now
+
+    Returns:
+        Names of the partitions that were created
+    """
+    existing = get_partitions(db, table)
+    target = add_months(date.today().replace(day=1), months_ahead)
+    month = add_months(partition_month(existing[-1]), 1) if existing \
+        else add_months(date.today().replace(day=1), -1)
+
+    months = []
+    while month <= target:
+        months.append(month)
+        month = add_months(month, 1)
+    split_pmax(db, table, months)
+    return [partition_name(m) for m in months]
+
+
+def archive_partition(db, table: str, name: str):
+    """
+    Move one monthly partition into the archive table
+
+    Live partition -> staging table -> archive partition, then the (now
+    empty) live partition is dropped.
+    """
+    archive = f"{table}_archive"
+    stage = f"{table}_archive_stage"
+
+    if name not in get_partitions(db, archive):
+        split_pmax(db, archive, [partition_month(name)])
+
+    db.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+    db.execute(text(f"CREATE TABLE {stage} LIKE {table}"))
+    db.execute(text(f"ALTER TABLE {stage} REMOVE PARTITIONING"))
+    db.execute(text(
+        f"ALTER TABLE {table} EXCHANGE PARTITION {name} WITH TABLE {stage}"
+    ))
+    # Rows came straight out of the same month, no need to re-check them
+    db.execute(text(
+        f"ALTER TABLE {archive} EXCHANGE PARTITION {name} WITH TABLE {stage} "
+        f"WITHOUT VALIDATION"
+    ))
+    db.execute(text(f"DROP TABLE {stage}"))
+    db.execute(text(f"ALTER TABLE {table} DROP PARTITION {name}"))
+
+
+def archive_old_partitions(db, table: str, keep_months: int) -> list:
+    """
+    Archive every monthly partition older than the retention window
+
+    Returns:
+        Names of the partitions that were archived
+    """
+    cutoff = partition_name(add_months(date.today().replace(day=1), -keep_months))
+    partitions = get_partitions(db, table)
+    # Always keep at least one monthly partition on the live table
+    old = [name for name in partitions[:-1] if name < cutoff]
+    for name in old:
+        archive_partition(db, table, name)
+    return old
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition maintenance for checkins and payments")
+    parser.add_argument("--keep-months", type=int, default=12,
+                        help="months of history to keep in the live tables")
+    parser.add_argument("--months-ahead", type=int, default=3,
+                        help="future monthly partitions to create")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="only create future partitions")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for table in PARTITIONED_TABLES:
+            created = ensure_future_partitions(db, table, args.months_ahead)
+            print(f"✅ {table}: created {len(created)} partition(s) {' '.join(created)}")
+            if not args.no_archive:
+                archived = archive_old_partitions(db, table, args.keep_months)
+                print(f"✅ {table}: archived {len(archived)} partition(s) {' '.join(archived)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Performance benchmarks for the Fitness Management System backend
+
+Usage:
+    python benchmark.py ids --rows 10000000
+    python benchmark.py tokens --iterations 200000
+    python benchmark.py bcrypt --min-rounds 4 --max-rounds 14
+    python benchmark.py workers --path /user/sessions --seconds 10
+    python benchmark.py coldstart --runs 5
+    python benchmark.py analytics --rows 2000000 --members 300000
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+import bcrypt
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from app.database import DATABASE_URL
+from app.ids import new_id, id_to_bytes
+from app.auth import generate_session_token, verify_session_token, time_bcrypt_verify
+from app import analytics
+
+
+def print_section(title):
+    print("\n" + "=" * 50)
+    print(f"  {title}")
+    print("=" * 50)
+
+
+# ==========================================
+# ID STORAGE: CHAR(36) uuid4 vs BINARY(16) v7
+# ==========================================
+
+ID_VARIANTS = {
+    # name: (column type, id factory)
+    "char36_uuid4": ("CHAR(36)", lambda: str(uuid.uuid4())),
+    "binary16_v7": ("BINARY(16)", lambda: id_to_bytes(new_id())),
+}
+
+BENCH_TABLES = {
+    "bookings": """
+        CREATE TABLE {name} (
+            id {id_type} PRIMARY KEY,
+            user_id {id_type} NOT NULL,
+            session_id {id_type} NOT NULL,
+            status VARCHAR(20),
+            booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_user_session_status (user_id, session_id, status),
+            INDEX idx_session (session_id)
+        ) ENGINE=InnoDB
+    """,
+    "checkins": """
+        CREATE TABLE {name} (
+            id {id_type} PRIMARY KEY,
+            user_id {id_type} NOT NULL,
+            session_id {id_type} NOT NULL,
+            branch_id {id_type} NOT NULL,
+            checkin_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_user (user_id),
+            INDEX idx_session (session_id)
+        ) ENGINE=InnoDB
+    """,
+}
+
+
+def _buffer_pool_counters(conn):
+    rows = conn.execute(text(
+        "SHOW GLOBAL STATUS WHERE Variable_name IN "
+        "('Innodb_buffer_pool_read_requests', 'Innodb_buffer_pool_reads')"
+    )).fetchall()
+    return {name: int(value) for name, value in rows}
+
+
+def _hit_rate(before, after):
+    requests = (after['Innodb_buffer_pool_read_requests']
+                - before['Innodb_buffer_pool_read_requests'])
+    disk_reads = after['Innodb_buffer_pool_reads'] - before['Innodb_buffer_pool_reads']
+    return 100.0 * (1 - disk_reads / requests) if requests else 100.0
+
+
+def bench_id_table(engine, table: str, variant: str, rows: int, batch: int):
+    """
+    Insert `rows` rows into a scratch table and measure the effect of the id format
+
+    Returns:
+        Dictionary with insert rate, data/index size and buffer-pool hit rate
+    """
+    id_type, make_id = ID_VARIANTS[variant]
+    name = f"bench_{table}_{variant}"
+    columns = ["id", "user_id", "session_id", "status"] if table == "bookings" \
+        else ["id", "user_id", "session_id", "branch_id"]
+
+    # Foreign key values come from a bounded pool, like real users/sessions
+    users = [make_id() for _ in range(max(1, rows // 20))]
+    sessions = [make_id() for _ in range(max(1, rows // 200))]
+    branches = [make_id() for _ in range(20)]
+
+    insert = text(f"INSERT INTO {name} ({', '.join(columns)}) "
+                  f"VALUES ({', '.join(':' + c for c in columns)})")
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        conn.execute(text(BENCH_TABLES[table].format(name=name, id_type=id_type)))
+        conn.commit()
+
+        before = _buffer_pool_counters(conn)
+        started = time.perf_counter()
+        for start in range(0, rows, batch):
+            batch_rows = []
+            for _ in range(min(batch, rows - start)):
+                last = "confirmed" if table == "bookings" else random.choice(branches)
+                batch_rows.append(dict(zip(columns, (
+                    make_id(), random.choice(users), random.choice(sessions), last
+                ))))
+            conn.execute(insert, batch_rows)
+            conn.commit()
+        elapsed = time.perf_counter() - started
+        after = _buffer_pool_counters(conn)
+
+        conn.execute(text(f"ANALYZE TABLE {name}"))
+        size = conn.execute(text("""
+            SELECT data_length, index_length
+            FROM information_schema.TABLES
+            WHERE table_schema = DATABASE() AND table_name = :name
+        """), {'name': name}).fetchone()
+        conn.execute(text(f"DROP TABLE {name}"))
+        conn.commit()
+
+    return {
+        "rows_per_sec": rows / elapsed,
+        "data_mb": size[0] / 2 ** 20,
+        "index_mb": size[1] / 2 ** 20,
+        "hit_rate": _hit_rate(before, after),
+    }
+
+
+def run_ids(args):
+    print_section(f"ID STORAGE ({args.rows:,} rows per table)")
+    engine = create_engine(DATABASE_URL)
+    print(f"{'table':<10} {'variant':<14} {'rows/s':>10} {'data MB':>9} "
+          f"{'index MB':>9} {'bp hit %':>9}")
+    for table in BENCH_TABLES:
+        for variant in ID_VARIANTS:
+            r = bench_id_table(engine, table, variant, args.rows, args.batch)
+            print(f"{table:<10} {variant:<14} {r['rows_per_sec']:>10,.0f} "
+                  f"{r['data_mb']:>9.1f} {r['index_mb']:>9.1f} {r['hit_rate']:>9.2f}")
+
+
+# ==========================================
+# ACCESS TOKEN VERIFICATION
+# ==========================================
+
+TOKEN_VERIFY_BUDGET_US = 20
+
+
+def run_tokens(args):
+    print_section(f"ACCESS TOKEN VERIFY ({args.iterations:,} iterations)")
+    token = generate_session_token(new_id(), "user")
+    assert verify_session_token(token), "freshly issued token must verify"
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        verify_session_token(token)
+    per_verify_us = (time.perf_counter() - started) / args.iterations * 1e6
+
+    verdict = "✅" if per_verify_us < TOKEN_VERIFY_BUDGET_US else "❌"
+    print(f"{verdict} {per_verify_us:.2f} µs per verify "
+          f"(budget {TOKEN_VERIFY_BUDGET_US} µs, {1e6 / per_verify_us:,.0f} verifies/s)")
+
+
+# ==========================================
+# BCRYPT COST FACTORS
+# ==========================================
+
+def run_bcrypt(args):
+    print_section("BCRYPT THROUGHPUT PER COST FACTOR (one core)")
+    print(f"{'cost':>4} {'hash ms':>9} {'hashes/s':>10} {'verify ms':>10} {'verifies/s':>11}")
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        # Each extra round doubles the work; keep every row to ~1s or more
+        iterations = max(1, 2 ** max(0, 12 - rounds))
+        started = time.perf_counter()
+        for _ in range(iterations):
+            bcrypt.hashpw(b"benchmark-password", bcrypt.gensalt(rounds=rounds))
+        hash_seconds = (time.perf_counter() - started) / iterations
+        verify_seconds = time_bcrypt_verify(rounds, iterations)
+        print(f"{rounds:>4} {hash_seconds * 1000:>9.1f} {1 / hash_seconds:>10.1f} "
+              f"{verify_seconds * 1000:>10.1f} {1 / verify_seconds:>11.1f}")
+
+
+# ==========================================
+# SERVER THROUGHPUT: 1 vs N WORKERS
+# ==========================================
+
+def _load_client(port: int, path: str, seconds: float) -> int:
+    """
+    Send keep-alive GET requests for `seconds`; returns successful responses
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    done, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        done += response.status == 200
+    conn.close()
+    return done
+
+
+def _wait_until_up(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+
+def bench_server(workers: int, args) -> float:
+    """
+    Start gunicorn with `workers` workers and measure requests/second
+    """
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), HOST="127.0.0.1", PORT=str(args.port))
+    server = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_up(args.port)
+        # Clients run in their own processes so the load generator is not GIL-bound
+        with multiprocessing.Pool(args.clients) as pool:
+            counts = pool.starmap(_load_client,
+                                  [(args.port, args.path, args.seconds)] * args.clients)
+        return sum(counts) / args.seconds
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run_workers(args):
+    many = args.workers or multiprocessing.cpu_count()
+    print_section(f"THROUGHPUT: 1 vs {many} WORKERS (GET {args.path}, {args.clients} clients)")
+    single = bench_server(1, args)
+    print(f"{'workers':>7} {'req/s':>10} {'speedup':>8}")
+    print(f"{1:>7} {single:>10,.0f} {1:>8.2f}")
+    if many > 1:
+        multi = bench_server(many, args)
+        print(f"{many:>7} {multi:>10,.0f} {multi / single if single else 0:>8.2f}")
+
+
+# ==========================================
+# COLD START: APPLICATION IMPORT TIME
+# ==========================================
+
+def run_coldstart(args):
+    print_section(f"COLD START ({args.runs} fresh interpreters)")
+    timer = ("import time; t = time.perf_counter(); import app.main; "
+             "print(time.perf_counter() - t)")
+    runs = [float(subprocess.run([sys.executable, "-c", timer], capture_output=True,
+                                 text=True, check=True).stdout)
+            for _ in range(args.runs)]
+    print(f"import app.main: median {statistics.median(runs) * 1000:.0f} ms "
+          f"(min {min(runs) * 1000:.0f}, max {max(runs) * 1000:.0f})")
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    trace = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                           capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative_us), name.strip()))
+    print("\nSlowest imports (cumulative ms):")
+    for cumulative_us, name in sorted(modules, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}  {name}")
+
+
+# ==========================================
+# VECTORIZED ANALYTICS
+# ==========================================
+
+ANALYTICS_BUDGET_MS = 1000
+
+
+def synthetic_analytics_data(rows: int, members: int, seed: int = 0) -> dict:
+    """
+    Memberships, check-ins and payments shaped like the snapshot columns
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = np.array([str(uuid.uuid4()).encode() for _ in range(members)], dtype="S36")
+    plan_ids = np.array([str(uuid.uuid4()).encode() for _ in range(5)], dtype="S36")
+    today = np.datetime64("today", "D")
+
+    starts = today - rng.integers(0, 730, rows).astype("m8[D]")
+    memberships = {
+        "user_id": user_ids[rng.integers(0, members, rows)],
+        "membership_plan_id": plan_ids[rng.integers(0, len(plan_ids), rows)],
+        "status": rng.choice(["active", "expired", "pending"], rows, p=[0.3, 0.6, 0.1]).astype("U10"),
+        "start_date": starts,
+        "end_date": starts + rng.choice([30, 90, 365], rows).astype("m8[D]"),
+    }
+    checkins = {
+        "user_id": user_ids[rng.integers(0, members, rows)],
+        "checkin_time": today.astype("M8[s]") - rng.integers(0, 365 * 86400, rows).astype("m8[s]"),
+    }
+    payments = {
+        "user_id": user_ids[rng.integers(0, members, rows)],
+        "amount": rng.uniform(500, 15000, rows).round(2),
+        "status": rng.choice(["success", "failed"], rows, p=[0.95, 0.05]).astype("U10"),
+        "payment_time": today.astype("M8[s]") - rng.integers(0, 730 * 86400, rows).astype("m8[s]"),
+    }
+    return {"memberships": memberships, "checkins": checkins, "payments": payments}
+
+
+def run_analytics(args):
+    print_section(f"VECTORIZED ANALYTICS ({args.rows:,} rows per table, {args.members:,} members)")
+    data = synthetic_analytics_data(args.rows, args.members)
+    end = date.today()
+    reports = {
+        "retention": lambda: analytics.retention_cohorts(data["memberships"]),
+        "churn": lambda: analytics.churn_by_plan(data["memberships"]),
+        "visit-frequency": lambda: analytics.visit_frequency(
+            data["checkins"], data["memberships"], end - timedelta(days=29), end),
+        "revenue-per-member": lambda: analytics.revenue_per_member(data["payments"]),
+    }
+    for name, report in reports.items():
+        started = time.perf_counter()
+        report()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        verdict = "✅" if elapsed_ms < ANALYTICS_BUDGET_MS else "❌"
+        print(f"{verdict} {name:<20} {elapsed_ms:8.1f} ms (budget {ANALYTICS_BUDGET_MS} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fitness backend benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    ids = subparsers.add_parser("ids", help="CHAR(36) uuid4 vs BINARY(16) v7 primary keys")
+    ids.add_argument("--rows", type=int, default=10_000_000)
+    ids.add_argument("--batch", type=int, default=5000)
+    ids.set_defaults(func=run_ids)
+
+    tokens = subparsers.add_parser("tokens", help="access token verification latency")
+    tokens.add_argument("--iterations", type=int, default=200_000)
+    tokens.set_defaults(func=run_tokens)
+
+    costs = subparsers.add_parser("bcrypt", help="bcrypt hashes/sec per cost factor")
+    costs.add_argument("--min-rounds", type=int, default=4)
+    costs.add_argument("--max-rounds", type=int, default=14)
+    costs.set_defaults(func=run_bcrypt)
+
+    servers = subparsers.add_parser("workers", help="API throughput with 1 vs N gunicorn workers")
+    servers.add_argument("--workers", type=int, default=0, help="N (default: CPU count)")
+    servers.add_argument("--path", default="/user/sessions")
+    servers.add_argument("--clients", type=int, default=16)
+    servers.add_argument("--seconds", type=float, default=10)
+    servers.add_argument("--port", type=int, default=8099)
+    servers.set_defaults(func=run_workers)
+
+    coldstart = subparsers.add_parser("coldstart", help="application import time")
+    coldstart.add_argument("--runs", type=int, default=5)
+    coldstart.add_argument("--top", type=int, default=15)
+    coldstart.set_defaults(func=run_coldstart)
+
+    analytics_bench = subparsers.add_parser("analytics", help="retention / churn / visits / revenue timings")
+    analytics_bench.add_argument("--rows", type=int, default=2_000_000)
+    analytics_bench.add_argument("--members", type=int, default=300_000)
+    analytics_bench.set_defaults(func=run_analytics)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Build the BINARY(16) id variant of sql/schema.sql
+Every id column in the schema is CHAR(36) and every UUID() call generates
+an id, so the binary schema is a mechanical rewrite of the main one.
+
+Usage:
+    python build_binary_schema.py
+    mysql -u root -p Fitness_DB < sql/schema_binary_ids.sql
+Then run the API with ID_STORAGE=binary.
+"""
+from pathlib import Path
+
+SQL_DIR = Path(__file__).parent / "sql"
+
+HEADER = """-- ==========================================
+-- GENERATED by build_binary_schema.py from schema.sql - do not edit.
+-- Ids are stored as BINARY(16) time-ordered UUIDs; run the API with
+-- ID_STORAGE=binary so ids are converted to/from strings transparently.
+-- ==========================================
+
+"""
+
+# v7 layout: 48-bit millisecond timestamp, version nibble, variant bits, random
+NEW_BINARY_ID_FUNCTION = """
+-- ==========================================
+-- ID GENERATION
+-- ==========================================
+
+DELIMITER $$
+
+CREATE FUNCTION new_binary_id()
+RETURNS BINARY(16)
+NOT DETERMINISTIC
+NO SQL
+BEGIN
+    DECLARE v_ms BIGINT UNSIGNED DEFAULT FLOOR(UNIX_TIMESTAMP(NOW(3)) * 1000);
+    DECLARE v_rand BINARY(10) DEFAULT RANDOM_BYTES(10);
+
+    RETURN CONCAT(
+        UNHEX(LPAD(HEX(v_ms), 12, '0')),
+        CHAR(0x70 | (ASCII(SUBSTRING(v_rand, 1, 1)) & 0x0F)),
+        SUBSTRING(v_rand, 2, 1),
+        CHAR(0x80 | (ASCII(SUBSTRING(v_rand, 3, 1)) & 0x3F)),
+        SUBSTRING(v_rand, 4, 7)
+    );
+END$$
+
+DELIMITER ;
+"""
+
+
+def build(schema_sql: str) -> str:
+    """
+    Rewrite the CHAR(36) schema to BINARY(16) ids
+
+    Args:
+        schema_sql: Contents of sql/schema.sql
+
+    Returns:
+        Contents of the binary id schema
+    """
+    binary_sql = schema_sql.replace("CHAR(36)", "BINARY(16)")
+    binary_sql = binary_sql.replace("UUID()", "new_binary_id()")
+    return HEADER + binary_sql + NEW_BINARY_ID_FUNCTION
+
+
+def main():
+    schema_sql = (SQL_DIR / "schema.sql").read_text(encoding="utf-8")
+    output = SQL_DIR / "schema_binary_ids.sql"
+    output.write_text(build(schema_sql), encoding="utf-8")
+    print(f"✅ Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
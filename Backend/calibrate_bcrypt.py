@@ -0,0 +1,58 @@
+"""
+Pick the bcrypt cost factor for this host
+
+Measures bcrypt verify time per cost factor and chooses the highest one
+whose verify (= login) time stays within the target. With --write the
+result is stored as BCRYPT_ROUNDS in .env; existing hashes are migrated to
+it on each user's next successful login.
+
+Usage:
+    python calibrate_bcrypt.py --target-ms 250 --write
+"""
+import argparse
+import re
+from pathlib import Path
+
+from app.auth import BCRYPT_ROUNDS, calibrate_bcrypt_rounds
+
+ENV_FILE = Path(__file__).parent / ".env"
+
+
+def write_rounds(rounds: int, env_file: Path = ENV_FILE):
+    """
+    Set BCRYPT_ROUNDS in the .env file, keeping every other line
+    """
+    lines = env_file.read_text(encoding="utf-8").splitlines() if env_file.exists() else []
+    setting = f"BCRYPT_ROUNDS={rounds}"
+    for i, line in enumerate(lines):
+        if re.match(r"\s*BCRYPT_ROUNDS\s*=", line):
+            lines[i] = setting
+            break
+    else:
+        lines.append(setting)
+    env_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the bcrypt cost factor")
+    parser.add_argument("--target-ms", type=float, default=250,
+                        help="acceptable verify time per login")
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--write", action="store_true", help="store the result in .env")
+    args = parser.parse_args()
+
+    rounds, timings = calibrate_bcrypt_rounds(args.target_ms / 1000,
+                                              args.min_rounds, args.max_rounds)
+    for cost, seconds in timings.items():
+        marker = "  <- chosen" if cost == rounds else ""
+        print(f"cost {cost:>2}: {seconds * 1000:8.1f} ms per verify{marker}")
+
+    print(f"✅ BCRYPT_ROUNDS={rounds} (currently {BCRYPT_ROUNDS}, target {args.target_ms:g} ms)")
+    if args.write:
+        write_rounds(rounds)
+        print(f"✅ Wrote BCRYPT_ROUNDS={rounds} to {ENV_FILE}")
+
+
+if __name__ == "__main__":
+    main()
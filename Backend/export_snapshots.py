@@ -0,0 +1,42 @@
+"""
+Incremental export of the columnar analytics snapshots
+
+Writes bookings, payments, checkins, memberships and sessions created since
+the last export to var/snapshots/ (see app/snapshots.py). Reports read them
+with ?source=snapshot.
+
+Usage (e.g. every 15 minutes from cron):
+    python export_snapshots.py
+    python export_snapshots.py --tables payments bookings
+"""
+import argparse
+import time
+
+from app.database import SessionLocal
+from app.snapshots import TABLES, export_snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export columnar analytics snapshots")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES),
+                        help="tables to export (default: all)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        results = export_snapshots(db, args.tables)
+    finally:
+        db.close()
+
+    if "skipped" in results:
+        print(f"⏭️  Skipped: {results['skipped']}")
+        return
+    for table, result in results.items():
+        print(f"✅ {table}: {result['rows']} rows in {result['days']} day partitions "
+              f"(re-exported from {result['from_day']})")
+    print(f"Done in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
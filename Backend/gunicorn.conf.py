@@ -0,0 +1,78 @@
+"""
+Production server configuration
+
+Runs the FastAPI app in N preloaded uvicorn worker processes:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+WEB_CONCURRENCY sets the worker count (default: one per CPU core). The
+MySQL connection budget (DB_MAX_CONNECTIONS minus DB_RESERVED_CONNECTIONS
+for cron jobs and admin sessions) is divided between the workers, so
+workers x (pool size + overflow) never exceeds max_connections.
+`kill -HUP <master pid>` restarts workers gracefully; workers are also
+recycled after MAX_REQUESTS requests.
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once in the master; workers fork with it already loaded
+preload_app = True
+
+# Graceful restarts: in-flight requests get this long to finish
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+# MySQL's default max_connections is 151
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "151"))
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "11"))
+
+
+def connection_budget(worker_count: int) -> tuple:
+    """
+    Split the connection budget into (pool_size, max_overflow) per worker
+    """
+    per_worker = (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) // worker_count
+    if per_worker < 1:
+        raise SystemExit(
+            f"{worker_count} workers need at least {worker_count} connections, "
+            f"budget is {DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS}"
+        )
+    pool_size = max(1, per_worker // 2)
+    return pool_size, per_worker - pool_size
+
+
+# Read by app/database.py when the app is preloaded, which happens after this
+# file runs; that is why the worker count comes from WEB_CONCURRENCY, not -w
+pool_size, max_overflow = connection_budget(workers)
+os.environ["DB_POOL_SIZE"] = str(pool_size)
+os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+# Read by app/ratelimit.py to split the host-wide bcrypt budget between workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+
+def on_starting(server):
+    if server.cfg.workers != workers:
+        raise SystemExit("Set the worker count with WEB_CONCURRENCY so the DB pools are sized for it")
+    server.log.info(
+        f"{workers} workers x ({pool_size} pooled + {max_overflow} overflow) "
+        f"DB connections, budget {DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS}"
+    )
+
+
+def post_fork(server, worker):
+    """
+    Never share pooled connections opened in the master with a worker
+    """
+    from app.database import engine
+    engine.dispose(close=False)
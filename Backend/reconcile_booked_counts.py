@@ -0,0 +1,88 @@
+"""
+Reconciliation job for sessions.booked_count
+
+booked_count is maintained by the booking triggers; this job recounts
+confirmed + completed bookings and repairs any drift (manual edits, rows
+inserted with triggers disabled, bulk loads). Sessions are processed in
+primary-key batches, each in its own short transaction.
+
+Usage:
+    python reconcile_booked_counts.py --batch-size 1000
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+
+
+def reconcile_batch(db, after_id: str, batch_size: int):
+    """
+    Recount one batch of sessions with ids greater than `after_id`
+
+    Returns:
+        (last session id in the batch or None when done, sessions repaired)
+    """
+    # Lock the batch first: bookings for these sessions wait on the row locks,
+    # and the recount below takes its snapshot only after the locks are held.
+    ids = db.execute(text("""
+        SELECT id FROM sessions
+        WHERE id > :after_id
+        ORDER BY id
+        LIMIT :batch_size
+        FOR UPDATE
+    """), {'after_id': after_id, 'batch_size': batch_size}).fetchall()
+
+    if not ids:
+        db.commit()
+        return None, 0
+
+    last_id = ids[-1][0]
+    result = db.execute(text("""
+        UPDATE sessions s
+        LEFT JOIN (
+            SELECT session_id, COUNT(*) AS booked
+            FROM bookings
+            WHERE session_id > :after_id AND session_id <= :last_id
+              AND status IN ('confirmed', 'completed')
+            GROUP BY session_id
+        ) bk ON bk.session_id = s.id
+        SET s.booked_count = COALESCE(bk.booked, 0)
+        WHERE s.id > :after_id AND s.id <= :last_id
+          AND s.booked_count != COALESCE(bk.booked, 0)
+    """), {'after_id': after_id, 'last_id': last_id})
+    db.commit()
+
+    return last_id, result.rowcount
+
+
+def reconcile(db, batch_size: int = 1000) -> int:
+    """
+    Recount booked_count for every session
+
+    Returns:
+        Number of sessions whose counter was repaired
+    """
+    after_id, repaired = '', 0
+    while True:
+        after_id, fixed = reconcile_batch(db, after_id, batch_size)
+        if after_id is None:
+            return repaired
+        repaired += fixed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repair drift in sessions.booked_count")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        repaired = reconcile(db, args.batch_size)
+        print(f"✅ Repaired booked_count on {repaired} session(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
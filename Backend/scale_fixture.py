@@ -0,0 +1,180 @@
+"""
+Scaled fixture generator for query-plan checks and benchmarks
+Fills Fitness_DB with synthetic data large enough that the optimizer
+picks the same plans it would in production.
+
+Usage:
+    python scale_fixture.py --users 20000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+from app.ids import new_id
+from reconcile_booked_counts import reconcile
+
+BATCH_SIZE = 1000
+
+TABLES = [
+    "coupon_redemptions", "checkins", "bookings", "payments", "memberships",
+    "user_phones", "sessions", "coupons", "membership_plans",
+    "activity_types", "studios", "branches", "users",
+]
+
+
+def _insert_many(db, table: str, columns: list, rows: list):
+    """
+    Insert rows in multi-row batches
+
+    Args:
+        db: Database session
+        table: Target table name
+        columns: Column names, in the order of each row tuple
+        rows: List of row tuples
+    """
+    column_list = ', '.join(columns)
+    placeholders = ', '.join(f":{c}" for c in columns)
+    query = text(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})")
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        db.execute(query, [dict(zip(columns, row)) for row in batch])
+    db.commit()
+
+
+def clear_data(db):
+    """
+    Delete all rows from every table (children first)
+    """
+    for table in TABLES:
+        db.execute(text(f"DELETE FROM {table}"))
+    db.commit()
+
+
+def generate(db, users: int, seed: int = 42):
+    """
+    Generate a scaled fixture proportional to the number of users
+
+    Args:
+        db: Database session
+        users: Number of users to create; other tables scale from it
+        seed: Random seed so repeated runs produce the same shape
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    branch_count = max(4, users // 5000)
+    sessions_count = max(100, users // 2)
+    bookings_per_user = 5
+
+    branches = [(new_id(), f"Branch {i}", f"City {i % 10}") for i in range(branch_count)]
+    _insert_many(db, "branches", ["id", "name", "city"], branches)
+
+    studios = []
+    for branch_id, _, _ in branches:
+        for i in range(4):
+            studios.append((new_id(), f"Studio {i}", i, 40, branch_id))
+    _insert_many(db, "studios", ["id", "name", "floor", "capacity", "branch_id"], studios)
+
+    activity_types = [
+        (new_id(), name, 1)
+        for name in ["Yoga", "Cardio", "Weight Training", "Pilates", "Spinning",
+                     "Zumba", "CrossFit", "Boxing", "HIIT"]
+    ]
+    _insert_many(db, "activity_types", ["id", "name", "is_active"], activity_types)
+
+    plans = [(new_id(), f"Plan {m}M", 500.0 * m, m, 1) for m in (1, 3, 6, 12)]
+    _insert_many(db, "membership_plans",
+                 ["id", "name", "price", "duration_months", "is_active"], plans)
+
+    coupons = []
+    for i in range(200):
+        start = now - timedelta(days=rng.randint(0, 720))
+        coupons.append((new_id(), f"CODE{i:04d}", "percent", 10, start,
+                        start + timedelta(days=rng.randint(7, 365)), rng.randint(0, 1)))
+    _insert_many(db, "coupons",
+                 ["id", "code", "discount_type", "discount_value",
+                  "valid_from", "valid_to", "is_active"], coupons)
+
+    user_rows = [
+        (new_id(), f"User {i}", f"user{i}@scale.test", "x", "user")
+        for i in range(users)
+    ]
+    _insert_many(db, "users", ["id", "name", "email", "password_hash", "role"], user_rows)
+
+    session_rows = []
+    for i in range(sessions_count):
+        studio_id, branch_id = rng.choice([(s[0], s[4]) for s in studios])
+        start = now + timedelta(hours=rng.randint(-24 * 365, 24 * 60))
+        session_rows.append((
+            new_id(), studio_id, f"Session {i}", branch_id,
+            start, start + timedelta(hours=1), rng.choice(activity_types)[0],
+            f"Instructor {i % 200}", users
+        ))
+    _insert_many(db, "sessions",
+                 ["id", "studio_id", "name", "branch_id", "start_time", "end_time",
+                  "activity_type_id", "instructor", "capacity"], session_rows)
+
+    memberships, payments, redemptions = [], [], []
+    bookings, checkins = [], []
+    for user_id, *_ in user_rows:
+        plan = rng.choice(plans)
+        start = (now - timedelta(days=rng.randint(0, 720))).date()
+        membership_id = new_id()
+        memberships.append((membership_id, user_id, start,
+                            start + timedelta(days=30 * plan[3]),
+                            rng.choice(["active", "expired"]), plan[0]))
+        payment_id = new_id()
+        payments.append((payment_id, user_id, membership_id, None, plan[2], "card",
+                         datetime.combine(start, datetime.min.time()), "success"))
+        if rng.random() < 0.2:
+            redemptions.append((new_id(), rng.choice(coupons)[0], user_id, payment_id))
+
+        for session in rng.sample(session_rows, bookings_per_user):
+            booking_id = new_id()
+            status = rng.choice(["confirmed", "completed", "completed", "cancelled"])
+            bookings.append((booking_id, user_id, session[0], status))
+            if status == "completed":
+                checkins.append((new_id(), user_id, session[0], session[3], session[4]))
+            if rng.random() < 0.1:
+                payments.append((new_id(), user_id, None, booking_id, 200.0, "upi",
+                                 session[4], "success"))
+
+    _insert_many(db, "memberships",
+                 ["id", "user_id", "start_date", "end_date", "status",
+                  "membership_plan_id"], memberships)
+    _insert_many(db, "payments",
+                 ["id", "user_id", "membership_id", "booking_id", "amount",
+                  "payment_method", "payment_time", "status"], payments)
+    _insert_many(db, "coupon_redemptions",
+                 ["id", "coupon_id", "user_id", "payment_id"], redemptions)
+    _insert_many(db, "bookings", ["id", "user_id", "session_id", "status"], bookings)
+    # The booking trigger only counts rows inserted as confirmed
+    reconcile(db)
+    _insert_many(db, "checkins",
+                 ["id", "user_id", "session_id", "branch_id", "checkin_time"], checkins)
+
+    db.execute(text(f"ANALYZE TABLE {', '.join(TABLES)}"))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a scaled Fitness_DB fixture")
+    parser.add_argument("--users", type=int, default=20000, help="number of users to create")
+    parser.add_argument("--keep", action="store_true", help="keep existing rows instead of clearing")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not args.keep:
+            clear_data(db)
+        generate(db, args.users)
+        print(f"✅ Scaled fixture generated for {args.users} users")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
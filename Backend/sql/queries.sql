@@ -100,12 +100,12 @@ SELECT
     s.instructor,
     b.name AS branch_name,
     st.name AS studio_name,
-    s.capacity AS available_spots
+    s.capacity - s.booked_count AS available_spots
 FROM sessions s
 INNER JOIN activity_types at ON s.activity_type_id = at.id
 INNER JOIN branches b ON s.branch_id = b.id
 INNER JOIN studios st ON s.studio_id = st.id
-WHERE s.capacity > 0 
+WHERE s.booked_count < s.capacity 
   AND s.start_time > NOW()
 ORDER BY s.start_time ASC;
 
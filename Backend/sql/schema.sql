@@ -70,27 +70,52 @@ CREATE TABLE memberships (
 -- ==========================================
 -- PAYMENTS TABLE
 -- ==========================================
+-- Partitioned by month on payment_time (see PARTITION MAINTENANCE below).
+-- The partition column must be part of the primary key, and partitioned
+-- InnoDB tables cannot have foreign keys, so user cleanup is done by the
+-- trg_*_delete_history triggers instead of ON DELETE CASCADE, and
+-- membership_id is cleared by trg_membership_delete_payments instead of
+-- ON DELETE SET NULL.
 CREATE TABLE payments (
-    id CHAR(36) PRIMARY KEY,
+    id CHAR(36) NOT NULL,
     user_id CHAR(36) NOT NULL,
     membership_id CHAR(36),
     amount DECIMAL(10,2) NOT NULL CHECK (amount >= 0),
     payment_method VARCHAR(50) CHECK (payment_method IN ('card','cash','upi','wallet','netbanking')),
-    payment_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    payment_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     status VARCHAR(20) CHECK (status IN ('success','failed','pending')),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     booking_id CHAR(36),
-    CONSTRAINT fk_payments_user
-        FOREIGN KEY (user_id)
-        REFERENCES users(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT fk_payments_membership
-        FOREIGN KEY (membership_id)
-        REFERENCES memberships(id)
-        ON DELETE SET NULL
-        ON UPDATE CASCADE
-) ENGINE=InnoDB;
+    PRIMARY KEY (id, payment_time)
+) ENGINE=InnoDB
+PARTITION BY RANGE (UNIX_TIMESTAMP(payment_time)) (
+    PARTITION p202412 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+    PARTITION p202501 VALUES LESS THAN (UNIX_TIMESTAMP('2025-02-01 00:00:00')),
+    PARTITION p202502 VALUES LESS THAN (UNIX_TIMESTAMP('2025-03-01 00:00:00')),
+    PARTITION p202503 VALUES LESS THAN (UNIX_TIMESTAMP('2025-04-01 00:00:00')),
+    PARTITION p202504 VALUES LESS THAN (UNIX_TIMESTAMP('2025-05-01 00:00:00')),
+    PARTITION p202505 VALUES LESS THAN (UNIX_TIMESTAMP('2025-06-01 00:00:00')),
+    PARTITION p202506 VALUES LESS THAN (UNIX_TIMESTAMP('2025-07-01 00:00:00')),
+    PARTITION p202507 VALUES LESS THAN (UNIX_TIMESTAMP('2025-08-01 00:00:00')),
+    PARTITION p202508 VALUES LESS THAN (UNIX_TIMESTAMP('2025-09-01 00:00:00')),
+    PARTITION p202509 VALUES LESS THAN (UNIX_TIMESTAMP('2025-10-01 00:00:00')),
+    PARTITION p202510 VALUES LESS THAN (UNIX_TIMESTAMP('2025-11-01 00:00:00')),
+    PARTITION p202511 VALUES LESS THAN (UNIX_TIMESTAMP('2025-12-01 00:00:00')),
+    PARTITION p202512 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p202601 VALUES LESS THAN (UNIX_TIMESTAMP('2026-02-01 00:00:00')),
+    PARTITION p202602 VALUES LESS THAN (UNIX_TIMESTAMP('2026-03-01 00:00:00')),
+    PARTITION p202603 VALUES LESS THAN (UNIX_TIMESTAMP('2026-04-01 00:00:00')),
+    PARTITION p202604 VALUES LESS THAN (UNIX_TIMESTAMP('2026-05-01 00:00:00')),
+    PARTITION p202605 VALUES LESS THAN (UNIX_TIMESTAMP('2026-06-01 00:00:00')),
+    PARTITION p202606 VALUES LESS THAN (UNIX_TIMESTAMP('2026-07-01 00:00:00')),
+    PARTITION p202607 VALUES LESS THAN (UNIX_TIMESTAMP('2026-08-01 00:00:00')),
+    PARTITION p202608 VALUES LESS THAN (UNIX_TIMESTAMP('2026-09-01 00:00:00')),
+    PARTITION p202609 VALUES LESS THAN (UNIX_TIMESTAMP('2026-10-01 00:00:00')),
+    PARTITION p202610 VALUES LESS THAN (UNIX_TIMESTAMP('2026-11-01 00:00:00')),
+    PARTITION p202611 VALUES LESS THAN (UNIX_TIMESTAMP('2026-12-01 00:00:00')),
+    PARTITION p202612 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
 
 -- ==========================================
 -- COUPONS TABLE
@@ -126,12 +151,19 @@ CREATE TABLE coupon_redemptions (
         FOREIGN KEY (user_id)
         REFERENCES users(id)
         ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT fk_coupon_redemptions_payment
-        FOREIGN KEY (payment_id)
-        REFERENCES payments(id)
-        ON DELETE SET NULL
         ON UPDATE CASCADE
+    -- payment_id cannot reference the partitioned payments table; it is
+    -- cleared by trg_payment_delete_redemptions (was ON DELETE SET NULL)
+) ENGINE=InnoDB;
+
+-- ==========================================
+-- REVOKED TOKENS TABLE
+-- ==========================================
+-- Logged-out access tokens until they expire (see app/auth.py)
+CREATE TABLE revoked_tokens (
+    token_id VARCHAR(32) PRIMARY KEY,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_revoked_tokens_expires (expires_at)
 ) ENGINE=InnoDB;
 
 -- ==========================================
@@ -189,7 +221,8 @@ CREATE TABLE sessions (
     end_time DATETIME NOT NULL,
     activity_type_id CHAR(36) NOT NULL,
     instructor VARCHAR(100),
-    capacity INT CHECK (capacity >= 0),
+    capacity INT CHECK (capacity >= 0),             -- fixed at creation
+    booked_count INT NOT NULL DEFAULT 0 CHECK (booked_count >= 0),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_sessions_studio
         FOREIGN KEY (studio_id)
@@ -233,40 +266,162 @@ CREATE TABLE bookings (
 -- ==========================================
 -- CHECKINS TABLE
 -- ==========================================
+-- Partitioned by month on checkin_time; same key / foreign key rules as payments.
 CREATE TABLE checkins (
-    id CHAR(36) PRIMARY KEY,
+    id CHAR(36) NOT NULL,
     user_id CHAR(36) NOT NULL,
     session_id CHAR(36) NOT NULL,
     branch_id CHAR(36) NOT NULL,
-    checkin_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    checkin_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    CONSTRAINT fk_checkins_user
+    PRIMARY KEY (id, checkin_time)
+) ENGINE=InnoDB
+PARTITION BY RANGE (UNIX_TIMESTAMP(checkin_time)) (
+    PARTITION p202412 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+    PARTITION p202501 VALUES LESS THAN (UNIX_TIMESTAMP('2025-02-01 00:00:00')),
+    PARTITION p202502 VALUES LESS THAN (UNIX_TIMESTAMP('2025-03-01 00:00:00')),
+    PARTITION p202503 VALUES LESS THAN (UNIX_TIMESTAMP('2025-04-01 00:00:00')),
+    PARTITION p202504 VALUES LESS THAN (UNIX_TIMESTAMP('2025-05-01 00:00:00')),
+    PARTITION p202505 VALUES LESS THAN (UNIX_TIMESTAMP('2025-06-01 00:00:00')),
+    PARTITION p202506 VALUES LESS THAN (UNIX_TIMESTAMP('2025-07-01 00:00:00')),
+    PARTITION p202507 VALUES LESS THAN (UNIX_TIMESTAMP('2025-08-01 00:00:00')),
+    PARTITION p202508 VALUES LESS THAN (UNIX_TIMESTAMP('2025-09-01 00:00:00')),
+    PARTITION p202509 VALUES LESS THAN (UNIX_TIMESTAMP('2025-10-01 00:00:00')),
+    PARTITION p202510 VALUES LESS THAN (UNIX_TIMESTAMP('2025-11-01 00:00:00')),
+    PARTITION p202511 VALUES LESS THAN (UNIX_TIMESTAMP('2025-12-01 00:00:00')),
+    PARTITION p202512 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p202601 VALUES LESS THAN (UNIX_TIMESTAMP('2026-02-01 00:00:00')),
+    PARTITION p202602 VALUES LESS THAN (UNIX_TIMESTAMP('2026-03-01 00:00:00')),
+    PARTITION p202603 VALUES LESS THAN (UNIX_TIMESTAMP('2026-04-01 00:00:00')),
+    PARTITION p202604 VALUES LESS THAN (UNIX_TIMESTAMP('2026-05-01 00:00:00')),
+    PARTITION p202605 VALUES LESS THAN (UNIX_TIMESTAMP('2026-06-01 00:00:00')),
+    PARTITION p202606 VALUES LESS THAN (UNIX_TIMESTAMP('2026-07-01 00:00:00')),
+    PARTITION p202607 VALUES LESS THAN (UNIX_TIMESTAMP('2026-08-01 00:00:00')),
+    PARTITION p202608 VALUES LESS THAN (UNIX_TIMESTAMP('2026-09-01 00:00:00')),
+    PARTITION p202609 VALUES LESS THAN (UNIX_TIMESTAMP('2026-10-01 00:00:00')),
+    PARTITION p202610 VALUES LESS THAN (UNIX_TIMESTAMP('2026-11-01 00:00:00')),
+    PARTITION p202611 VALUES LESS THAN (UNIX_TIMESTAMP('2026-12-01 00:00:00')),
+    PARTITION p202612 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- ==========================================
+-- CHECK-IN ROLLUPS (occupancy reports)
+-- ==========================================
+-- Maintained incrementally by trg_checkin_rollup. They keep counting history
+-- after months are archived and are not decremented when rows are deleted.
+CREATE TABLE checkin_hourly_rollup (
+    hour_start DATETIME NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    checkins INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour_start, branch_id)
+) ENGINE=InnoDB;
+
+CREATE TABLE checkin_daily_activity_rollup (
+    day DATE NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    activity_type_id CHAR(36) NOT NULL,
+    checkins INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, branch_id, activity_type_id)
+) ENGINE=InnoDB;
+
+-- ==========================================
+-- USER ACTIVITY AGGREGATES (user activity report)
+-- ==========================================
+-- Maintained incrementally by trg_checkin_rollup and trg_cancel_booking.
+-- user_activity_stats holds all-time totals (one row per active user);
+-- user_daily_activity answers date-range reports; user_branch_visits
+-- lets branches_visited be counted without a COUNT(DISTINCT).
+CREATE TABLE user_activity_stats (
+    user_id CHAR(36) PRIMARY KEY,
+    total_checkins INT NOT NULL DEFAULT 0,
+    branches_visited INT NOT NULL DEFAULT 0,
+    first_checkin TIMESTAMP NULL,
+    last_checkin TIMESTAMP NULL,
+    cancelled_bookings INT NOT NULL DEFAULT 0,
+    INDEX idx_user_activity_stats_rank (total_checkins, user_id),
+    CONSTRAINT fk_user_activity_stats_user
         FOREIGN KEY (user_id)
         REFERENCES users(id)
         ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT fk_checkins_session
-        FOREIGN KEY (session_id)
-        REFERENCES sessions(id)
+) ENGINE=InnoDB;
+
+CREATE TABLE user_branch_visits (
+    user_id CHAR(36) NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    PRIMARY KEY (user_id, branch_id),
+    CONSTRAINT fk_user_branch_visits_user
+        FOREIGN KEY (user_id)
+        REFERENCES users(id)
         ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT fk_checkins_branch
-        FOREIGN KEY (branch_id)
-        REFERENCES branches(id)
+) ENGINE=InnoDB;
+
+CREATE TABLE user_daily_activity (
+    day DATE NOT NULL,
+    user_id CHAR(36) NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    checkins INT NOT NULL DEFAULT 0,
+    cancellations INT NOT NULL DEFAULT 0,
+    first_checkin TIMESTAMP NULL,
+    last_checkin TIMESTAMP NULL,
+    PRIMARY KEY (day, user_id, branch_id),
+    CONSTRAINT fk_user_daily_activity_user
+        FOREIGN KEY (user_id)
+        REFERENCES users(id)
         ON DELETE CASCADE
-        ON UPDATE CASCADE
 ) ENGINE=InnoDB;
 
 -- ==========================================
 -- INDEXES FOR PERFORMANCE
 -- ==========================================
 CREATE INDEX idx_memberships_user_status ON memberships(user_id, status);
-CREATE INDEX idx_bookings_user ON bookings(user_id);
+CREATE INDEX idx_bookings_user_session_status ON bookings(user_id, session_id, status);
 CREATE INDEX idx_bookings_session ON bookings(session_id);
-CREATE INDEX idx_sessions_branch ON sessions(branch_id);
+-- (filter, start_time) pairs back /user/sessions/search; their leading
+-- columns also cover the branch / activity type foreign keys
+CREATE INDEX idx_sessions_branch_start ON sessions(branch_id, start_time);
+CREATE INDEX idx_sessions_studio_start ON sessions(studio_id, start_time);
 CREATE INDEX idx_sessions_datetime ON sessions(start_time, end_time);
+CREATE INDEX idx_sessions_activity_start ON sessions(activity_type_id, start_time);
+CREATE INDEX idx_sessions_instructor_start ON sessions(instructor, start_time);
+CREATE INDEX idx_sessions_booked_count ON sessions(booked_count);
+-- Ranked text search (/user/sessions/search/text)
+CREATE FULLTEXT INDEX idx_sessions_fulltext ON sessions(name, description, instructor);
+CREATE FULLTEXT INDEX idx_activity_types_fulltext ON activity_types(name, description);
 CREATE INDEX idx_payments_user ON payments(user_id);
+CREATE INDEX idx_payments_booking ON payments(booking_id);
+CREATE INDEX idx_payments_membership ON payments(membership_id);
+CREATE INDEX idx_coupon_redemptions_payment ON coupon_redemptions(payment_id);
+CREATE INDEX idx_coupons_active_validity ON coupons(is_active, valid_from, valid_to);
 CREATE INDEX idx_checkins_user ON checkins(user_id);
+CREATE INDEX idx_checkins_session ON checkins(session_id);
+CREATE INDEX idx_checkins_branch ON checkins(branch_id);
+-- created_at watermarks of the incremental snapshot export (export_snapshots.py)
+CREATE INDEX idx_bookings_created ON bookings(created_at);
+CREATE INDEX idx_payments_created ON payments(created_at);
+CREATE INDEX idx_checkins_created ON checkins(created_at);
+CREATE INDEX idx_memberships_created ON memberships(created_at);
+CREATE INDEX idx_sessions_created ON sessions(created_at);
+
+-- ==========================================
+-- PARTITION MAINTENANCE / ARCHIVE TABLES
+-- ==========================================
+-- checkins and payments are RANGE partitioned by month (pYYYYMM holds that
+-- month; p202412 also holds all earlier history). archive_job.py keeps
+-- future partitions ahead of NOW() and moves old months into the archive
+-- tables below with EXCHANGE PARTITION, so no rows are copied.
+-- Archive tables must keep exactly the same columns and indexes.
+CREATE TABLE checkins_archive LIKE checkins;
+ALTER TABLE checkins_archive
+    PARTITION BY RANGE (UNIX_TIMESTAMP(checkin_time)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+
+CREATE TABLE payments_archive LIKE payments;
+ALTER TABLE payments_archive
+    PARTITION BY RANGE (UNIX_TIMESTAMP(payment_time)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
 
 -- ==========================================
 -- TRIGGERS
@@ -296,27 +451,48 @@ BEGIN
     END IF;
 END$$
 
--- Trigger 3: Booking cancellation → increment session capacity
+-- Trigger 3: Booking cancellation → release the spot, count the cancellation
 CREATE TRIGGER trg_cancel_booking
 AFTER UPDATE ON bookings
 FOR EACH ROW
 BEGIN
+    DECLARE v_branch_id CHAR(36);
+
     IF NEW.status = 'cancelled' AND OLD.status != 'cancelled' THEN
-        UPDATE sessions
-        SET capacity = capacity + 1
-        WHERE id = NEW.session_id;
+        IF OLD.status IN ('confirmed', 'completed') THEN
+            UPDATE sessions
+            SET booked_count = booked_count - 1
+            WHERE id = NEW.session_id;
+        END IF;
+
+        SELECT branch_id INTO v_branch_id FROM sessions WHERE id = NEW.session_id;
+
+        INSERT INTO user_activity_stats (user_id, cancelled_bookings)
+        VALUES (NEW.user_id, 1)
+        ON DUPLICATE KEY UPDATE cancelled_bookings = cancelled_bookings + 1;
+
+        INSERT INTO user_daily_activity (day, user_id, branch_id, cancellations)
+        VALUES (CURDATE(), NEW.user_id, v_branch_id, 1)
+        ON DUPLICATE KEY UPDATE cancellations = cancellations + 1;
     END IF;
 END$$
 
--- Trigger 4: Booking confirmation → decrement session capacity
+-- Trigger 4: Booking confirmation → take a spot
+-- The guarded UPDATE is the atomic capacity check: two concurrent bookings
+-- for the last spot serialize on the session row and only one succeeds.
 CREATE TRIGGER trg_confirm_booking
 AFTER INSERT ON bookings
 FOR EACH ROW
 BEGIN
     IF NEW.status = 'confirmed' THEN
         UPDATE sessions
-        SET capacity = capacity - 1
-        WHERE id = NEW.session_id;
+        SET booked_count = booked_count + 1
+        WHERE id = NEW.session_id AND booked_count < capacity;
+
+        IF ROW_COUNT() = 0 THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Session is fully booked. No capacity available.';
+        END IF;
     END IF;
 END$$
 
@@ -326,7 +502,7 @@ BEFORE INSERT ON bookings
 FOR EACH ROW
 BEGIN
     DECLARE available_capacity INT;
-    SELECT capacity INTO available_capacity FROM sessions WHERE id = NEW.session_id;
+    SELECT capacity - booked_count INTO available_capacity FROM sessions WHERE id = NEW.session_id;
     
     IF available_capacity <= 0 THEN
         SIGNAL SQLSTATE '45000'
@@ -334,6 +510,109 @@ BEGIN
     END IF;
 END$$
 
+-- Triggers 6-10: Replace ON DELETE CASCADE for the partitioned history tables.
+-- Rows removed by a foreign key cascade do not fire triggers, so deletes are
+-- handled at every table a cascade into sessions can start from (users,
+-- sessions, branches, studios, activity_types).
+CREATE TRIGGER trg_user_delete_history
+AFTER DELETE ON users
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins WHERE user_id = OLD.id;
+    DELETE FROM payments WHERE user_id = OLD.id;
+END$$
+
+CREATE TRIGGER trg_session_delete_history
+AFTER DELETE ON sessions
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins WHERE session_id = OLD.id;
+END$$
+
+CREATE TRIGGER trg_branch_delete_history
+AFTER DELETE ON branches
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins WHERE branch_id = OLD.id;
+END$$
+
+-- Sessions removed by a studio or activity type delete are gone by the time
+-- an AFTER trigger runs, so these look their check-ins up BEFORE the delete.
+-- (sessions.activity_type_id is ON DELETE RESTRICT today; if the delete is
+-- rejected the statement, and this trigger's work, is rolled back.)
+CREATE TRIGGER trg_studio_delete_history
+BEFORE DELETE ON studios
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins
+    WHERE session_id IN (SELECT id FROM sessions WHERE studio_id = OLD.id);
+END$$
+
+CREATE TRIGGER trg_activity_type_delete_history
+BEFORE DELETE ON activity_types
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins
+    WHERE session_id IN (SELECT id FROM sessions WHERE activity_type_id = OLD.id);
+END$$
+
+-- Triggers 11-12: Replace ON DELETE SET NULL for payments.membership_id and
+-- coupon_redemptions.payment_id, which lost their foreign keys to partitioning.
+CREATE TRIGGER trg_membership_delete_payments
+AFTER DELETE ON memberships
+FOR EACH ROW
+BEGIN
+    UPDATE payments SET membership_id = NULL WHERE membership_id = OLD.id;
+END$$
+
+CREATE TRIGGER trg_payment_delete_redemptions
+AFTER DELETE ON payments
+FOR EACH ROW
+BEGIN
+    UPDATE coupon_redemptions SET payment_id = NULL WHERE payment_id = OLD.id;
+END$$
+
+-- Trigger 13: Check-in → bump the occupancy rollups and user activity aggregates
+CREATE TRIGGER trg_checkin_rollup
+AFTER INSERT ON checkins
+FOR EACH ROW
+BEGIN
+    DECLARE v_activity_type_id CHAR(36);
+    DECLARE v_new_branch INT;
+    SELECT activity_type_id INTO v_activity_type_id FROM sessions WHERE id = NEW.session_id;
+
+    INSERT INTO checkin_hourly_rollup (hour_start, branch_id, checkins)
+    VALUES (DATE_FORMAT(NEW.checkin_time, '%Y-%m-%d %H:00:00'), NEW.branch_id, 1)
+    ON DUPLICATE KEY UPDATE checkins = checkins + 1;
+
+    INSERT INTO checkin_daily_activity_rollup (day, branch_id, activity_type_id, checkins)
+    VALUES (DATE(NEW.checkin_time), NEW.branch_id, v_activity_type_id, 1)
+    ON DUPLICATE KEY UPDATE checkins = checkins + 1;
+
+    -- 1 if this is the user's first check-in at the branch, 0 otherwise
+    INSERT IGNORE INTO user_branch_visits (user_id, branch_id)
+    VALUES (NEW.user_id, NEW.branch_id);
+    SET v_new_branch = ROW_COUNT();
+
+    INSERT INTO user_activity_stats
+        (user_id, total_checkins, branches_visited, first_checkin, last_checkin)
+    VALUES (NEW.user_id, 1, v_new_branch, NEW.checkin_time, NEW.checkin_time)
+    ON DUPLICATE KEY UPDATE
+        total_checkins = total_checkins + 1,
+        branches_visited = branches_visited + v_new_branch,
+        first_checkin = LEAST(COALESCE(first_checkin, NEW.checkin_time), NEW.checkin_time),
+        last_checkin = GREATEST(COALESCE(last_checkin, NEW.checkin_time), NEW.checkin_time);
+
+    INSERT INTO user_daily_activity
+        (day, user_id, branch_id, checkins, first_checkin, last_checkin)
+    VALUES (DATE(NEW.checkin_time), NEW.user_id, NEW.branch_id, 1,
+            NEW.checkin_time, NEW.checkin_time)
+    ON DUPLICATE KEY UPDATE
+        checkins = checkins + 1,
+        first_checkin = LEAST(COALESCE(first_checkin, NEW.checkin_time), NEW.checkin_time),
+        last_checkin = GREATEST(COALESCE(last_checkin, NEW.checkin_time), NEW.checkin_time);
+END$$
+
 DELIMITER ;
 
 -- ==========================================
@@ -407,7 +686,7 @@ BEGIN
     END IF;
     
     -- Check capacity
-    SELECT capacity INTO v_capacity FROM sessions WHERE id = p_session_id;
+    SELECT capacity - booked_count INTO v_capacity FROM sessions WHERE id = p_session_id;
     
     IF v_capacity <= 0 THEN
         SIGNAL SQLSTATE '45000'
@@ -526,6 +805,43 @@ CREATE PROCEDURE create_session(
     OUT p_session_id CHAR(36)
 )
 BEGIN
+    DECLARE v_clashes INT;
+
+    -- Sessions last at most 24 hours (MAX_SESSION_HOURS in app/schemas.py),
+    -- so only sessions starting in (p_start_time - 24h, p_end_time) can
+    -- overlap: a short range on (studio_id, start_time) / (instructor, start_time).
+    IF p_end_time > p_start_time + INTERVAL 24 HOUR THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Session is longer than 24 hours';
+    END IF;
+
+    -- Re-check overlaps under locks, so concurrent creates from any API
+    -- worker cannot both pass: the studio row lock serializes creates per
+    -- studio, and the locking read of the instructor's sessions takes
+    -- next-key locks that block overlapping inserts by other transactions.
+    SELECT COUNT(*) INTO v_clashes FROM studios WHERE id = p_studio_id FOR UPDATE;
+
+    SELECT COUNT(*) INTO v_clashes
+    FROM sessions
+    WHERE studio_id = p_studio_id
+      AND start_time > p_start_time - INTERVAL 24 HOUR AND start_time < p_end_time
+      AND end_time > p_start_time
+    FOR UPDATE;
+
+    IF v_clashes = 0 AND p_instructor IS NOT NULL THEN
+        SELECT COUNT(*) INTO v_clashes
+        FROM sessions
+        WHERE instructor = p_instructor
+          AND start_time > p_start_time - INTERVAL 24 HOUR AND start_time < p_end_time
+          AND end_time > p_start_time
+        FOR UPDATE;
+    END IF;
+
+    IF v_clashes > 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Session overlaps an existing session';
+    END IF;
+
     SET p_session_id = UUID();
     INSERT INTO sessions (id, studio_id, name, branch_id, description, start_time, end_time, activity_type_id, instructor, capacity)
     VALUES (p_session_id, p_studio_id, p_name, p_branch_id, p_description, p_start_time, p_end_time, p_activity_type_id, p_instructor, p_capacity);
@@ -600,7 +916,7 @@ DETERMINISTIC
 BEGIN
     DECLARE available INT;
     
-    SELECT capacity INTO available
+    SELECT GREATEST(capacity - booked_count, 0) INTO available
     FROM sessions
     WHERE id = p_session_id;
     
@@ -0,0 +1,129 @@
+-- Split sessions.capacity (fixed) from booked_count (spots taken) on an
+-- existing Fitness_DB. Before this change the booking triggers decremented
+-- capacity itself, so the original capacity is restored from the bookings.
+-- Requires update_user_activity.sql to have been applied first.
+
+USE Fitness_DB;
+
+ALTER TABLE sessions
+    ADD COLUMN booked_count INT NOT NULL DEFAULT 0 CHECK (booked_count >= 0) AFTER capacity;
+
+UPDATE sessions s
+JOIN (
+    SELECT session_id, COUNT(*) AS booked
+    FROM bookings
+    WHERE status IN ('confirmed', 'completed')
+    GROUP BY session_id
+) bk ON bk.session_id = s.id
+SET s.booked_count = bk.booked,
+    s.capacity = s.capacity + bk.booked;
+
+CREATE INDEX idx_sessions_booked_count ON sessions(booked_count);
+
+DROP TRIGGER IF EXISTS trg_cancel_booking;
+DROP TRIGGER IF EXISTS trg_confirm_booking;
+DROP TRIGGER IF EXISTS trg_check_capacity;
+DROP PROCEDURE IF EXISTS book_session;
+DROP FUNCTION IF EXISTS get_available_spots;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_cancel_booking
+AFTER UPDATE ON bookings
+FOR EACH ROW
+BEGIN
+    DECLARE v_branch_id CHAR(36);
+
+    IF NEW.status = 'cancelled' AND OLD.status != 'cancelled' THEN
+        IF OLD.status IN ('confirmed', 'completed') THEN
+            UPDATE sessions
+            SET booked_count = booked_count - 1
+            WHERE id = NEW.session_id;
+        END IF;
+
+        SELECT branch_id INTO v_branch_id FROM sessions WHERE id = NEW.session_id;
+
+        INSERT INTO user_activity_stats (user_id, cancelled_bookings)
+        VALUES (NEW.user_id, 1)
+        ON DUPLICATE KEY UPDATE cancelled_bookings = cancelled_bookings + 1;
+
+        INSERT INTO user_daily_activity (day, user_id, branch_id, cancellations)
+        VALUES (CURDATE(), NEW.user_id, v_branch_id, 1)
+        ON DUPLICATE KEY UPDATE cancellations = cancellations + 1;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_confirm_booking
+AFTER INSERT ON bookings
+FOR EACH ROW
+BEGIN
+    IF NEW.status = 'confirmed' THEN
+        UPDATE sessions
+        SET booked_count = booked_count + 1
+        WHERE id = NEW.session_id AND booked_count < capacity;
+
+        IF ROW_COUNT() = 0 THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Session is fully booked. No capacity available.';
+        END IF;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_check_capacity
+BEFORE INSERT ON bookings
+FOR EACH ROW
+BEGIN
+    DECLARE available_capacity INT;
+    SELECT capacity - booked_count INTO available_capacity FROM sessions WHERE id = NEW.session_id;
+    
+    IF available_capacity <= 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Session is fully booked. No capacity available.';
+    END IF;
+END$$
+
+CREATE PROCEDURE book_session(
+    IN p_user_id CHAR(36),
+    IN p_session_id CHAR(36),
+    OUT p_booking_id CHAR(36)
+)
+BEGIN
+    DECLARE v_capacity INT;
+    DECLARE v_has_active_membership BOOLEAN;
+    
+    -- Check if user has active membership
+    SET v_has_active_membership = is_active_member(p_user_id);
+    
+    IF NOT v_has_active_membership THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'User must have an active membership to book sessions.';
+    END IF;
+    
+    -- Check capacity
+    SELECT capacity - booked_count INTO v_capacity FROM sessions WHERE id = p_session_id;
+    
+    IF v_capacity <= 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Session is fully booked.';
+    END IF;
+    
+    -- Create booking
+    SET p_booking_id = UUID();
+    INSERT INTO bookings (id, user_id, session_id, status)
+    VALUES (p_booking_id, p_user_id, p_session_id, 'confirmed');
+END$$
+
+CREATE FUNCTION get_available_spots(p_session_id CHAR(36))
+RETURNS INT
+DETERMINISTIC
+BEGIN
+    DECLARE available INT;
+    
+    SELECT GREATEST(capacity - booked_count, 0) INTO available
+    FROM sessions
+    WHERE id = p_session_id;
+    
+    RETURN COALESCE(available, 0);
+END$$
+
+DELIMITER ;
@@ -0,0 +1,13 @@
+-- Add the FULLTEXT indexes used by /user/sessions/search/text to an
+-- existing Fitness_DB. The first FULLTEXT index on a table adds the hidden
+-- FTS_DOC_ID column and rebuilds the table, so run this off-peak.
+
+USE Fitness_DB;
+
+CREATE FULLTEXT INDEX idx_sessions_fulltext ON sessions(name, description, instructor);
+CREATE FULLTEXT INDEX idx_activity_types_fulltext ON activity_types(name, description);
+
+-- Rebuild the FULLTEXT auxiliary tables after bulk loads so deleted rows stop
+-- counting towards relevance (needs innodb_optimize_fulltext_only=ON):
+--   SET GLOBAL innodb_optimize_fulltext_only = ON;
+--   OPTIMIZE TABLE sessions, activity_types;
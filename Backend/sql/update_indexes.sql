@@ -0,0 +1,27 @@
+-- Add the indexes missing from databases created before they were
+-- introduced in schema.sql. Safe to run once on an existing Fitness_DB.
+
+USE Fitness_DB;
+
+-- Revenue report: payments joined on booking_id (no FK, so no implicit index)
+CREATE INDEX idx_payments_booking ON payments(booking_id);
+
+-- My payments: coupon_redemptions joined on payment_id
+CREATE INDEX idx_coupon_redemptions_payment ON coupon_redemptions(payment_id);
+
+-- Instructor / attendance reports: checkins joined on session_id
+CREATE INDEX idx_checkins_session ON checkins(session_id);
+
+-- checkin_user: confirmed booking lookup by (user, session, status).
+-- Its user_id prefix also covers fk_bookings_user, so the old single
+-- column index becomes redundant.
+CREATE INDEX idx_bookings_user_session_status ON bookings(user_id, session_id, status);
+DROP INDEX idx_bookings_user ON bookings;
+
+-- Session listings joined on activity type
+CREATE INDEX idx_sessions_activity_type ON sessions(activity_type_id);
+
+-- Active coupon listing and validity checks
+CREATE INDEX idx_coupons_active_validity ON coupons(is_active, valid_from, valid_to);
+
+ANALYZE TABLE payments, coupon_redemptions, checkins, bookings, sessions, coupons;
@@ -0,0 +1,61 @@
+-- Add the check-in rollup tables and trigger (see schema.sql) to an existing
+-- Fitness_DB and backfill them from the live and archived check-ins.
+
+USE Fitness_DB;
+
+CREATE TABLE checkin_hourly_rollup (
+    hour_start DATETIME NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    checkins INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour_start, branch_id)
+) ENGINE=InnoDB;
+
+CREATE TABLE checkin_daily_activity_rollup (
+    day DATE NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    activity_type_id CHAR(36) NOT NULL,
+    checkins INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, branch_id, activity_type_id)
+) ENGINE=InnoDB;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_checkin_rollup
+AFTER INSERT ON checkins
+FOR EACH ROW
+BEGIN
+    DECLARE v_activity_type_id CHAR(36);
+    SELECT activity_type_id INTO v_activity_type_id FROM sessions WHERE id = NEW.session_id;
+
+    INSERT INTO checkin_hourly_rollup (hour_start, branch_id, checkins)
+    VALUES (DATE_FORMAT(NEW.checkin_time, '%Y-%m-%d %H:00:00'), NEW.branch_id, 1)
+    ON DUPLICATE KEY UPDATE checkins = checkins + 1;
+
+    INSERT INTO checkin_daily_activity_rollup (day, branch_id, activity_type_id, checkins)
+    VALUES (DATE(NEW.checkin_time), NEW.branch_id, v_activity_type_id, 1)
+    ON DUPLICATE KEY UPDATE checkins = checkins + 1;
+END$$
+
+DELIMITER ;
+
+-- Backfill (the trigger only sees check-ins inserted from now on)
+INSERT INTO checkin_hourly_rollup (hour_start, branch_id, checkins)
+SELECT DATE_FORMAT(c.checkin_time, '%Y-%m-%d %H:00:00'), c.branch_id, COUNT(*)
+FROM (
+    SELECT branch_id, checkin_time FROM checkins
+    UNION ALL
+    SELECT branch_id, checkin_time FROM checkins_archive
+) c
+GROUP BY 1, 2
+ON DUPLICATE KEY UPDATE checkins = checkins + VALUES(checkins);
+
+INSERT INTO checkin_daily_activity_rollup (day, branch_id, activity_type_id, checkins)
+SELECT DATE(c.checkin_time), c.branch_id, s.activity_type_id, COUNT(*)
+FROM (
+    SELECT session_id, branch_id, checkin_time FROM checkins
+    UNION ALL
+    SELECT session_id, branch_id, checkin_time FROM checkins_archive
+) c
+JOIN sessions s ON c.session_id = s.id
+GROUP BY 1, 2, 3
+ON DUPLICATE KEY UPDATE checkins = checkins + VALUES(checkins);
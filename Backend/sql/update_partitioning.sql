@@ -0,0 +1,140 @@
+-- Convert checkins and payments of an existing Fitness_DB to monthly RANGE
+-- partitioning (see schema.sql). Tables are rebuilt and renamed, so run it
+-- in a maintenance window, then split the months out of pmax with:
+--     python archive_job.py --no-archive
+
+USE Fitness_DB;
+
+-- Partitioned InnoDB tables cannot take part in foreign keys. The
+-- ON DELETE SET NULL of coupon_redemptions.payment_id and
+-- payments.membership_id is kept by triggers (see TRIGGERS below)
+ALTER TABLE coupon_redemptions DROP FOREIGN KEY fk_coupon_redemptions_payment;
+
+-- ==========================================
+-- CHECKINS
+-- ==========================================
+-- CREATE TABLE ... LIKE copies columns and indexes but not foreign keys
+CREATE TABLE checkins_new LIKE checkins;
+ALTER TABLE checkins_new
+    MODIFY checkin_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, checkin_time);
+ALTER TABLE checkins_new
+    PARTITION BY RANGE (UNIX_TIMESTAMP(checkin_time)) (
+        PARTITION p202412 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+INSERT INTO checkins_new SELECT * FROM checkins;
+RENAME TABLE checkins TO checkins_old, checkins_new TO checkins;
+DROP TABLE checkins_old;
+
+-- ==========================================
+-- PAYMENTS
+-- ==========================================
+-- The payment trigger moves with the renamed table, so recreate it after
+DROP TRIGGER IF EXISTS trg_payment_success;
+
+CREATE TABLE payments_new LIKE payments;
+ALTER TABLE payments_new
+    MODIFY payment_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, payment_time);
+ALTER TABLE payments_new
+    PARTITION BY RANGE (UNIX_TIMESTAMP(payment_time)) (
+        PARTITION p202412 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+INSERT INTO payments_new SELECT * FROM payments;
+RENAME TABLE payments TO payments_old, payments_new TO payments;
+DROP TABLE payments_old;
+
+-- ==========================================
+-- ARCHIVE TABLES
+-- ==========================================
+CREATE TABLE checkins_archive LIKE checkins;
+ALTER TABLE checkins_archive
+    PARTITION BY RANGE (UNIX_TIMESTAMP(checkin_time)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+
+CREATE TABLE payments_archive LIKE payments;
+ALTER TABLE payments_archive
+    PARTITION BY RANGE (UNIX_TIMESTAMP(payment_time)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+
+-- ==========================================
+-- TRIGGERS
+-- ==========================================
+DELIMITER $$
+
+CREATE TRIGGER trg_payment_success
+AFTER UPDATE ON payments
+FOR EACH ROW
+BEGIN
+    IF NEW.status = 'success' AND OLD.status != 'success' AND NEW.membership_id IS NOT NULL THEN
+        UPDATE memberships
+        SET status = 'active'
+        WHERE id = NEW.membership_id;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_user_delete_history
+AFTER DELETE ON users
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins WHERE user_id = OLD.id;
+    DELETE FROM payments WHERE user_id = OLD.id;
+END$$
+
+CREATE TRIGGER trg_session_delete_history
+AFTER DELETE ON sessions
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins WHERE session_id = OLD.id;
+END$$
+
+CREATE TRIGGER trg_branch_delete_history
+AFTER DELETE ON branches
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins WHERE branch_id = OLD.id;
+END$$
+
+-- Sessions removed by a studio or activity type delete are gone by the time
+-- an AFTER trigger runs, so these look their check-ins up BEFORE the delete.
+-- (sessions.activity_type_id is ON DELETE RESTRICT today; if the delete is
+-- rejected the statement, and this trigger's work, is rolled back.)
+CREATE TRIGGER trg_studio_delete_history
+BEFORE DELETE ON studios
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins
+    WHERE session_id IN (SELECT id FROM sessions WHERE studio_id = OLD.id);
+END$$
+
+CREATE TRIGGER trg_activity_type_delete_history
+BEFORE DELETE ON activity_types
+FOR EACH ROW
+BEGIN
+    DELETE FROM checkins
+    WHERE session_id IN (SELECT id FROM sessions WHERE activity_type_id = OLD.id);
+END$$
+
+-- Triggers 11-12: Replace ON DELETE SET NULL for payments.membership_id and
+-- coupon_redemptions.payment_id, which lost their foreign keys to partitioning.
+CREATE TRIGGER trg_membership_delete_payments
+AFTER DELETE ON memberships
+FOR EACH ROW
+BEGIN
+    UPDATE payments SET membership_id = NULL WHERE membership_id = OLD.id;
+END$$
+
+CREATE TRIGGER trg_payment_delete_redemptions
+AFTER DELETE ON payments
+FOR EACH ROW
+BEGIN
+    UPDATE coupon_redemptions SET payment_id = NULL WHERE payment_id = OLD.id;
+END$$
+
+DELIMITER ;
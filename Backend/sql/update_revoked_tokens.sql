@@ -0,0 +1,9 @@
+-- Add the access token revocation table to an existing Fitness_DB.
+
+USE Fitness_DB;
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    token_id VARCHAR(32) PRIMARY KEY,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_revoked_tokens_expires (expires_at)
+) ENGINE=InnoDB;
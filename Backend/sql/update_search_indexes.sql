@@ -0,0 +1,15 @@
+-- Replace the single-column session indexes with the (filter, start_time)
+-- composites used by /user/sessions/search on an existing Fitness_DB.
+
+USE Fitness_DB;
+
+CREATE INDEX idx_sessions_branch_start ON sessions(branch_id, start_time);
+CREATE INDEX idx_sessions_activity_start ON sessions(activity_type_id, start_time);
+CREATE INDEX idx_sessions_instructor_start ON sessions(instructor, start_time);
+
+-- The composites' leading columns now cover fk_sessions_branch and
+-- fk_sessions_activity_type
+DROP INDEX idx_sessions_branch ON sessions;
+DROP INDEX idx_sessions_activity_type ON sessions;
+
+ANALYZE TABLE sessions;
@@ -0,0 +1,71 @@
+-- Make create_session re-check studio / instructor overlaps under row
+-- locks, so concurrent session creates from several API workers cannot
+-- both insert overlapping sessions. The re-check reads a bounded
+-- start_time range through these two indexes (the instructor one also
+-- comes with sql/update_search_indexes.sql; skip it if that ran).
+
+USE Fitness_DB;
+
+CREATE INDEX idx_sessions_studio_start ON sessions(studio_id, start_time);
+CREATE INDEX idx_sessions_instructor_start ON sessions(instructor, start_time);
+
+DROP PROCEDURE IF EXISTS create_session;
+
+DELIMITER $$
+
+CREATE PROCEDURE create_session(
+    IN p_studio_id CHAR(36),
+    IN p_name VARCHAR(100),
+    IN p_branch_id CHAR(36),
+    IN p_description TEXT,
+    IN p_start_time DATETIME,
+    IN p_end_time DATETIME,
+    IN p_activity_type_id CHAR(36),
+    IN p_instructor VARCHAR(100),
+    IN p_capacity INT,
+    OUT p_session_id CHAR(36)
+)
+BEGIN
+    DECLARE v_clashes INT;
+
+    -- Sessions last at most 24 hours (MAX_SESSION_HOURS in app/schemas.py),
+    -- so only sessions starting in (p_start_time - 24h, p_end_time) can
+    -- overlap: a short range on (studio_id, start_time) / (instructor, start_time).
+    IF p_end_time > p_start_time + INTERVAL 24 HOUR THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Session is longer than 24 hours';
+    END IF;
+
+    -- Re-check overlaps under locks, so concurrent creates from any API
+    -- worker cannot both pass: the studio row lock serializes creates per
+    -- studio, and the locking read of the instructor's sessions takes
+    -- next-key locks that block overlapping inserts by other transactions.
+    SELECT COUNT(*) INTO v_clashes FROM studios WHERE id = p_studio_id FOR UPDATE;
+
+    SELECT COUNT(*) INTO v_clashes
+    FROM sessions
+    WHERE studio_id = p_studio_id
+      AND start_time > p_start_time - INTERVAL 24 HOUR AND start_time < p_end_time
+      AND end_time > p_start_time
+    FOR UPDATE;
+
+    IF v_clashes = 0 AND p_instructor IS NOT NULL THEN
+        SELECT COUNT(*) INTO v_clashes
+        FROM sessions
+        WHERE instructor = p_instructor
+          AND start_time > p_start_time - INTERVAL 24 HOUR AND start_time < p_end_time
+          AND end_time > p_start_time
+        FOR UPDATE;
+    END IF;
+
+    IF v_clashes > 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Session overlaps an existing session';
+    END IF;
+
+    SET p_session_id = UUID();
+    INSERT INTO sessions (id, studio_id, name, branch_id, description, start_time, end_time, activity_type_id, instructor, capacity)
+    VALUES (p_session_id, p_studio_id, p_name, p_branch_id, p_description, p_start_time, p_end_time, p_activity_type_id, p_instructor, p_capacity);
+END$$
+
+DELIMITER ;
@@ -0,0 +1,11 @@
+-- Index the created_at watermark column of every table exported by
+-- export_snapshots.py on an existing Fitness_DB, so incremental exports
+-- read only the re-exported days instead of scanning the tables.
+
+USE Fitness_DB;
+
+CREATE INDEX idx_bookings_created ON bookings(created_at);
+CREATE INDEX idx_payments_created ON payments(created_at);
+CREATE INDEX idx_checkins_created ON checkins(created_at);
+CREATE INDEX idx_memberships_created ON memberships(created_at);
+CREATE INDEX idx_sessions_created ON sessions(created_at);
@@ -0,0 +1,152 @@
+-- Add the user activity aggregates (see schema.sql) to an existing
+-- Fitness_DB, replace the triggers that maintain them and backfill them.
+-- Requires update_occupancy_rollup.sql to have been applied first.
+
+USE Fitness_DB;
+
+CREATE TABLE user_activity_stats (
+    user_id CHAR(36) PRIMARY KEY,
+    total_checkins INT NOT NULL DEFAULT 0,
+    branches_visited INT NOT NULL DEFAULT 0,
+    first_checkin TIMESTAMP NULL,
+    last_checkin TIMESTAMP NULL,
+    cancelled_bookings INT NOT NULL DEFAULT 0,
+    INDEX idx_user_activity_stats_rank (total_checkins, user_id),
+    CONSTRAINT fk_user_activity_stats_user
+        FOREIGN KEY (user_id)
+        REFERENCES users(id)
+        ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE user_branch_visits (
+    user_id CHAR(36) NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    PRIMARY KEY (user_id, branch_id),
+    CONSTRAINT fk_user_branch_visits_user
+        FOREIGN KEY (user_id)
+        REFERENCES users(id)
+        ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE user_daily_activity (
+    day DATE NOT NULL,
+    user_id CHAR(36) NOT NULL,
+    branch_id CHAR(36) NOT NULL,
+    checkins INT NOT NULL DEFAULT 0,
+    cancellations INT NOT NULL DEFAULT 0,
+    first_checkin TIMESTAMP NULL,
+    last_checkin TIMESTAMP NULL,
+    PRIMARY KEY (day, user_id, branch_id),
+    CONSTRAINT fk_user_daily_activity_user
+        FOREIGN KEY (user_id)
+        REFERENCES users(id)
+        ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+DROP TRIGGER IF EXISTS trg_cancel_booking;
+DROP TRIGGER IF EXISTS trg_checkin_rollup;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_cancel_booking
+AFTER UPDATE ON bookings
+FOR EACH ROW
+BEGIN
+    DECLARE v_branch_id CHAR(36);
+
+    IF NEW.status = 'cancelled' AND OLD.status != 'cancelled' THEN
+        UPDATE sessions
+        SET capacity = capacity + 1
+        WHERE id = NEW.session_id;
+
+        SELECT branch_id INTO v_branch_id FROM sessions WHERE id = NEW.session_id;
+
+        INSERT INTO user_activity_stats (user_id, cancelled_bookings)
+        VALUES (NEW.user_id, 1)
+        ON DUPLICATE KEY UPDATE cancelled_bookings = cancelled_bookings + 1;
+
+        INSERT INTO user_daily_activity (day, user_id, branch_id, cancellations)
+        VALUES (CURDATE(), NEW.user_id, v_branch_id, 1)
+        ON DUPLICATE KEY UPDATE cancellations = cancellations + 1;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_checkin_rollup
+AFTER INSERT ON checkins
+FOR EACH ROW
+BEGIN
+    DECLARE v_activity_type_id CHAR(36);
+    DECLARE v_new_branch INT;
+    SELECT activity_type_id INTO v_activity_type_id FROM sessions WHERE id = NEW.session_id;
+
+    INSERT INTO checkin_hourly_rollup (hour_start, branch_id, checkins)
+    VALUES (DATE_FORMAT(NEW.checkin_time, '%Y-%m-%d %H:00:00'), NEW.branch_id, 1)
+    ON DUPLICATE KEY UPDATE checkins = checkins + 1;
+
+    INSERT INTO checkin_daily_activity_rollup (day, branch_id, activity_type_id, checkins)
+    VALUES (DATE(NEW.checkin_time), NEW.branch_id, v_activity_type_id, 1)
+    ON DUPLICATE KEY UPDATE checkins = checkins + 1;
+
+    -- 1 if this is the user's first check-in at the branch, 0 otherwise
+    INSERT IGNORE INTO user_branch_visits (user_id, branch_id)
+    VALUES (NEW.user_id, NEW.branch_id);
+    SET v_new_branch = ROW_COUNT();
+
+    INSERT INTO user_activity_stats
+        (user_id, total_checkins, branches_visited, first_checkin, last_checkin)
+    VALUES (NEW.user_id, 1, v_new_branch, NEW.checkin_time, NEW.checkin_time)
+    ON DUPLICATE KEY UPDATE
+        total_checkins = total_checkins + 1,
+        branches_visited = branches_visited + v_new_branch,
+        first_checkin = LEAST(COALESCE(first_checkin, NEW.checkin_time), NEW.checkin_time),
+        last_checkin = GREATEST(COALESCE(last_checkin, NEW.checkin_time), NEW.checkin_time);
+
+    INSERT INTO user_daily_activity
+        (day, user_id, branch_id, checkins, first_checkin, last_checkin)
+    VALUES (DATE(NEW.checkin_time), NEW.user_id, NEW.branch_id, 1,
+            NEW.checkin_time, NEW.checkin_time)
+    ON DUPLICATE KEY UPDATE
+        checkins = checkins + 1,
+        first_checkin = LEAST(COALESCE(first_checkin, NEW.checkin_time), NEW.checkin_time),
+        last_checkin = GREATEST(COALESCE(last_checkin, NEW.checkin_time), NEW.checkin_time);
+END$$
+
+DELIMITER ;
+
+-- ==========================================
+-- BACKFILL
+-- ==========================================
+INSERT INTO user_branch_visits (user_id, branch_id)
+SELECT DISTINCT user_id, branch_id FROM checkins
+UNION
+SELECT DISTINCT user_id, branch_id FROM checkins_archive;
+
+INSERT INTO user_daily_activity (day, user_id, branch_id, checkins, first_checkin, last_checkin)
+SELECT DATE(c.checkin_time), c.user_id, c.branch_id, COUNT(*), MIN(c.checkin_time), MAX(c.checkin_time)
+FROM (
+    SELECT user_id, branch_id, checkin_time FROM checkins
+    UNION ALL
+    SELECT user_id, branch_id, checkin_time FROM checkins_archive
+) c
+GROUP BY 1, 2, 3;
+
+-- Past cancellations have no cancel time; booking_time is the best estimate
+INSERT INTO user_daily_activity (day, user_id, branch_id, cancellations)
+SELECT DATE(b.booking_time), b.user_id, s.branch_id, COUNT(*)
+FROM bookings b
+JOIN sessions s ON b.session_id = s.id
+WHERE b.status = 'cancelled'
+GROUP BY 1, 2, 3
+ON DUPLICATE KEY UPDATE cancellations = VALUES(cancellations);
+
+INSERT INTO user_activity_stats
+    (user_id, total_checkins, branches_visited, first_checkin, last_checkin, cancelled_bookings)
+SELECT 
+    d.user_id,
+    SUM(d.checkins),
+    (SELECT COUNT(*) FROM user_branch_visits v WHERE v.user_id = d.user_id),
+    MIN(d.first_checkin),
+    MAX(d.last_checkin),
+    SUM(d.cancellations)
+FROM user_daily_activity d
+GROUP BY d.user_id;
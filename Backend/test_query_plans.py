@@ -0,0 +1,289 @@
+"""
+Query-plan regression suite
+Runs EXPLAIN for every SQL statement the app issues (routers and helper
+modules such as auth, timetable, checkin_ingest, tasks) and fails when a
+plan regresses to a full table scan or a filesort over too many rows.
+
+Run it against the scaled fixture, otherwise the optimizer happily scans
+tiny tables and the results mean nothing:
+    python scale_fixture.py --users 20000
+    python test_query_plans.py --max-rows 1000
+"""
+import argparse
+import ast
+import re
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+from app.fieldsets import SESSION_FIELDS, select_list
+from app.statements import PROCEDURE_STATEMENTS
+
+APP_DIR = Path(__file__).parent / "app"
+
+# Default row estimate above which a full scan / filesort counts as a regression
+DEFAULT_MAX_ROWS = 1000
+
+# Reports that intentionally aggregate a whole table. Each entry is
+# (function name, table alias) and must say why the scan is acceptable.
+ALLOWED_SCANS = {
+    # Admin listings return every row by design
+    ("get_all_branches", "branches"),
+    ("get_all_studios", "b"),
+    ("get_all_studios", "s"),
+    ("get_all_activity_types", "activity_types"),
+    ("get_all_coupons", "coupons"),
+    ("get_all_sessions", "s"),
+    # Branch reports group over every branch (a small table)
+    ("get_revenue_report", "b"),
+    ("get_top_performing_branch", "b"),
+    # Text search ranks the FULLTEXT hits by relevance
+    ("search_sessions_text", "<derived2>"),
+    # Full-table aggregates over the whole membership history
+    ("get_active_members_count", "memberships"),
+    # Revocation sync mirrors the whole (expiry-pruned) table into memory
+    ("sync_revocations", "revoked_tokens"),
+    # Live fallback of the analytics snapshots reads the whole table
+    ("load_live", "checkins"),
+}
+
+# Values for the names used inside text(f"...") statements, so the
+# statements are rendered and checked (session lists: every field selected)
+FSTRING_NAMES = {
+    "select_list": select_list,
+    "SESSION_FIELDS": SESSION_FIELDS,
+    "fields": None,
+    # checkin_batch IN lists, rendered for two pairs / bookings
+    "placeholders": "(:user_id, :session_id), (:user_id, :session_id)",
+    "id_params": {"id": None, "booking_id": None},
+    # User activity ranking: names of one page of users
+    "user_params": {"user_id": None},
+    # Session batch import re-check: one studio / instructor
+    "studio_params": {"studio_id": None},
+    "instructor_params": {"instructor": None},
+    # Analytics snapshot export / live load, checked for one table
+    "table": "checkins",
+    "columns": "id, user_id, created_at",
+}
+
+# Per-function overrides of FSTRING_NAMES where a name has another type
+FUNCTION_FSTRING_NAMES = {
+    "load_live": {"columns": ["id", "user_id", "created_at"]},
+}
+
+BIND_PATTERN = re.compile(r"(?<![:\w]):(\w+)")
+
+
+def collect_app_statements():
+    """
+    Extract every text("...") statement from the modules under app/
+
+    f-string statements are rendered with FSTRING_NAMES; one using any other
+    name is returned with sql=None and reported as unchecked.
+
+    Returns:
+        List of (function name, module, sql) tuples, module as "routers.admin"
+    """
+    statements = []
+    for path in sorted(APP_DIR.rglob("*.py")):
+        module = ".".join(path.relative_to(APP_DIR).with_suffix("").parts)
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        for func in ast.walk(tree):
+            if not isinstance(func, ast.FunctionDef):
+                continue
+            names = {**FSTRING_NAMES, **FUNCTION_FSTRING_NAMES.get(func.name, {})}
+            for node in ast.walk(func):
+                if (isinstance(node, ast.Call)
+                        and isinstance(node.func, ast.Name)
+                        and node.func.id == "text"
+                        and node.args):
+                    sql = render_sql(node.args[0], names)
+                    statements.append((func.name, module, sql and sql.strip()))
+    return statements
+
+
+def render_sql(node, names: dict = FSTRING_NAMES):
+    """
+    SQL of a literal or f-string text() argument, None if it cannot be rendered
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if not isinstance(node, ast.JoinedStr):
+        return None
+    parts = []
+    for value in node.values:
+        if isinstance(value, ast.Constant):
+            parts.append(value.value)
+            continue
+        try:
+            expression = compile(ast.Expression(value.value), "<sql>", "eval")
+            parts.append(str(eval(expression, dict(names))))
+        except NameError:
+            return None
+    return "".join(parts)
+
+
+def is_explainable(sql: str) -> bool:
+    """
+    Only SELECT/UPDATE/DELETE statements produce a meaningful plan
+    """
+    keyword = sql.split(None, 1)[0].upper()
+    if keyword not in ("SELECT", "UPDATE", "DELETE"):
+        return False
+    # Session variables read back after CALL
+    return not sql.upper().startswith("SELECT @")
+
+
+def load_sample_params(db) -> dict:
+    """
+    Pick real ids from the fixture so EXPLAIN sees realistic lookups
+
+    Returns:
+        Dictionary of bind parameter name -> sample value
+    """
+    booking = db.execute(text(
+        "SELECT id, user_id, session_id FROM bookings WHERE status = 'confirmed' LIMIT 1"
+    )).fetchone()
+    payment = db.execute(text("SELECT id FROM payments LIMIT 1")).fetchone()
+    plan = db.execute(text("SELECT id FROM membership_plans LIMIT 1")).fetchone()
+    branch = db.execute(text("SELECT id FROM branches LIMIT 1")).fetchone()
+    user = db.execute(text("SELECT email FROM users WHERE id = :id"),
+                      {'id': booking[1]}).fetchone()
+    coupon = db.execute(text("SELECT code FROM coupons LIMIT 1")).fetchone()
+
+    return {
+        'id': booking[0],
+        'booking_id': booking[0],
+        'user_id': booking[1],
+        'session_id': booking[2],
+        'payment_id': payment[0],
+        'plan_id': plan[0],
+        'branch_id': branch[0],
+        'email': user[0],
+        'code': coupon[0],
+        # Recent date range, so partitioned tables prune to a few months
+        'start_date': (date.today() - timedelta(days=90)).isoformat(),
+        'end_date': date.today().isoformat(),
+        # First page of keyset-paginated reports
+        'limit': 50,
+        'after_checkins': None,
+        'after_user_id': '',
+        # Session search filtered by branch only
+        'activity_type_id': None,
+        'instructor': None,
+        'start_from': None,
+        'start_to': None,
+        'has_spots': 1,
+        'after_start_time': None,
+        'after_id': '',
+        # Full-text search terms (as built by app.search.to_boolean_query)
+        'terms': 'yoga*',
+        # Helper modules: check-in booking cache window, snapshot export range
+        'hours': 3,
+        'since': (date.today() - timedelta(days=7)).isoformat(),
+        'until': date.today().isoformat(),
+        'lag': 60,
+    }
+
+
+def explain(db, sql: str, sample_params: dict):
+    """
+    Run EXPLAIN for a statement, binding sample values for its parameters
+
+    Returns:
+        List of plan rows as dictionaries
+    """
+    params = {name: sample_params.get(name, 'x') for name in BIND_PATTERN.findall(sql)}
+    result = db.execute(text(f"EXPLAIN {sql}"), params)
+    return [dict(row._mapping) for row in result]
+
+
+def find_violations(function: str, plan: list, max_rows: int) -> list:
+    """
+    Check plan rows for full scans and filesorts above the row threshold
+
+    Returns:
+        List of human readable violation messages
+    """
+    violations = []
+    for step in plan:
+        table = step.get('table')
+        rows = step.get('rows') or 0
+        extra = step.get('Extra') or ''
+        if (function, table) in ALLOWED_SCANS or rows <= max_rows:
+            continue
+        if step.get('type') == 'ALL':
+            violations.append(f"full scan on {table} (~{rows} rows)")
+        if 'Using filesort' in extra:
+            violations.append(f"filesort on {table} (~{rows} rows)")
+    return violations
+
+
+def check_plans(max_rows: int = DEFAULT_MAX_ROWS) -> list:
+    """
+    EXPLAIN every app and procedure statement
+
+    Returns:
+        List of (function name, source, messages) for each regressed statement
+    """
+    db = SessionLocal()
+    try:
+        sample_params = load_sample_params(db)
+        statements = collect_app_statements()
+        failures = [
+            (function, source, ["f-string SQL uses names missing from FSTRING_NAMES"])
+            for function, source, sql in statements if sql is None
+        ]
+        for function, source, _ in failures:
+            print(f"❌ {source}.{function}")
+        statements = [s for s in statements if s[2] and is_explainable(s[2])]
+        statements += PROCEDURE_STATEMENTS
+
+        for function, source, sql in statements:
+            plan = explain(db, sql, sample_params)
+            violations = find_violations(function, plan, max_rows)
+            status = "❌" if violations else "✅"
+            print(f"{status} {source}.{function}")
+            if violations:
+                failures.append((function, source, violations))
+        # EXPLAIN UPDATE/DELETE never modifies rows, but keep the session clean
+        db.rollback()
+        return failures
+    finally:
+        db.close()
+
+
+def test_query_plans():
+    """Fail when any statement's plan has regressed"""
+    failures = check_plans()
+    assert not failures, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN-based query-plan regression suite")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS,
+                        help="row estimate above which scans and filesorts fail")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 50)
+    print("  QUERY PLAN REGRESSION SUITE")
+    print("=" * 50)
+
+    failures = check_plans(args.max_rows)
+
+    for function, source, violations in failures:
+        print(f"\n{source}.{function}:")
+        for message in violations:
+            print(f"  - {message}")
+
+    if failures:
+        print(f"\n⚠️  {len(failures)} statement(s) regressed")
+        sys.exit(1)
+    print("\n🎉 All query plans use indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import React, { createContext, useState, useContext, useEffect } from 'react';
+import { authAPI } from './api';
 
 const AuthContext = createContext();
 
@@ -32,7 +33,8 @@ export const AuthProvider = ({ children }) => {
     setLoading(false);
   }, []);
 
-  const login = (userData) => {
+  const login = (userData, token) => {
+    localStorage.setItem('token', token);
     localStorage.setItem('userId', userData.id);
     localStorage.setItem('userName', userData.name);
     localStorage.setItem('userRole', userData.role);
@@ -41,6 +43,12 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    // Revoke the token server-side; local logout must not wait on it
+    const token = localStorage.getItem('token');
+    if (token) {
+      authAPI.logout(token).catch(() => {});
+    }
+    localStorage.removeItem('token');
     localStorage.removeItem('userId');
     localStorage.removeItem('userName');
     localStorage.removeItem('userRole');
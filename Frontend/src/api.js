@@ -9,6 +9,15 @@ const api = axios.create({
   },
 });
 
+// Send the access token issued at login with every request
+api.interceptors.request.use((config) => {
+  const token = localStorage.getItem('token');
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`;
+  }
+  return config;
+});
+
 // Helper function to get user ID from localStorage
 const getUserId = () => localStorage.getItem('userId');
 
@@ -16,6 +25,7 @@ const getUserId = () => localStorage.getItem('userId');
 export const authAPI = {
   register: (userData) => api.post('/user/register', userData),
   login: (credentials) => api.post('/user/login', credentials),
+  logout: (token) => api.post('/user/logout', null, { headers: { Authorization: `Bearer ${token}` } }),
 };
 
 // User APIs
@@ -25,11 +35,16 @@ export const userAPI = {
   getCoupons: () => api.get('/user/coupons'),
   purchaseMembership: (userId, data) => api.post(`/user/purchase-membership/${userId}`, data),
   getMyMemberships: (userId) => api.get(`/user/my-memberships/${userId}`),
-  getSessions: () => api.get('/user/sessions'),
+  getHome: (userId) => api.get(`/user/home/${userId}`),
+  getSessions: (fields) => api.get('/user/sessions', { params: { fields } }),
+  searchSessions: (params) => api.get('/user/sessions/search', { params }),
+  searchSessionsText: (q, limit = 20) => api.get('/user/sessions/search/text', { params: { q, limit } }),
+  getTimetable: (branchId, week) => api.get(`/user/timetable/${branchId}`, { params: { week } }),
   bookSession: (userId, data) => api.post(`/user/book-session/${userId}`, data),
   getMyBookings: (userId) => api.get(`/user/my-bookings/${userId}`),
   cancelBooking: (bookingId) => api.put(`/user/cancel-booking/${bookingId}`),
   checkin: (userId, data) => api.post(`/user/checkin/${userId}`, data),
+  checkinBatch: (checkins) => api.post('/user/checkin/batch', { checkins }),
   getMyPayments: (userId) => api.get(`/user/my-payments/${userId}`),
 };
 
@@ -52,6 +67,8 @@ export const adminAPI = {
   // Sessions
   getSessions: () => api.get('/admin/sessions'),
   createSession: (data) => api.post('/admin/sessions', data),
+  createSessionsBatch: (sessions, validateOnly = false) =>
+    api.post('/admin/sessions/batch', sessions, { params: { validate_only: validateOnly } }),
   deleteSession: (id) => api.delete(`/admin/sessions/${id}`),
   
   // Membership Plans
@@ -67,6 +84,7 @@ export const adminAPI = {
   getPopularSessions: () => api.get('/admin/reports/popular-sessions'),
   getActiveMembers: () => api.get('/admin/reports/active-members'),
   getTopBranch: () => api.get('/admin/reports/top-performing-branch'),
+  getDashboard: () => api.get('/admin/dashboard'),
 };
 
 export default api;
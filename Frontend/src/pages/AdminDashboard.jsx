@@ -6,7 +6,7 @@ import './AdminDashboard.css';
 function AdminDashboard() {
   const [stats, setStats] = useState({
     revenue: [],
-    activeMembers: [],
+    activeMembers: 0,
     popularSessions: []
   });
   const [loading, setLoading] = useState(true);
@@ -17,16 +17,13 @@ function AdminDashboard() {
 
   const loadDashboardData = async () => {
     try {
-      const [revenueRes, activeMembersRes, popularSessionsRes] = await Promise.all([
-        adminAPI.getRevenueReport(),
-        adminAPI.getActiveMembers(),
-        adminAPI.getPopularSessions()
-      ]);
+      // One request; the server runs the three reports concurrently
+      const response = await adminAPI.getDashboard();
 
       setStats({
-        revenue: revenueRes.data,
-        activeMembers: activeMembersRes.data,
-        popularSessions: popularSessionsRes.data
+        revenue: response.data.revenue,
+        activeMembers: response.data.active_members,
+        popularSessions: response.data.popular_sessions
       });
     } catch (err) {
       console.error('Failed to load dashboard data:', err);
@@ -41,7 +38,7 @@ function AdminDashboard() {
   };
 
   const totalRevenue = stats.revenue.reduce((sum, item) => sum + parseFloat(item.total_revenue || 0), 0);
-  const totalActiveMembers = stats.activeMembers.length;
+  const totalActiveMembers = stats.activeMembers;
   const totalPopularSessions = stats.popularSessions.reduce((sum, item) => sum + parseInt(item.total_bookings || 0), 0);
 
   if (loading) {
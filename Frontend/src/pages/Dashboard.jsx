@@ -17,8 +17,8 @@ const Dashboard = () => {
 
   const fetchProfile = async () => {
     try {
-      const response = await userAPI.getProfile(user.id);
-      setProfile(response.data);
+      const response = await userAPI.getHome(user.id);
+      setProfile(response.data.profile);
     } catch (error) {
       console.error('Error fetching profile:', error);
     } finally {
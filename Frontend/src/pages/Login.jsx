@@ -30,7 +30,7 @@ const Login = () => {
       const response = await authAPI.login(formData);
       const userData = response.data.user;
       
-      login(userData);
+      login(userData, response.data.access_token);
       
       // Redirect based on role
       if (userData.role === 'admin') {
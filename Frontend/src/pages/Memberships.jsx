@@ -22,17 +22,13 @@ const Memberships = () => {
 
   const fetchData = async () => {
     try {
-      const [plansRes, membershipsRes, couponsRes] = await Promise.all([
-        userAPI.getMembershipPlans(),
-        userAPI.getMyMemberships(user.id),
-        userAPI.getCoupons(),
-      ]);
-      setPlans(plansRes.data);
-      setMyMemberships(membershipsRes.data);
+      const { data } = await userAPI.getHome(user.id);
+      setPlans(data.plans);
+      setMyMemberships([...data.current_memberships, ...data.past_memberships]);
       
       // Convert coupons array to object for easy lookup
       const couponsMap = {};
-      couponsRes.data.forEach(coupon => {
+      data.coupons.forEach(coupon => {
         couponsMap[coupon.code] = {
           type: coupon.discount_type,
           value: coupon.discount_value,
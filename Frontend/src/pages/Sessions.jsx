@@ -3,6 +3,9 @@ import { useAuth } from '../AuthContext';
 import { userAPI } from '../api';
 import './Sessions.css';
 
+// Only what the session cards show
+const SESSION_FIELDS = 'id,name,start_time,activity_type_name,branch_name,instructor,description,available_spots';
+
 const Sessions = () => {
   const { user } = useAuth();
   const [sessions, setSessions] = useState([]);
@@ -16,7 +19,7 @@ const Sessions = () => {
 
   const fetchSessions = async () => {
     try {
-      const response = await userAPI.getSessions();
+      const response = await userAPI.getSessions(SESSION_FIELDS);
       setSessions(response.data);
     } catch (error) {
       console.error('Error fetching sessions:', error);